@@ -1,83 +1,329 @@
 import streamlit as st
-import pandas as pd
-import re
+import atexit
+import hashlib
+import base64
+import shutil
+import tempfile
+import threading
+from functools import partial
 from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Só a parte leve do motor na importação: pandas, NumPy e openpyxl vêm com o
+# primeiro cálculo ou upload (importações dentro das funções abaixo)
+from atualizacao.instrumentacao import Instrumentacao, medir
+from atualizacao.interface import (
+    EXTENSOES, INDICES, atualizar_individual, auto_formatar_data, exemplo_xlsx, formatar_valor_monetario,
+)
 
 # --- CORES VIPAL ---
 VIPAL_AZUL = "#01438F"
 VIPAL_VERMELHO = "#E4003A"
 FONTE_MONTSERRAT = "'Montserrat', sans-serif"
 
-# --- ÍNDICES DISPONÍVEIS ---
-INDICES = {
-    "Selic": {"fonte": "Bacen"},
-    "IPCA": {"fonte": "IBGE"},
-    "CDI": {"fonte": "B3"},
-    "IGPM": {"fonte": "FGV"},
-}
+# --- CACHE ENTRE REEXECUÇÕES (planilhas por hash do conteúdo) ---
+CACHE_MAX_ARQUIVOS = 4
+CACHE_MAX_RESULTADOS = 16
+CACHE_TTL = 60 * 60
+
+# Pastas de blocos em disco mantidas por processo (entradas e resultados; as mais antigas saem primeiro)
+PASTAS_EM_DISCO = 2 * (CACHE_MAX_ARQUIVOS + CACHE_MAX_RESULTADOS)
+
+# --- PRÉVIA DO RESULTADO EM MASSA (o resultado completo só sai pela exportação) ---
+PREVIA_LINHAS_PAGINA = 100
+INTERVALO_PROGRESSO = 0.2
 
 # --- FUNÇÕES AUXILIARES ---
-def auto_formatar_data(valor):
-    v = re.sub(r"\D", "", str(valor))[:8]
-    if len(v) >= 5:
-        return f"{v[:2]}/{v[2:4]}/{v[4:]}"
-    elif len(v) >= 3:
-        return f"{v[:2]}/{v[2:]}"
-    else:
-        return v
-
-def parse_valor(valor):
-    v = str(valor).replace('.', '').replace(',', '.')
-    return float(re.sub(r"[^\d.]", "", v)) if v else 0.0
-
-def validar_data(data):
+def hash_upload(arquivo):
+    # Hash do conteúdo, calculado uma vez por arquivo enviado na sessão
+    hashes = st.session_state.setdefault("hashes_upload", {})
+    if arquivo.file_id not in hashes:
+        # Em pedaços de 1 MB, sem copiar o arquivo inteiro
+        resumo = hashlib.sha256()
+        arquivo.seek(0)
+        for pedaco in iter(lambda: arquivo.read(1 << 20), b""):
+            resumo.update(pedaco)
+        arquivo.seek(0)
+        hashes[arquivo.file_id] = resumo.hexdigest()
+    return hashes[arquivo.file_id]
+
+def exportar_resultado(resultado, colunas, formato):
+    # Exporta o resultado em disco bloco a bloco para um arquivo na pasta dele (uma vez por formato);
+    # colunas = colunas gravadas pelo cálculo. O download_button guarda o conteúdo inteiro de qualquer
+    # forma, então o arquivo pronto é lido de uma vez e fechado
+    from atualizacao.exportacao import FORMATOS, ExportadorBlocos, coluna_resultado
+
+    caminho = resultado.pasta / f"exportacao{FORMATOS[formato]['sufixo']}"
+    if not caminho.exists():
+        instrumentacao = Instrumentacao({"formato": formato})
+        temporario = caminho.with_name(f".{caminho.name}.tmp")
+        with instrumentacao, ExportadorBlocos(formato, temporario) as saida:
+            for bloco in instrumentacao.iterar("leitura", resultado):
+                with instrumentacao.etapa("formatacao", len(bloco)):
+                    bloco = bloco.assign(**{c: coluna_resultado(bloco[c], formato) for c in colunas})
+                with instrumentacao.etapa("exportacao", len(bloco)):
+                    saida.escrever(bloco)
+        instrumentacao.registrar_log()
+        temporario.replace(caminho)
+    with open(caminho, "rb") as arquivo:
+        return arquivo.read()
+
+class CalculoCancelado(Exception):
+    pass
+
+class Andamento:
+    # Progresso do cálculo em massa, escrito pela thread do cálculo e lido pela página
+    def __init__(self, linhas_estimadas):
+        self.linhas_estimadas = linhas_estimadas
+        self.fracao = 0.0
+        self.texto = "Preparando..."
+        self.cancelado = threading.Event()
+
+    def avancar(self, fase, linhas, inicio, peso):
+        # fase ocupa a faixa [inicio, inicio + peso] da barra; interrompe o cálculo se cancelado
+        if self.cancelado.is_set():
+            raise CalculoCancelado()
+        if self.linhas_estimadas:
+            self.fracao = inicio + peso * min(linhas / self.linhas_estimadas, 1.0)
+            self.texto = f"{fase}: {linhas:,} de ~{self.linhas_estimadas:,} linhas".replace(",", ".")
+        else:
+            self.texto = f"{fase}: {linhas:,} linhas".replace(",", ".")
+
+@st.cache_data(max_entries=CACHE_MAX_ARQUIVOS, ttl=CACHE_TTL, show_spinner=False)
+def linhas_estimadas(chave_arquivo, nome_arquivo, _arquivo):
+    # Linhas declaradas no arquivo, para a barra de progresso (uma leitura por conteúdo)
+    from atualizacao.leitura import contar_linhas
+
+    _arquivo.seek(0)
     try:
-        return pd.to_datetime(data, dayfirst=True, errors="raise")
-    except Exception:
-        return None
-
-def calcular_indice(valor_base, data_inicial, data_final, indice_nome):
-    dt_ini = pd.to_datetime(data_inicial, dayfirst=True)
-    dt_fim = pd.to_datetime(data_final, dayfirst=True)
-    meses = max((dt_fim.year - dt_ini.year) * 12 + dt_fim.month - dt_ini.month, 0)
-    taxas = {"Selic": 0.01, "IPCA": 0.006, "CDI": 0.008, "IGPM": 0.007}
-    tx = taxas.get(indice_nome, 0.01)
-    return valor_base * ((1 + tx) ** meses)
-
-def gerar_excel(df):
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False)
-    return output.getvalue()
-
-def exemplo_excel():
-    return pd.DataFrame({
-        "data_inicial": ["15/03/2023"],
-        "data_final": ["09/07/2025"],
-        "valor": ["1.000,00"]
+        return contar_linhas(_arquivo, nome=nome_arquivo)
+    finally:
+        _arquivo.seek(0)
+
+@st.cache_data(max_entries=CACHE_MAX_ARQUIVOS, ttl=CACHE_TTL, show_spinner=False)
+def entrada_normalizada(chave_arquivo, nome_arquivo, _arquivo, _instrumentacao=None, _andamento=None):
+    # Arquivo lido em blocos e normalizado uma vez por conteúdo (chave_arquivo = hash; o nome diz o formato),
+    # com o esquema detectado nas primeiras linhas e os problemas de validação de cada linha.
+    # Os blocos normalizados vão para o disco (BlocosEmDisco): o cache guarda só o caminho, o esquema e o relatório
+    from atualizacao.calculo import preparar_bloco
+    from atualizacao.esquema import detectar_esquema, juntar_relatorio, validar_bloco
+    from atualizacao.exportacao import BlocosEmDisco
+    from atualizacao.leitura import ler_em_blocos
+
+    blocos = BlocosEmDisco.criar(pasta_temporaria(), manter=PASTAS_EM_DISCO)
+    problemas = []
+    esquema = None
+    lidas = 0
+    _arquivo.seek(0)
+    lidos = ler_em_blocos(_arquivo, nome=nome_arquivo)
+    if _instrumentacao is not None:
+        lidos = _instrumentacao.iterar("leitura", lidos)
+    for bloco in lidos:
+        esquema = esquema or detectar_esquema(bloco)
+        preparado = preparar_bloco(bloco, esquema, _instrumentacao)
+        with medir(_instrumentacao, "validacao", len(bloco)):
+            problemas.append(validar_bloco(bloco, preparado, esquema))
+        blocos.escrever(preparado)
+        lidas += len(bloco)
+        if _andamento is not None:
+            _andamento.avancar("Lendo o arquivo", lidas, 0.0, 0.7)
+    if not blocos.linhas:
+        blocos.remover()
+        raise ValueError("a planilha está vazia")
+    return blocos, esquema, juntar_relatorio(problemas)
+
+def totais_por_indice(bloco, resultado, indices, final=None):
+    # Linhas, linhas calculadas e somas de um bloco, por índice (indices: o índice de cada linha)
+    import pandas as pd
+
+    validos = resultado.notna()
+    somas = pd.DataFrame({
+        "indice": indices.to_numpy(),
+        "linhas": 1,
+        "calculadas": validos.astype("int64").to_numpy(),
+        "valor_original": bloco["valor"].where(validos, 0.0).to_numpy(),
+        "valor_atualizado": resultado.where(validos, 0.0).to_numpy(),
     })
+    if final is not None:
+        somas["valor_final"] = final.where(final.notna(), 0.0).to_numpy()
+    return somas.groupby("indice", sort=False).sum()
+
+@st.cache_data(max_entries=CACHE_MAX_RESULTADOS, ttl=CACHE_TTL, show_spinner=False)
+def resultado_em_massa(chave_arquivo, nome_arquivo, indice_nome, todos_indices, composicao, exato, pro_rata,
+                       versoes, _arquivo, _instrumentacao=None, _andamento=None):
+    # versoes (das séries na base local) invalidam o resultado quando uma série é sincronizada.
+    # indice_nome vale para as linhas sem a coluna "indice"; todos_indices calcula uma coluna por índice;
+    # composicao (texto de Composicao.ler) acrescenta juros e multa em valor_final.
+    # O resultado vai para o disco bloco a bloco; o cache guarda o caminho, as colunas calculadas, os totais e o relatório
+    import pandas as pd
+
+    from atualizacao.calculo import indices_por_linha
+    from atualizacao.composicao import Composicao
+    from atualizacao.esquema import juntar_relatorio, validar_resultado
+    from atualizacao.exportacao import BlocosEmDisco, coluna_final, colunas_calculo, colunas_resultado
+
+    composicao = Composicao.ler(composicao)
+    compor = not composicao.so_correcao
+    blocos, esquema, relatorio = entrada_normalizada(chave_arquivo, nome_arquivo, _arquivo, _instrumentacao,
+                                                     _andamento)
+    if not blocos.existe():
+        # Blocos normalizados já removidos da pasta temporária: lê o arquivo de novo
+        entrada_normalizada.clear()
+        blocos, esquema, relatorio = entrada_normalizada(chave_arquivo, nome_arquivo, _arquivo, _instrumentacao,
+                                                         _andamento)
+    resultado_disco = BlocosEmDisco.criar(pasta_temporaria(), manter=PASTAS_EM_DISCO)
+    problemas = [relatorio]
+    calculadora = calculadora_paralela()
+    calculadas = 0
+    totais = []
+    colunas = colunas_calculo(indice_nome, INDICES if todos_indices else None)
+    # Um lote por vez (planilhas grandes divididas entre os processos do pool), com progresso entre lotes
+    for lote in calculadora.lotes(blocos):
+        linhas = sum(len(bloco) for bloco in lote)
+        if compor and not calculadas:
+            composicao.verificar(lote[0].columns)
+        with medir(_instrumentacao, "composicao", linhas):
+            # O fator de juros e multa não depende do índice: um por bloco, para todas as colunas
+            fatores = [composicao.fator(bloco) if compor else None for bloco in lote]
+        for coluna, indice in colunas.items():
+            with medir(_instrumentacao, "calculo", linhas):
+                resultados = calculadora.calcular_blocos(lote, indice, exato=exato, por_linha=not todos_indices,
+                                                         pro_rata=pro_rata)
+            for bloco, resultado, fator in zip(lote, resultados, fatores):
+                indices = pd.Series(indice, index=bloco.index) if todos_indices else indices_por_linha(bloco, indice)
+                problemas.append(validar_resultado(bloco, resultado, coluna if todos_indices else None, indices,
+                                                   pro_rata=pro_rata))
+                final = composicao.aplicar(bloco, resultado, fator) if compor else None
+                totais.append(totais_por_indice(bloco, resultado, indices, final))
+                # Numérico: a formatação em reais depende do formato exportado (coluna_resultado)
+                bloco[coluna] = resultado
+                if compor:
+                    bloco[coluna_final(coluna)] = final
+        for bloco in lote:
+            resultado_disco.escrever(bloco)
+        calculadas += linhas
+        if _andamento is not None:
+            _andamento.linhas_estimadas = blocos.linhas
+            _andamento.avancar("Calculando", calculadas, 0.7, 0.3)
+    totais = pd.concat(totais).groupby(level=0, sort=False).sum().reset_index()
+    return resultado_disco, colunas_resultado(colunas, compor), totais, esquema, juntar_relatorio(problemas)
 
-def normalizar_data(val):
+def em_segundo_plano(funcao, andamento, barra):
+    # Roda o cálculo numa thread e atualiza a barra; uma nova execução da página (ex.: "Cancelar") interrompe o laço
+    saida = {}
+
+    def executar():
+        try:
+            saida["resultado"] = funcao()
+        except BaseException as exc:
+            saida["erro"] = exc
+
+    thread = threading.Thread(target=executar, daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx())
+    thread.start()
     try:
-        if isinstance(val, (float, int)) and not pd.isnull(val):
-            d = pd.to_datetime(val, origin='1899-12-30', unit='d')
-            return d.strftime('%d/%m/%Y')
-        valstr = str(val).replace('-', '/').replace('.', '/')
-        d = pd.to_datetime(valstr, dayfirst=True, errors="coerce")
-        if pd.notnull(d):
-            return d.strftime('%d/%m/%Y')
-        v = ''.join(filter(str.isdigit, str(val)))
-        if len(v) == 8:
-            return f"{v[:2]}/{v[2:4]}/{v[4:]}"
-        return val
-    except Exception:
-        return val
+        while thread.is_alive():
+            barra.progress(andamento.fracao, text=andamento.texto)
+            thread.join(INTERVALO_PROGRESSO)
+    finally:
+        # Interrompida a página, o cálculo para no próximo bloco em vez de seguir em segundo plano
+        andamento.cancelado.set()
+        thread.join()
+    if "erro" in saida:
+        raise saida["erro"]
+    return saida["resultado"]
 
-# --- CONFIG PAGE ---
-st.set_page_config(page_title="Atualização de valores", layout="wide")
+def cancelar_massa():
+    st.session_state["massa_calculada"] = None
+    st.session_state["massa_cancelada"] = True
 
-# --- CSS: MONTSERRAT, CENTRALIZAÇÕES, AJUSTES ---
-st.markdown(f"""
+def pagina_resultado(resultado, pagina, tamanho=PREVIA_LINHAS_PAGINA):
+    # Só os blocos com linhas da página são lidos do disco
+    return resultado.fatia((pagina - 1) * tamanho, pagina * tamanho)
+
+def painel_validacao(esquema, relatorio):
+    # Colunas e formatos reconhecidos e as linhas que não puderam ser calculadas, por motivo
+    from atualizacao.esquema import resumo_relatorio
+
+    st.caption(f"Colunas reconhecidas: {esquema.descrever()}")
+    if relatorio.empty:
+        return
+    linhas = relatorio["linha"].nunique()
+    # Fora do expansor: é o caso mais comum de linha sem resultado e não é erro da planilha
+    nao_publicadas = relatorio.loc[relatorio["motivo"] == "indice_nao_publicado", "linha"].nunique()
+    if nao_publicadas:
+        st.warning(f"{nao_publicadas:,} linhas".replace(",", ".") + " sem resultado: a taxa do mês da data final "
+                   "entra no cálculo e o índice desse mês ainda não foi publicado (o IPCA e o IGP-M saem no mês "
+                   "seguinte).")
+    with st.expander(f"Relatório de validação: {linhas:,} linhas com problema".replace(",", ".")):
+        st.dataframe(resumo_relatorio(relatorio), use_container_width=True, hide_index=True)
+        st.dataframe(relatorio.head(PREVIA_LINHAS_PAGINA), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Exportar relatório de validação (CSV)",
+            lambda: relatorio.to_csv(sep=";", index=False).encode("utf-8-sig"),
+            file_name="relatorio_validacao.csv",
+            mime="text/csv",
+            key="exportar_validacao",
+        )
+
+def painel_desempenho(instrumentacao, erro=None):
+    # Tempo, linhas/s e pico de RSS de cada etapa da última execução; etapas em cache não aparecem
+    resumo = instrumentacao.resumo()
+    if not resumo and erro is None:
+        return
+    with st.expander("Diagnóstico de desempenho", expanded=erro is not None):
+        if resumo:
+            st.dataframe(
+                resumo,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "segundos": st.column_config.NumberColumn(format="%.3f"),
+                    "linhas_por_segundo": st.column_config.NumberColumn("linhas/s", format="%d"),
+                    "pico_rss_mb": st.column_config.NumberColumn("pico RSS (MB)", format="%.1f"),
+                },
+            )
+        if erro is None:
+            if "leitura" not in instrumentacao.etapas:
+                st.caption("Planilha reaproveitada do cache: leitura e normalização não foram refeitas.")
+            if "calculo" not in instrumentacao.etapas:
+                st.caption("Resultado reaproveitado do cache: cálculo e formatação não foram refeitos.")
+            st.caption(f"Tempo total: {instrumentacao.segundos_total:.3f} s")
+        else:
+            st.exception(erro)
+
+@st.cache_resource(show_spinner=False)
+def pasta_temporaria():
+    # Pasta dos resultados em disco deste processo, apagada ao encerrar o servidor
+    pasta = Path(tempfile.mkdtemp(prefix="atualizacao_app_"))
+    atexit.register(shutil.rmtree, pasta, True)
+    return pasta
+
+@st.cache_resource(show_spinner=False)
+def calculadora_paralela():
+    # Um pool de processos por servidor; ATUALIZACAO_TRABALHADORES define quantos
+    from atualizacao.paralelo import CalculadoraParalela
+
+    return CalculadoraParalela()
+
+# --- ATIVOS ESTÁTICOS (montados uma vez por processo) ---
+PASTA_APP = Path(__file__).resolve().parent
+
+def imagem_data_uri(nome, largura=None, altura=None):
+    # Logo do repositório reduzida ao dobro do tamanho exibido (telas de alta densidade), embutida em data URI
+    with Image.open(PASTA_APP / nome) as imagem:
+        imagem.thumbnail((2 * largura if largura else imagem.width, 2 * altura if altura else imagem.height))
+        saida = BytesIO()
+        imagem.save(saida, format="PNG", optimize=True)
+    return "data:image/png;base64," + base64.b64encode(saida.getvalue()).decode("ascii")
+
+@st.cache_resource(show_spinner=False)
+def ativos_estaticos():
+    return {
+        "css": f"""
 <link href="https://fonts.googleapis.com/css?family=Montserrat:400,700&display=swap" rel="stylesheet">
 <style>
 html, body, [class*="css"] {{
@@ -91,12 +337,23 @@ html, body, [class*="css"] {{
     font-family: {FONTE_MONTSERRAT} !important;
 }}
 </style>
-""", unsafe_allow_html=True)
+""",
+        "logo_vipal": imagem_data_uri("Logotipo Vipal_positivo.png", largura=330),
+        "logo_fusione": imagem_data_uri("fusione_logo_v2_main.png", altura=30),
+    }
+
+# --- CONFIG PAGE ---
+st.set_page_config(page_title="Atualização de valores", layout="wide")
+
+ativos = ativos_estaticos()
+
+# --- CSS: MONTSERRAT, CENTRALIZAÇÕES, AJUSTES ---
+st.markdown(ativos["css"], unsafe_allow_html=True)
 
 # --- LOGO VIPAL (ESQUERDA, GRANDE) ---
-st.markdown("""
+st.markdown(f"""
 <div style="display:flex;align-items:center;gap:40px;">
-    <img src="https://raw.githubusercontent.com/ggrighi15/Atualizar_Selic/main/Logotipo%20Vipal_positivo.png" width="330" style="margin-bottom: -16px;"/>
+    <img src="{ativos['logo_vipal']}" width="330" style="margin-bottom: -16px;"/>
 </div>
 """, unsafe_allow_html=True)
 
@@ -128,6 +385,22 @@ indice_nome = st.selectbox(
     help="Selecione o índice desejado"
 )
 
+modo_exato = st.checkbox(
+    "Cálculo exato (centavos inteiros, fatores truncados como na calculadora do Bacen)",
+    value=False,
+    key="modo_exato",
+    help="Mais lento que o cálculo padrão em ponto flutuante, mas sem diferenças de centavos"
+)
+
+modo_pro_rata = st.checkbox(
+    "Pro rata die nos índices mensais (IPCA, IGPM)",
+    value=False,
+    key="modo_pro_rata",
+    disabled=modo_exato,
+    help="Meses incompletos no início e no fim do período contam pela fração de dias corridos, "
+         "em vez de só meses inteiros (o cálculo exato conta só meses inteiros)"
+) and not modo_exato
+
 # --- TÍTULO DINÂMICO E FONTE DO ÍNDICE (JS) ---
 st.markdown(f"""
 <script>
@@ -147,10 +420,10 @@ st.markdown(f"""<div style='text-align:center;font-weight:700;color:{VIPAL_AZUL}
 
 uploaded_file = st.file_uploader(
     "Selecione ou arraste seu arquivo Excel",
-    type=["xlsx"],
+    type=[extensao.lstrip(".") for extensao in EXTENSOES],
     key="file",
     label_visibility='collapsed',
-    help="Selecione ou arraste seu arquivo Excel"
+    help="Excel (.xlsx), CSV, Parquet ou Feather/Arrow; nos formatos colunares datas e valores já vêm tipados"
 )
 
 # --- CAMPOS INDIVIDUAIS (SÓ SE NÃO HOUVER UPLOAD) ---
@@ -187,43 +460,29 @@ if not uploaded_file:
         type="primary"
     )
     st.markdown("</div></div>", unsafe_allow_html=True)
-    mensagem = ""
     if calcular:
-        dt_ini = validar_data(data_inicial_formatada)
-        dt_fim = validar_data(data_final_formatada)
-        try:
-            valor = parse_valor(valor_base)
-        except Exception:
-            valor = None
-        if not (dt_ini and dt_fim and valor_base.strip() and valor is not None and valor > 0):
-            mensagem = "Verifique os dados. Formato correto: dd/mm/aaaa e valor em reais."
-            st.markdown(
-                f"<div style='margin:18px auto 0 auto;padding:20px;background:#fff;color:{VIPAL_VERMELHO};border:2px solid {VIPAL_VERMELHO};border-radius:10px;width:100%;max-width:650px;text-align:center;font-family:Montserrat,sans-serif;'>{mensagem}</div>",
-                unsafe_allow_html=True
-            )
-        elif dt_ini > dt_fim:
-            mensagem = "A data final deve ser posterior à data inicial."
+        atualizado, mensagem = atualizar_individual(valor_base, data_inicial_formatada, data_final_formatada,
+                                                    indice_nome, exato=modo_exato, pro_rata=modo_pro_rata)
+        if mensagem:
             st.markdown(
                 f"<div style='margin:18px auto 0 auto;padding:20px;background:#fff;color:{VIPAL_VERMELHO};border:2px solid {VIPAL_VERMELHO};border-radius:10px;width:100%;max-width:650px;text-align:center;font-family:Montserrat,sans-serif;'>{mensagem}</div>",
                 unsafe_allow_html=True
             )
         else:
-            atualizado = calcular_indice(valor, data_inicial_formatada, data_final_formatada, indice_nome)
-            mensagem = f"Valor atualizado: R$ {atualizado:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+            mensagem = f"Valor atualizado: R$ {formatar_valor_monetario(atualizado)}"
             st.markdown(
                 f"<div style='margin:24px auto 0 auto;padding:20px;background:{VIPAL_AZUL};color:#fff;font-weight:700;border-radius:12px;width:100%;max-width:650px;text-align:center;font-family:Montserrat,sans-serif;font-size:1.27rem;'>{mensagem}</div>",
                 unsafe_allow_html=True
             )
 
 # --- ATUALIZAÇÃO EM MASSA ---
-st.markdown(f"""<div style='text-align:center;font-family:Montserrat,sans-serif;font-size:1.08rem;margin:20px 0 5px 0;'>Colunas obrigatórias: data_inicial (dd/mm/aaaa), data_final (dd/mm/aaaa), valor (1.000,00)</div>""", unsafe_allow_html=True)
+st.markdown(f"""<div style='text-align:center;font-family:Montserrat,sans-serif;font-size:1.08rem;margin:20px 0 5px 0;'>Colunas obrigatórias: data_inicial (dd/mm/aaaa), data_final (dd/mm/aaaa), valor (1.000,00); opcional: indice (Selic, IPCA, CDI ou IGPM)</div>""", unsafe_allow_html=True)
 
-exemplo_df = exemplo_excel()
-exemplo_bytes = gerar_excel(exemplo_df)
 st.markdown("<div style='display:flex;justify-content:center;'><div style='width:100%;max-width:650px;'>", unsafe_allow_html=True)
+# A planilha modelo só é montada quando o download é pedido
 st.download_button(
     "Exportar dados ou arquivo de exemplo",
-    exemplo_bytes,
+    exemplo_xlsx,
     file_name="exemplo_atualizacao.xlsx",
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     use_container_width=True,
@@ -233,52 +492,133 @@ st.markdown("</div></div>", unsafe_allow_html=True)
 
 # --- PROCESSAMENTO EM MASSA ---
 if uploaded_file:
+    from atualizacao.cache import cache_fatores
+    from atualizacao.composicao import Composicao
+    from atualizacao.exportacao import FORMATOS
+    from atualizacao.formatos import formatar_valores
+    from atualizacao.indices import obter_tabelas
+
+    instrumentacao = Instrumentacao()
+    erro = None
     try:
-        df_entrada = pd.read_excel(uploaded_file)
-        # Normaliza nomes (case insensitive)
-        cols = [c.lower().strip() for c in df_entrada.columns]
-        col_map = {
-            'data_inicial': [c for c in cols if 'data_in' in c or 'inicio' in c][0],
-            'data_final': [c for c in cols if 'data_f' in c or 'final' in c][0],
-            'valor': [c for c in cols if 'valor' in c][0],
-        }
-        df_entrada = df_entrada.rename(columns={col_map['data_inicial']: 'data_inicial',
-                                                col_map['data_final']: 'data_final',
-                                                col_map['valor']: 'valor'})
-        df_entrada["data_inicial"] = df_entrada["data_inicial"].apply(normalizar_data)
-        df_entrada["data_final"] = df_entrada["data_final"].apply(normalizar_data)
-        df_entrada["valor"] = df_entrada["valor"].astype(str).apply(parse_valor)
+        formato_saida = st.selectbox(
+            "Formato do resultado",
+            list(FORMATOS.keys()),
+            index=0,
+            key="formato_saida",
+            help="Excel (.xlsx) ou CSV separado por ponto e vírgula, com valores em reais; "
+                 "Parquet ou Feather, com valores numéricos"
+        )
+        todos_indices = st.checkbox(
+            "Calcular todos os índices lado a lado",
+            value=False,
+            key="todos_indices",
+            help="Uma coluna de valor atualizado por índice. Sem esta opção, uma coluna 'indice' no arquivo "
+                 "define o índice de cada linha (as linhas em branco usam o índice escolhido acima)"
+        )
+        composicao = st.text_input(
+            "Juros e multa (opcional)",
+            key="composicao",
+            placeholder="correcao+juros_simples:1+multa:2",
+            help="Etapas separadas por '+': correcao, juros_simples:<% a.m.>, juros_compostos:<% a.m.>, "
+                 "multa:<%>. Juros pro rata die; ':mensal' conta só meses completos; '@coluna' lê a taxa "
+                 "de cada linha numa coluna do arquivo. O resultado sai na coluna valor_final"
+        )
+        Composicao.ler(composicao)
         calcular_massa = st.button("Calcular valores em massa", use_container_width=True, type="primary")
-        if calcular_massa:
-            df_entrada["valor_atualizado"] = [
-                calcular_indice(v, di, df, indice_nome)
-                if validar_data(di) and validar_data(df) and v > 0 else None
-                for v, di, df in zip(df_entrada["valor"], df_entrada["data_inicial"], df_entrada["data_final"])
-            ]
-            # Formata resultado para reais
-            df_entrada["valor_atualizado"] = df_entrada["valor_atualizado"].apply(
-                lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if pd.notnull(x) else ""
+        chave_arquivo = hash_upload(uploaded_file)
+        if st.session_state.pop("massa_cancelada", False) and not calcular_massa:
+            st.info("Cálculo cancelado.")
+        # Depois do primeiro cálculo, trocar índice ou modo recalcula a partir do cache, sem novo clique
+        if calcular_massa or st.session_state.get("massa_calculada") == chave_arquivo:
+            st.session_state["massa_calculada"] = chave_arquivo
+            # As linhas podem usar qualquer índice: a versão de cada série entra na chave do cache
+            tabelas = obter_tabelas()
+            versoes = tuple((nome, tabelas[nome].versao if nome in tabelas else None) for nome in INDICES)
+            instrumentacao.rotulos.update(indice="todos" if todos_indices else indice_nome, exato=modo_exato,
+                                          pro_rata=modo_pro_rata)
+            area_progresso = st.empty()
+            with area_progresso.container():
+                barra = st.progress(0.0, text="Preparando...")
+                st.button("Cancelar cálculo", key="cancelar_massa", on_click=cancelar_massa)
+
+            def calcular_em_massa():
+                andamento = Andamento(linhas_estimadas(chave_arquivo, uploaded_file.name, uploaded_file))
+                return em_segundo_plano(
+                    partial(resultado_em_massa, chave_arquivo, uploaded_file.name, indice_nome, todos_indices,
+                            composicao.strip(), modo_exato, modo_pro_rata, versoes, uploaded_file,
+                            instrumentacao, andamento),
+                    andamento, barra,
+                )
+
+            with instrumentacao:
+                resultado, colunas, totais, esquema, relatorio = calcular_em_massa()
+                if not resultado.existe():
+                    # Resultado em cache cujos arquivos já saíram da pasta temporária: recalcula
+                    resultado_em_massa.clear()
+                    resultado, colunas, totais, esquema, relatorio = calcular_em_massa()
+                area_progresso.empty()
+                painel_validacao(esquema, relatorio)
+                # Totais por índice e uma página da prévia; o resultado completo só sai pela exportação
+                totais["variacao_pct"] = (totais.get("valor_final", totais["valor_atualizado"])
+                                          / totais["valor_original"] - 1) * 100
+                st.dataframe(
+                    totais,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "valor_original": st.column_config.NumberColumn("valor original", format="R$ %.2f"),
+                        "valor_atualizado": st.column_config.NumberColumn("valor atualizado", format="R$ %.2f"),
+                        "valor_final": st.column_config.NumberColumn("valor final", format="R$ %.2f"),
+                        "variacao_pct": st.column_config.NumberColumn("variação", format="%.2f%%"),
+                    },
+                )
+                total_linhas = int(totais["linhas"].sum())
+                paginas = max(-(-total_linhas // PREVIA_LINHAS_PAGINA), 1)
+                pagina = st.number_input(
+                    f"Página da prévia ({PREVIA_LINHAS_PAGINA} linhas por página, {paginas} páginas)",
+                    min_value=1, max_value=paginas, value=1, step=1, key=f"pagina_previa_{chave_arquivo}",
+                )
+                previa = pagina_resultado(resultado, int(pagina))
+                with instrumentacao.etapa("exibicao", len(previa)):
+                    previa = previa.assign(**{c: formatar_valores(previa[c]) for c in colunas})
+                    st.dataframe(
+                        previa,
+                        use_container_width=True,
+                        column_config={
+                            "data_inicial": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                            "data_final": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                        }
+                    )
+            instrumentacao.registrar_log()
+            uso_cache = cache_fatores.estatisticas()
+            st.caption(
+                f"Cache de fatores: {uso_cache['acertos']} acertos, {uso_cache['falhas']} falhas "
+                f"({uso_cache['tamanho']} pares de datas guardados)"
             )
-            st.dataframe(df_entrada, use_container_width=True)
-            # Botão de exportar resultado
+            # Botão de exportar resultado: o arquivo só é gerado quando o download é pedido
             st.markdown("<div style='display:flex;justify-content:center;'><div style='width:100%;max-width:650px;'>", unsafe_allow_html=True)
             st.download_button(
                 "Exportar resultado atualizado",
-                gerar_excel(df_entrada),
-                file_name="resultado_atualizacao.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                partial(exportar_resultado, resultado, colunas, formato_saida),
+                file_name=f"resultado_atualizacao{FORMATOS[formato_saida]['sufixo']}",
+                mime=FORMATOS[formato_saida]["mime"],
                 use_container_width=True,
                 help="Download do resultado calculado"
             )
             st.markdown("</div></div>", unsafe_allow_html=True)
     except Exception as e:
-        st.error(f"Erro ao processar o arquivo: {e}")
+        etapa = f" (etapa {instrumentacao.erro['etapa']})" if instrumentacao.erro else ""
+        st.error(f"Erro ao processar o arquivo{etapa}: {e}")
+        instrumentacao.registrar_log()
+        erro = e
+    painel_desempenho(instrumentacao, erro)
 
 # --- RODAPÉ: FUSIONE CENTRALIZADO ---
 st.markdown(
     f"""
     <div style='margin-top:2.5rem;display:flex;align-items:center;justify-content:center;gap:16px;font-family:Montserrat,sans-serif;'>
-        <img src="https://raw.githubusercontent.com/ggrighi15/Atualizar_Selic/main/fusione_logo_v2_main.png" style="height:30px;" />
+        <img src="{ativos['logo_fusione']}" style="height:30px;" />
         <span style="font-size:1.09rem;color:#555;'>Fusione Automação | por Gustavo Giovani Righi</span>
     </div>
     """,
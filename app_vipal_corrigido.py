@@ -1,83 +1,15 @@
 import streamlit as st
-import pandas as pd
-import re
-from io import BytesIO
+
+# Mesmo motor do app.py; pandas só é importado no primeiro cálculo ou download
+from atualizacao.interface import (
+    INDICES, atualizar_individual, auto_formatar_data, exemplo_xlsx, formatar_valor_monetario,
+)
 
 # --- CORES VIPAL ---
 VIPAL_AZUL = "#01438F"
 VIPAL_VERMELHO = "#E4003A"
 FONTE_MONTSERRAT = "'Montserrat', sans-serif"
 
-# --- ÍNDICES DISPONÍVEIS ---
-INDICES = {
-    "Selic": {"fonte": "Bacen"},
-    "IPCA": {"fonte": "IBGE"},
-    "CDI": {"fonte": "B3"},
-    "IGPM": {"fonte": "FGV"},
-}
-
-# --- FUNÇÕES AUXILIARES ---
-def auto_formatar_data(valor):
-    """Formata automaticamente a data inserindo barras"""
-    if not valor:
-        return ""
-    
-    # Remove tudo que não é número
-    numeros = re.sub(r"\D", "", valor)
-    
-    # Limita a 8 dígitos
-    numeros = numeros[:8]
-    
-    # Aplica formatação progressiva
-    if len(numeros) <= 2:
-        return numeros
-    elif len(numeros) <= 4:
-        return f"{numeros[:2]}/{numeros[2:]}"
-    else:
-        return f"{numeros[:2]}/{numeros[2:4]}/{numeros[4:]}"
-
-def formatar_valor_monetario(valor):
-    """Formata valor no padrão brasileiro 1.000,00"""
-    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-def parse_valor(valor):
-    """Converte string de valor para float"""
-    if not valor:
-        return 0.0
-    v = str(valor).replace('.', '').replace(',', '.')
-    return float(re.sub(r"[^\d.]", "", v)) if v else 0.0
-
-def validar_data(data):
-    """Valida se a data está no formato correto"""
-    try:
-        return pd.to_datetime(data, dayfirst=True, errors="raise")
-    except Exception:
-        return None
-
-def calcular_indice(valor_base, data_inicial, data_final, indice_nome):
-    """Calcula o valor atualizado pelo índice selecionado"""
-    dt_ini = pd.to_datetime(data_inicial, dayfirst=True)
-    dt_fim = pd.to_datetime(data_final, dayfirst=True)
-    meses = max((dt_fim.year - dt_ini.year) * 12 + dt_fim.month - dt_ini.month, 0)
-    taxas = {"Selic": 0.01, "IPCA": 0.006, "CDI": 0.008, "IGPM": 0.007}
-    tx = taxas.get(indice_nome, 0.01)
-    return valor_base * ((1 + tx) ** meses)
-
-def gerar_excel(df):
-    """Gera arquivo Excel para download"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False)
-    return output.getvalue()
-
-def exemplo_excel():
-    """Cria DataFrame de exemplo para download"""
-    return pd.DataFrame({
-        "data_inicial": ["15/03/2023"],
-        "data_final": ["09/07/2025"],
-        "valor": ["1.000,00"]
-    })
-
 # --- CONFIG PAGE ---
 st.set_page_config(page_title="Atualização de valores", layout="wide")
 
@@ -208,21 +140,10 @@ st.markdown("</div></div>", unsafe_allow_html=True)
 
 # --- RESULTADO CENTRALIZADO ---
 if calcular:
-    dt_ini = validar_data(st.session_state.data_inicial_formatada)
-    dt_fim = validar_data(st.session_state.data_final_formatada)
-    try:
-        valor = parse_valor(valor_base)
-    except Exception:
-        valor = None
-    
-    if not (dt_ini and dt_fim and valor_base.strip() and valor is not None and valor > 0):
-        mensagem = "Verifique os dados. Formato correto: dd/mm/aaaa e valor em reais."
-        st.markdown(f"<div style='margin:18px auto 0 auto;padding:20px;background:#fff;color:{VIPAL_VERMELHO};border:2px solid {VIPAL_VERMELHO};border-radius:10px;width:100%;max-width:650px;text-align:center;font-family:Montserrat,sans-serif;'>{mensagem}</div>", unsafe_allow_html=True)
-    elif dt_ini > dt_fim:
-        mensagem = "A data final deve ser posterior à data inicial."
+    atualizado, mensagem = atualizar_individual(valor_base, st.session_state.data_inicial_formatada, st.session_state.data_final_formatada, indice_nome)
+    if mensagem:
         st.markdown(f"<div style='margin:18px auto 0 auto;padding:20px;background:#fff;color:{VIPAL_VERMELHO};border:2px solid {VIPAL_VERMELHO};border-radius:10px;width:100%;max-width:650px;text-align:center;font-family:Montserrat,sans-serif;'>{mensagem}</div>", unsafe_allow_html=True)
     else:
-        atualizado = calcular_indice(valor, st.session_state.data_inicial_formatada, st.session_state.data_final_formatada, indice_nome)
         mensagem = f"Valor atualizado: R$ {formatar_valor_monetario(atualizado)}"
         st.markdown(f"<div style='margin:24px auto 0 auto;padding:20px;background:{VIPAL_AZUL};color:#fff;font-weight:700;border-radius:12px;width:100%;max-width:650px;text-align:center;font-family:Montserrat,sans-serif;font-size:1.27rem;'>{mensagem}</div>", unsafe_allow_html=True)
 
@@ -230,12 +151,10 @@ if calcular:
 st.markdown(f"""<div style='text-align:center;font-family:Montserrat,sans-serif;font-size:1.08rem;margin:20px 0 5px 0;'>Colunas obrigatórias: data_inicial (dd/mm/aaaa), data_final (dd/mm/aaaa), valor (1.000,00)</div>""", unsafe_allow_html=True)
 
 # --- BOTÃO EXPORTAR DADOS OU ARQUIVO DE EXEMPLO (CENTRALIZADO) ---
-exemplo_df = exemplo_excel()
-exemplo_bytes = gerar_excel(exemplo_df)
 st.markdown("<div style='display:flex;justify-content:center;'><div style='width:100%;max-width:510px;'>", unsafe_allow_html=True)
 st.download_button(
     "Exportar dados ou arquivo de exemplo",
-    exemplo_bytes,
+    exemplo_xlsx,
     file_name="exemplo_atualizacao.xlsx",
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     use_container_width=True,
@@ -0,0 +1,41 @@
+"""Motor de atualização de valores pelos índices Selic, IPCA, CDI e IGPM.
+
+Os nomes abaixo são importados sob demanda (PEP 562): ``import atualizacao``
+ou de um submódulo leve como ``atualizacao.interface`` não carrega pandas nem
+NumPy; o módulo de cada nome é importado no primeiro acesso a ele.
+"""
+import importlib
+
+_ORIGENS = {
+    "calcular_indice": "atualizacao.calculo",
+    "calcular_indice_lote": "atualizacao.calculo",
+    "calcular_por_indice": "atualizacao.calculo",
+    "normalizar_data": "atualizacao.calculo",
+    "parse_valor": "atualizacao.calculo",
+    "Composicao": "atualizacao.composicao",
+    "SERIES": "atualizacao.indices",
+    "BaseIndices": "atualizacao.indices",
+    "TabelaFatores": "atualizacao.indices",
+    "carregar_tabelas": "atualizacao.indices",
+    "obter_tabelas": "atualizacao.indices",
+    "publicar_tabelas": "atualizacao.indices",
+}
+
+__all__ = [
+    "SERIES", "BaseIndices", "TabelaFatores", "carregar_tabelas", "obter_tabelas", "publicar_tabelas",
+    "calcular_indice", "calcular_indice_lote", "calcular_por_indice", "normalizar_data", "parse_valor",
+    "Composicao",
+]
+
+
+def __getattr__(nome):
+    if nome not in _ORIGENS:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(_ORIGENS[nome]), nome)
+    # Os próximos acessos não passam mais por aqui
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,7 @@
+import sys
+
+from atualizacao.cli import main
+
+# Protegido para os processos do pool (start method "spawn") não rodarem a CLI de novo
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Serviço HTTP/JSON de atualização de valores (ASGI, sem framework).
+
+``app`` é uma aplicação ASGI pura: qualquer servidor ASGI a executa
+(``uvicorn atualizacao.api:app``). As tabelas de fatores são carregadas uma
+vez no evento ``lifespan`` de inicialização e todas as requisições calculam
+sobre elas, sem consultar a base a cada chamada; ``POST /recarregar`` relê a
+base depois de uma sincronização. Os vetores vêm do arquivo mapeado de
+``indices.obter_tabelas``, compartilhado entre os workers do servidor.
+
+Rotas::
+
+    GET  /saude           {"status": "ok", "indices": {"Selic": 3, ...}}
+    POST /calcular        {"indice": "Selic", "valor": "1.000,00",
+                           "data_inicial": "15/03/2023", "data_final": "09/07/2025"}
+    POST /calcular/lote   {"indice": "IPCA", "exato": false, "pro_rata": true,
+                           "itens": [{"valor": 1000, "data_inicial": "...", "data_final": "..."}, ...]}
+    POST /recarregar
+
+Datas e valores aceitam os mesmos formatos da planilha. O resultado vem em
+reais com duas casas, ou ``null`` quando a linha é inválida ou está fora da
+série. ``pro_rata`` conta pela fração de dias os meses incompletos dos
+índices mensais (não combina com ``exato``).
+
+Como o custo de cada cálculo é quase todo fixo (montar colunas e consultar o
+cache), chamadas unitárias concorrentes não são calculadas uma a uma: o
+``Agrupador`` junta as que chegam dentro de ``ESPERA_AGRUPAMENTO`` segundos e
+as calcula num único lote vetorizado por índice e modo. Lotes acima de
+``LIMIAR_THREAD`` itens são calculados numa thread (``asyncio.to_thread``)
+para não segurar o laço de eventos enquanto outras chamadas são atendidas.
+
+Uso::
+
+    python -m atualizacao.api --porta 8000      # requer o pacote uvicorn
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from atualizacao.calculo import calcular_indice_lote
+from atualizacao.formatos import normalizar_datas, parse_valores
+from atualizacao.indices import SERIES, obter_tabelas
+
+LIMIAR_THREAD = 5_000
+ESPERA_AGRUPAMENTO = 0.0005
+MAX_ITENS = 1_000_000
+MAX_CORPO = 64 * 1024 * 1024
+
+logger = logging.getLogger("atualizacao.api")
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class Servico:
+    """Estado do serviço: tabelas de fatores carregadas na inicialização"""
+
+    def __init__(self):
+        self.tabelas = {}
+
+    def carregar(self):
+        self.tabelas = obter_tabelas()
+        return self.versoes()
+
+    def versoes(self):
+        return {indice: tabela.versao for indice, tabela in self.tabelas.items()}
+
+    def calcular(self, indice, itens, exato=False, pro_rata=False):
+        """Valores atualizados (em reais, duas casas; None se inválido) de uma lista de itens"""
+        df = pd.DataFrame({
+            "data_inicial": normalizar_datas(pd.Series([i.get("data_inicial") for i in itens], dtype=object)),
+            "data_final": normalizar_datas(pd.Series([i.get("data_final") for i in itens], dtype=object)),
+            "valor": parse_valores(pd.Series([i.get("valor") for i in itens], dtype=object)),
+        })
+        resultado = calcular_indice_lote(df, indice, exato=exato, tabelas=self.tabelas, pro_rata=pro_rata)
+        resultado = np.round(resultado.to_numpy(), 2)
+        return [None if np.isnan(v) else v for v in resultado.tolist()]
+
+
+class Agrupador:
+    """Junta chamadas unitárias concorrentes num só ``Servico.calcular`` por (índice, modos)"""
+
+    def __init__(self, servico, espera=ESPERA_AGRUPAMENTO):
+        self.servico = servico
+        self.espera = espera
+        self._pendentes = {}
+        self._agendado = False
+
+    async def calcular(self, indice, item, exato=False, pro_rata=False):
+        laco = asyncio.get_running_loop()
+        futuro = laco.create_future()
+        self._pendentes.setdefault((indice, exato, pro_rata), []).append((item, futuro))
+        if not self._agendado:
+            self._agendado = True
+            laco.call_later(self.espera, self._despachar)
+        return await futuro
+
+    def _despachar(self):
+        pendentes, self._pendentes, self._agendado = self._pendentes, {}, False
+        for (indice, exato, pro_rata), chamadas in pendentes.items():
+            asyncio.ensure_future(self._processar(indice, exato, pro_rata, chamadas))
+
+    async def _processar(self, indice, exato, pro_rata, chamadas):
+        itens = [item for item, _ in chamadas]
+        try:
+            if len(itens) > LIMIAR_THREAD:
+                resultados = await asyncio.to_thread(self.servico.calcular, indice, itens, exato, pro_rata)
+            else:
+                resultados = self.servico.calcular(indice, itens, exato, pro_rata)
+        except Exception as exc:
+            if len(chamadas) > 1:
+                # Um item problemático não derruba as demais chamadas do grupo
+                for chamada in chamadas:
+                    await self._processar(indice, exato, pro_rata, [chamada])
+                return
+            if not chamadas[0][1].done():
+                chamadas[0][1].set_exception(exc)
+            return
+        for (_, futuro), resultado in zip(chamadas, resultados):
+            # Quem desistiu (conexão encerrada) já teve o futuro cancelado
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+
+def _indice(corpo):
+    indice = corpo.get("indice", "Selic")
+    # Lista ou objeto no JSON nem chegam à consulta (não são chaves de dicionário)
+    if not isinstance(indice, str) or indice not in SERIES:
+        raise ErroRequisicao(400, f"índice desconhecido: {indice}")
+    return indice
+
+
+def _opcao(corpo, nome):
+    # Só booleanos JSON: bool("false") seria verdadeiro
+    valor = corpo.get(nome, False)
+    if not isinstance(valor, bool):
+        raise ErroRequisicao(400, f"'{nome}' deve ser true ou false")
+    return valor
+
+
+async def _ler_corpo(receive):
+    partes, tamanho = [], 0
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "http.disconnect":
+            raise ErroRequisicao(400, "conexão encerrada")
+        parte = mensagem.get("body", b"")
+        tamanho += len(parte)
+        if tamanho > MAX_CORPO:
+            raise ErroRequisicao(413, "corpo da requisição grande demais")
+        partes.append(parte)
+        if not mensagem.get("more_body"):
+            break
+    try:
+        corpo = json.loads(b"".join(partes) or b"{}")
+    except ValueError:
+        raise ErroRequisicao(400, "JSON inválido") from None
+    if not isinstance(corpo, dict):
+        raise ErroRequisicao(400, "o corpo deve ser um objeto JSON")
+    return corpo
+
+
+async def _responder(send, status, conteudo):
+    corpo = json.dumps(conteudo, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                    (b"content-length", str(len(corpo)).encode())],
+    })
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def _rotear(servico, agrupador, metodo, caminho, receive):
+    if caminho == "/saude" and metodo == "GET":
+        return {"status": "ok", "indices": servico.versoes()}
+    if metodo != "POST" or caminho not in ("/calcular", "/calcular/lote", "/recarregar"):
+        raise ErroRequisicao(404 if metodo in ("GET", "POST") else 405, "rota não encontrada")
+    if caminho == "/recarregar":
+        return {"status": "ok", "indices": await asyncio.to_thread(servico.carregar)}
+    corpo = await _ler_corpo(receive)
+    indice = _indice(corpo)
+    exato = _opcao(corpo, "exato")
+    pro_rata = _opcao(corpo, "pro_rata")
+    if exato and pro_rata:
+        raise ErroRequisicao(400, "o cálculo exato conta meses inteiros; 'pro_rata' não se aplica")
+    if caminho == "/calcular":
+        return {"indice": indice, "valor_atualizado": await agrupador.calcular(indice, corpo, exato, pro_rata)}
+    itens = corpo.get("itens")
+    if not isinstance(itens, list) or not all(isinstance(i, dict) for i in itens):
+        raise ErroRequisicao(400, "'itens' deve ser uma lista de objetos")
+    if len(itens) > MAX_ITENS:
+        raise ErroRequisicao(413, f"no máximo {MAX_ITENS} itens por lote")
+    if len(itens) > LIMIAR_THREAD:
+        resultados = await asyncio.to_thread(servico.calcular, indice, itens, exato, pro_rata)
+    else:
+        resultados = servico.calcular(indice, itens, exato, pro_rata)
+    return {"indice": indice, "resultados": resultados}
+
+
+def criar_app(servico=None):
+    """Aplicação ASGI sobre ``servico`` (um novo ``Servico`` se não informado)"""
+    servico = servico or Servico()
+    agrupador = Agrupador(servico)
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                mensagem = await receive()
+                if mensagem["type"] == "lifespan.startup":
+                    try:
+                        await asyncio.to_thread(servico.carregar)
+                    except Exception as exc:
+                        await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                        return
+                    await send({"type": "lifespan.startup.complete"})
+                elif mensagem["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+        try:
+            conteudo = await _rotear(servico, agrupador, scope["method"], scope["path"].rstrip("/") or "/", receive)
+            await _responder(send, 200, conteudo)
+        except ErroRequisicao as exc:
+            await _responder(send, exc.status, {"erro": str(exc)})
+        except Exception:
+            # O detalhe fica no log do servidor; o cliente recebe só a mensagem genérica
+            logger.exception("erro interno em %s %s", scope["method"], scope["path"])
+            await _responder(send, 500, {"erro": "erro interno"})
+
+    app.servico = servico
+    return app
+
+
+app = criar_app()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de atualização de valores")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--processos", type=int, default=1, help="processos do uvicorn")
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError as exc:
+        raise RuntimeError("O serviço HTTP requer o pacote uvicorn") from exc
+    uvicorn.run("atualizacao.api:app", host=args.host, port=args.porta, workers=args.processos,
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Cache LRU de fatores por ``(índice, data inicial, data final)``.
+
+Numa planilha real milhares de linhas costumam repetir o mesmo par de datas
+(todas as notas de um mesmo fechamento, por exemplo). ``CacheFatores.fatores``
+reduz a coluna aos pares distintos, consulta o cache, calcula de uma vez só os
+pares que faltam e devolve o fator de cada linha na ordem original. Os
+contadores de acertos e falhas são por par distinto consultado.
+
+O cache do processo (``cache_fatores``) sobrevive às reexecuções do Streamlit,
+como as tabelas de ``atualizacao.indices``.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+CAPACIDADE_PADRAO = 200_000
+
+_MASCARA = 0xFFFFFFFF
+_SINAL = 0x80000000
+_AUSENTE = object()
+
+
+def _empacotar(inicios, fins):
+    # Dias desde 1970 cabem em 32 bits: um inteiro por par, para deduplicar sem np.unique(axis=0)
+    inicios = np.asarray(inicios, dtype="datetime64[D]").astype("int64")
+    fins = np.asarray(fins, dtype="datetime64[D]").astype("int64")
+    return (inicios << 32) | (fins & _MASCARA)
+
+
+def _desempacotar(chaves):
+    inicios = chaves >> 32
+    fins = ((chaves & _MASCARA) ^ _SINAL) - _SINAL
+    return inicios.astype("datetime64[D]"), fins.astype("datetime64[D]")
+
+
+class CacheFatores:
+    """Fatores já calculados, com descarte do menos usado acima de ``capacidade`` pares."""
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO):
+        if capacidade < 1:
+            raise ValueError("capacidade deve ser positiva")
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._dados = OrderedDict()
+        self._trava = Lock()
+
+    def __len__(self):
+        return len(self._dados)
+
+    def fatores(self, espaco, inicios, fins, calcular, tipo=object):
+        """Fator de cada linha; ``calcular(inicios, fins)`` recebe só os pares distintos ausentes.
+
+        ``espaco`` separa fatores que não podem se misturar (índice, versão da
+        série, modo de cálculo). Datas são comparadas por dia. O resultado sai
+        com ``dtype=tipo`` (``object`` preserva os inteiros do modo exato).
+        """
+        codigos, linhas = np.unique(_empacotar(inicios, fins), return_inverse=True)
+        chaves = [(espaco, c) for c in codigos.tolist()]
+        with self._trava:
+            encontrados = [self._dados.get(chave, _AUSENTE) for chave in chaves]
+            for chave, valor in zip(chaves, encontrados):
+                if valor is not _AUSENTE:
+                    self._dados.move_to_end(chave)
+        ausentes = [i for i, valor in enumerate(encontrados) if valor is _AUSENTE]
+        if ausentes:
+            novos = calcular(*_desempacotar(codigos[ausentes]))
+            for i, valor in zip(ausentes, novos.tolist()):
+                encontrados[i] = valor
+        with self._trava:
+            self.acertos += len(chaves) - len(ausentes)
+            self.falhas += len(ausentes)
+            for i in ausentes:
+                self._dados[chaves[i]] = encontrados[i]
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+        distintos = np.empty(len(encontrados), dtype=tipo)
+        distintos[:] = encontrados
+        return distintos[linhas]
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            "tamanho": len(self._dados),
+            "capacidade": self.capacidade,
+        }
+
+    def limpar(self):
+        with self._trava:
+            self._dados.clear()
+            self.acertos = 0
+            self.falhas = 0
+
+
+cache_fatores = CacheFatores()
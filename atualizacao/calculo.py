@@ -0,0 +1,211 @@
+"""Cálculo da atualização de valores, sem dependência do Streamlit.
+
+``calcular_indice_lote`` recebe as colunas ``data_inicial``, ``data_final`` e
+``valor`` já normalizadas e devolve o valor atualizado de cada linha, usando a
+série histórica da base local quando houver e a taxa mensal de referência
+quando não houver. ``calcular_indice`` é o mesmo cálculo para um valor só.
+Blocos com a coluna ``indice`` (um índice por linha) são separados por
+``grupos_por_indice`` e cada grupo é calculado de uma vez pelo seu índice.
+Com ``pro_rata``, os índices mensais (IPCA, IGPM) contam os meses incompletos
+das pontas pela fração de dias corridos (``TabelaFatores.diario``); nos
+diários, que já contam dia a dia, não muda nada.
+A página, a linha de comando (``python -m atualizacao``) e os processos de
+``atualizacao.paralelo`` usam todos estas mesmas funções.
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from atualizacao.cache import cache_fatores
+from atualizacao.calendario import DIAS_UTEIS_ANO, dias_uteis
+from atualizacao.esquema import Esquema, converter_datas, converter_indices, converter_valores
+from atualizacao.exato import (
+    CASAS_ACUMULADO, aplicar as aplicar_exato, em_reais, fatores_exatos_referencia, fatores_exatos_tabela,
+)
+from atualizacao.formatos import normalizar_datas, parse_valores
+from atualizacao.indices import SERIES, obter_tabelas
+from atualizacao.instrumentacao import medir
+
+# Taxas mensais de referência, usadas quando a base local não tem a série
+TAXAS = {"Selic": 0.01, "IPCA": 0.006, "CDI": 0.008, "IGPM": 0.007}
+
+
+def parse_valor(valor):
+    """Valor em reais digitado ou lido da planilha (``1.000,00``, ``1000``, ``R$ -2,50``); NaN se inválido"""
+    return float(parse_valores(pd.Series([valor], dtype=object)).iloc[0])
+
+
+def normalizar_data(val):
+    """Data em ``dd/mm/aaaa``; o próprio valor quando não é uma data reconhecível"""
+    d = normalizar_datas(pd.Series([val], dtype=object)).iloc[0]
+    return d.strftime('%d/%m/%Y') if pd.notnull(d) else val
+
+
+def fator_referencia(indice_nome, periodos):
+    """Fator pela taxa mensal de referência, por dia útil (base 252) nos índices diários"""
+    tx = TAXAS.get(indice_nome, 0.01)
+    if SERIES[indice_nome]["periodicidade"] == "diaria":
+        return (1 + tx) ** (12 * periodos / DIAS_UTEIS_ANO)
+    return (1 + tx) ** periodos
+
+
+def _meses_fracionarios(datas):
+    # Meses desde 1970 com a fração já decorrida do mês (dia 1 = mês inteiro por decorrer)
+    meses = datas.astype("datetime64[M]")
+    dias = datas.astype("datetime64[D]")
+    decorridos = (dias - meses.astype("datetime64[D]")).astype("float64")
+    dias_mes = ((meses + 1).astype("datetime64[D]") - meses.astype("datetime64[D]")).astype("float64")
+    return meses.astype("int64") + decorridos / dias_mes
+
+
+def fatores_pares(indice_nome, tabela, inicios, fins, exato=False, pro_rata=False):
+    """Fator de cada par de datas (já sem repetição); no modo exato, inteiros em ponto fixo"""
+    diaria = SERIES[indice_nome]["periodicidade"] == "diaria"
+    pro_rata = pro_rata and not diaria
+    if exato and pro_rata:
+        raise ValueError("o cálculo exato conta meses inteiros; desative o pro rata die")
+    if tabela is not None:
+        if exato:
+            return fatores_exatos_tabela(tabela, inicios, fins)[0]
+        return tabela.fator(inicios, fins, pro_rata=pro_rata)
+    # Série histórica ausente na base local: taxa de referência
+    if diaria:
+        periodos = dias_uteis(inicios, fins)
+    elif pro_rata:
+        periodos = np.maximum(_meses_fracionarios(fins) - _meses_fracionarios(inicios), 0)
+    else:
+        periodos = inicios.astype("datetime64[M]").astype("int64")
+        periodos = fins.astype("datetime64[M]").astype("int64") - periodos
+    if not pro_rata:
+        periodos = np.maximum(periodos, 0).astype("int64")
+    if exato:
+        return fatores_exatos_referencia(indice_nome, TAXAS.get(indice_nome, 0.01), periodos, diaria)[0]
+    # Poucos prazos distintos: o fator é calculado uma vez por prazo e distribuído aos pares
+    prazos, posicoes = np.unique(periodos, return_inverse=True)
+    return np.array([fator_referencia(indice_nome, p) for p in prazos.tolist()], dtype="float64")[posicoes]
+
+
+def calcular_indice_lote(df, indice_nome, exato=False, tabelas=None, pro_rata=False):
+    """Valor atualizado de cada linha de ``df``; NaN onde datas ou valor são inválidos.
+
+    ``tabelas`` substitui as tabelas da base local (``obter_tabelas()``), como
+    nos processos de ``atualizacao.paralelo``, que as recebem mapeadas em memória.
+    ``pro_rata`` conta pela fração de dias os meses incompletos nos índices mensais.
+    """
+    dt_ini = pd.to_datetime(df["data_inicial"], format="%d/%m/%Y", errors="coerce").to_numpy()
+    dt_fim = pd.to_datetime(df["data_final"], format="%d/%m/%Y", errors="coerce").to_numpy()
+    valores = pd.to_numeric(df["valor"], errors="coerce").to_numpy(dtype="float64")
+    validos = ~np.isnat(dt_ini) & ~np.isnat(dt_fim) & (valores > 0)
+    tabela = (obter_tabelas() if tabelas is None else tabelas).get(indice_nome)
+    pro_rata = pro_rata and SERIES[indice_nome]["periodicidade"] == "mensal"
+    espaco = (indice_nome, exato, pro_rata, tabela.versao if tabela is not None else "referencia")
+    # Fatores por par distinto de datas, via cache, distribuídos às linhas.
+    # Modo exato guarda inteiros do Python (dtype object); o padrão, float64
+    tipo = object if exato else "float64"
+    fatores = np.full(len(df), np.nan, dtype=tipo)
+    if validos.any():
+        fatores[validos] = cache_fatores.fatores(
+            espaco, dt_ini[validos], dt_fim[validos],
+            lambda inicios, fins: fatores_pares(indice_nome, tabela, inicios, fins, exato, pro_rata),
+            tipo=tipo,
+        )
+    if exato:
+        # Centavos inteiros e fatores em ponto fixo truncados como na calculadora oficial
+        centavos = aplicar_exato(np.where(validos, valores, np.nan), fatores, CASAS_ACUMULADO)
+        return pd.Series(em_reais(centavos), index=df.index, name="valor_atualizado")
+    resultado = np.where(validos, valores * fatores, np.nan)
+    return pd.Series(resultado, index=df.index, name="valor_atualizado")
+
+
+def calcular_indice(valor_base, data_inicial, data_final, indice_nome, exato=False, pro_rata=False):
+    """Valor atualizado de um único valor; mesmo caminho (e cache de fatores) do lote"""
+    df = pd.DataFrame({
+        "data_inicial": [pd.to_datetime(data_inicial, dayfirst=True)],
+        "data_final": [pd.to_datetime(data_final, dayfirst=True)],
+        "valor": [valor_base],
+    })
+    return float(calcular_indice_lote(df, indice_nome, exato=exato, pro_rata=pro_rata).iloc[0])
+
+
+def mapear_colunas(colunas):
+    """Nome original das colunas de data inicial, data final e valor (sem diferenciar maiúsculas)"""
+    cols = {str(c).lower().strip(): c for c in colunas}
+    candidatos = {
+        'data_inicial': [cols[c] for c in cols if 'data_in' in c or 'inicio' in c],
+        'data_final': [cols[c] for c in cols if 'data_f' in c or 'final' in c],
+        'valor': [cols[c] for c in cols if 'valor' in c],
+    }
+    ausentes = [nome for nome, achados in candidatos.items() if not achados]
+    if ausentes:
+        raise ValueError(f"coluna obrigatória ausente: {', '.join(ausentes)}")
+    return {nome: achados[0] for nome, achados in candidatos.items()}
+
+
+def preparar_bloco(df, esquema, instrumentacao=None):
+    """Renomeia as colunas do esquema e converte datas e valores pelo formato detectado.
+
+    ``esquema`` é o ``Esquema`` de ``detectar_esquema`` ou o dicionário de
+    ``mapear_colunas``; neste caso, sem formato conhecido, cada coluna passa
+    pela normalização completa.
+    """
+    if not isinstance(esquema, Esquema):
+        esquema = Esquema(esquema, dict.fromkeys(esquema, "misto"))
+    col_map = esquema.colunas
+    df = df.rename(columns={col_map['data_inicial']: 'data_inicial',
+                            col_map['data_final']: 'data_final',
+                            col_map['valor']: 'valor'})
+    with medir(instrumentacao, "normalizar_datas", len(df)):
+        df["data_inicial"] = converter_datas(df["data_inicial"], esquema.formatos["data_inicial"])
+        df["data_final"] = converter_datas(df["data_final"], esquema.formatos["data_final"])
+    with medir(instrumentacao, "parse_valores", len(df)):
+        df["valor"] = converter_valores(df["valor"], esquema.formatos["valor"])
+    if "indice" in col_map:
+        df = df.rename(columns={col_map["indice"]: "indice"})
+        df["indice"] = converter_indices(df["indice"])
+    return df
+
+
+def indices_por_linha(df, indice_padrao):
+    """Índice de cada linha: a coluna ``indice``, se houver, com ``indice_padrao`` onde estiver em branco"""
+    if "indice" not in df.columns:
+        return pd.Series(indice_padrao, index=df.index, dtype=object)
+    return df["indice"].fillna(indice_padrao)
+
+
+def grupos_por_indice(df, indice_padrao):
+    """Posições das linhas de cada índice conhecido; ``{indice_padrao: None}`` (todas) sem a coluna ``indice``"""
+    if "indice" not in df.columns:
+        return {indice_padrao: None}
+    codigos, nomes = pd.factorize(indices_por_linha(df, indice_padrao))
+    return {nome: np.flatnonzero(codigos == numero) for numero, nome in enumerate(nomes) if nome in SERIES}
+
+
+def calcular_por_indice(df, indice_padrao, exato=False, tabelas=None, pro_rata=False):
+    """Como ``calcular_indice_lote``, mas respeitando a coluna ``indice``; NaN onde o índice é desconhecido"""
+    grupos = grupos_por_indice(df, indice_padrao)
+    if list(grupos.values()) == [None]:
+        return calcular_indice_lote(df, indice_padrao, exato=exato, tabelas=tabelas, pro_rata=pro_rata)
+    resultado = np.full(len(df), np.nan)
+    for indice, posicoes in grupos.items():
+        resultado[posicoes] = calcular_indice_lote(
+            df.iloc[posicoes], indice, exato=exato, tabelas=tabelas, pro_rata=pro_rata,
+        ).to_numpy()
+    return pd.Series(resultado, index=df.index, name="valor_atualizado")
+
+
+def gerar_excel(df):
+    """Conteúdo ``.xlsx`` do ``DataFrame`` (para tabelas pequenas; o resultado em massa usa ``ExportadorBlocos``)"""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False)
+    return output.getvalue()
+
+
+def exemplo_excel():
+    """Planilha modelo com as colunas esperadas na atualização em massa"""
+    return pd.DataFrame({
+        "data_inicial": ["15/03/2023"],
+        "data_final": ["09/07/2025"],
+        "valor": ["1.000,00"]
+    })
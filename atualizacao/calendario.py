@@ -0,0 +1,76 @@
+"""Calendário de dias úteis (feriados nacionais) para a capitalização diária de Selic e CDI.
+
+A tabela de feriados é gerada uma única vez na importação, de ``ANO_INICIAL`` a
+``ANO_FINAL``, com as mesmas regras do calendário ANBIMA: feriados fixos,
+Carnaval, Sexta-feira Santa e Corpus Christi (e 20/11 a partir de 2024).
+
+Além do ``numpy.busdaycalendar`` equivalente, o módulo mantém um vetor denso
+com a contagem acumulada de dias úteis por dia corrido. Contar os dias úteis de
+``[inicio, fim)`` ou achar a posição de uma data numa série diária vira uma
+subtração de duas consultas ao vetor, para qualquer quantidade de linhas.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+ANO_INICIAL = 1980
+ANO_FINAL = 2100
+DIAS_UTEIS_ANO = 252
+
+FERIADOS_FIXOS = [(1, 1), (4, 21), (5, 1), (9, 7), (10, 12), (11, 2), (11, 15), (12, 25)]
+
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)"""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    m = (32 + 2 * e + 2 * i - h - k) % 7
+    n = (a + 11 * h + 22 * m) // 451
+    mes, dia = divmod(h + m - 7 * n + 114, 31)
+    return date(ano, mes, dia + 1)
+
+
+def feriados_do_ano(ano):
+    domingo = pascoa(ano)
+    dias = [date(ano, mes, dia) for mes, dia in FERIADOS_FIXOS]
+    if ano >= 2024:
+        dias.append(date(ano, 11, 20))
+    dias += [domingo + timedelta(days=delta) for delta in (-48, -47, -2, 60)]
+    return dias
+
+
+FERIADOS = np.array(
+    sorted({d for ano in range(ANO_INICIAL, ANO_FINAL + 1) for d in feriados_do_ano(ano)}),
+    dtype="datetime64[D]",
+)
+CALENDARIO = np.busdaycalendar(holidays=FERIADOS)
+
+ORIGEM = np.datetime64(f"{ANO_INICIAL}-01-01", "D")
+_FIM = np.datetime64(f"{ANO_FINAL + 1}-01-01", "D")
+# DIAS_UTEIS_ACUMULADOS[d - ORIGEM] = dias úteis em [ORIGEM, d)
+_uteis = np.is_busday(np.arange(ORIGEM, _FIM, dtype="datetime64[D]"), busdaycal=CALENDARIO)
+DIAS_UTEIS_ACUMULADOS = np.concatenate(([0], np.cumsum(_uteis))).astype("int32")
+del _uteis
+
+
+def eh_dia_util(datas):
+    return np.is_busday(np.asarray(datas, dtype="datetime64[D]"), busdaycal=CALENDARIO)
+
+
+def posicoes(datas):
+    """Dias úteis desde ``ORIGEM`` até cada data (exclusive); -1 fora do calendário"""
+    dias = (np.asarray(datas, dtype="datetime64[ns]").astype("datetime64[D]") - ORIGEM).astype("int64")
+    validos = (dias >= 0) & (dias < len(DIAS_UTEIS_ACUMULADOS))
+    return np.where(validos, DIAS_UTEIS_ACUMULADOS[np.where(validos, dias, 0)], -1)
+
+
+def dias_uteis(inicio, fim):
+    """Quantidade de dias úteis em ``[inicio, fim)``; -1 quando alguma data está fora do calendário"""
+    p_inicio = posicoes(inicio)
+    p_fim = posicoes(fim)
+    return np.where((p_inicio >= 0) & (p_fim >= 0), p_fim - p_inicio, -1)
@@ -0,0 +1,230 @@
+"""Atualização em massa pela linha de comando, sem navegador nem Streamlit.
+
+Recebe arquivos ``.xlsx``, ``.csv``, ``.parquet`` ou ``.feather``/``.arrow``,
+pastas (todos os arquivos desses tipos de dentro) ou padrões glob, e grava um
+resultado por arquivo de entrada. Cada
+arquivo é lido em blocos e os blocos são calculados em lotes de até
+``trabalhadores * tamanho_pedaco`` linhas pelo pool de ``atualizacao.paralelo``
+e gravados antes da leitura do lote seguinte, de modo que a memória depende
+do tamanho do lote e não do arquivo.
+
+Cada arquivo é medido por etapa (``atualizacao.instrumentacao``): com
+``--log-json`` o tempo, as linhas por segundo e o pico de RSS de cada etapa vão
+para a saída de erros em linhas JSON; com ``--metricas`` as mesmas medidas são
+gravadas no formato texto do Prometheus (coletor de arquivos do node_exporter).
+
+As colunas e os formatos de cada arquivo são detectados pelas primeiras linhas
+(``atualizacao.esquema``); as linhas com problema (data ou valor em branco ou
+não reconhecido, período invertido, fora da série) são contadas e, com
+``--relatorio-validacao``, listadas num CSV ao lado do resultado. Nos índices
+mensais a taxa do mês da data final entra no cálculo: data final no mês
+corrente, antes da publicação do IPCA ou do IGP-M, fica sem resultado e é
+avisada à parte (``indice_nao_publicado``). Uma coluna
+``indice`` na entrada define o índice de cada linha (``--indice`` vale para as
+linhas em branco); ``--todos-indices`` grava uma coluna de resultado por índice.
+``--composicao`` acrescenta juros e multa ao valor corrigido
+(``atualizacao.composicao``), na coluna ``valor_final``; ``--pro-rata`` conta
+pela fração de dias os meses incompletos nos índices mensais (IPCA, IGPM).
+
+Uso::
+
+    python -m atualizacao entrada/*.xlsx --indice Selic --saida resultados --formato csv
+    python -m atualizacao exportacao_erp.parquet --formato parquet
+    python -m atualizacao pasta_mensal --indice IPCA --trabalhadores 8 --exato
+    python -m atualizacao entrada --log-json --metricas /var/lib/node_exporter/atualizacao.prom
+    python -m atualizacao entrada/*.csv --relatorio-validacao
+    python -m atualizacao contratos.xlsx --todos-indices --formato parquet
+    python -m atualizacao acordos.xlsx --indice IPCA --composicao "correcao+juros_simples:1+multa:2"
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from atualizacao.calculo import indices_por_linha, preparar_bloco
+from atualizacao.composicao import Composicao
+from atualizacao.esquema import MOTIVOS, detectar_esquema, juntar_relatorio, validar_bloco, validar_resultado
+from atualizacao.exportacao import (
+    FORMATOS, ExportadorBlocos, coluna_final, coluna_resultado, colunas_calculo, colunas_resultado,
+)
+from atualizacao.indices import SERIES
+from atualizacao.instrumentacao import Instrumentacao, medir, prometheus
+from atualizacao.leitura import EXTENSOES, TAMANHO_BLOCO, ler_em_blocos
+from atualizacao.paralelo import CalculadoraParalela
+
+
+def listar_entradas(padroes):
+    """Arquivos suportados (``leitura.EXTENSOES``) de cada caminho, pasta ou glob, sem repetição e na ordem informada"""
+    arquivos = []
+    for padrao in padroes:
+        caminho = Path(padrao)
+        if caminho.is_dir():
+            encontrados = sorted(p for p in caminho.iterdir() if p.suffix.lower() in EXTENSOES)
+        elif caminho.is_file():
+            encontrados = [caminho]
+        else:
+            encontrados = sorted(Path(p) for p in glob.glob(padrao, recursive=True))
+        for arquivo in encontrados:
+            # Arquivos temporários do Excel (~$planilha.xlsx) ficam de fora
+            if arquivo.suffix.lower() in EXTENSOES and not arquivo.name.startswith("~$") and arquivo not in arquivos:
+                arquivos.append(arquivo)
+    return arquivos
+
+
+def processar_arquivo(entrada, destino, indice_nome, calculadora, formato="xlsx", exato=False,
+                      tamanho_bloco=TAMANHO_BLOCO, instrumentacao=None, relatorio=None, todos_indices=False,
+                      composicao=None, pro_rata=False):
+    """Atualiza ``entrada`` e grava o resultado em ``destino``; devolve a quantidade de linhas.
+
+    Os problemas de validação de cada bloco são acrescentados à lista ``relatorio``, se informada.
+    Com ``todos_indices``, grava uma coluna ``valor_atualizado_<índice>`` por índice de ``SERIES``.
+    ``composicao`` (``Composicao``) acrescenta ``valor_final`` (ou ``valor_final_<índice>``) com juros e multa.
+    """
+    compor = composicao is not None and not composicao.so_correcao
+    colunas = colunas_calculo(indice_nome, SERIES if todos_indices else None)
+    formatadas = colunas_resultado(colunas, compor)
+    esquema = None
+
+    def preparados():
+        nonlocal esquema
+        lidos = ler_em_blocos(entrada, tamanho_bloco)
+        if instrumentacao is not None:
+            lidos = instrumentacao.iterar("leitura", lidos)
+        for bloco in lidos:
+            if esquema is None:
+                esquema = detectar_esquema(bloco)
+                if compor:
+                    composicao.verificar(bloco.columns)
+            preparado = preparar_bloco(bloco, esquema, instrumentacao)
+            if relatorio is not None:
+                with medir(instrumentacao, "validacao", len(bloco)):
+                    relatorio.append(validar_bloco(bloco, preparado, esquema))
+            yield preparado
+
+    with ExportadorBlocos(formato, destino) as saida:
+        for lote in calculadora.lotes(preparados()):
+            linhas = sum(len(bloco) for bloco in lote)
+            for coluna, indice in colunas.items():
+                with medir(instrumentacao, "calculo", linhas):
+                    resultados = calculadora.calcular_blocos(lote, indice, exato=exato, por_linha=not todos_indices,
+                                                             pro_rata=pro_rata)
+                for bloco, resultado in zip(lote, resultados):
+                    if relatorio is not None:
+                        indices = indice if todos_indices else indices_por_linha(bloco, indice)
+                        relatorio.append(validar_resultado(bloco, resultado, coluna if todos_indices else None,
+                                                           indices, pro_rata=pro_rata))
+                    bloco[coluna] = resultado
+            for bloco in lote:
+                if compor:
+                    with medir(instrumentacao, "composicao", len(bloco)):
+                        fator = composicao.fator(bloco)
+                        for coluna in colunas:
+                            bloco[coluna_final(coluna)] = composicao.aplicar(bloco, bloco[coluna], fator)
+                with medir(instrumentacao, "formatacao", len(bloco)):
+                    for coluna in formatadas:
+                        bloco[coluna] = coluna_resultado(bloco[coluna], formato)
+                with medir(instrumentacao, "exportacao", len(bloco)):
+                    saida.escrever(bloco)
+    return saida.linhas
+
+
+def gravar_metricas(caminho, instrumentacoes):
+    """Grava as métricas no formato do Prometheus, trocando o arquivo de uma vez (sem leitura parcial)"""
+    caminho = Path(caminho)
+    temporario = caminho.with_name(f".{caminho.name}.tmp")
+    temporario.write_text(prometheus(instrumentacoes), encoding="utf-8")
+    os.replace(temporario, caminho)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m atualizacao",
+        description="Atualiza arquivos .xlsx/.csv/.parquet/.feather pelo índice escolhido, sem abrir o navegador",
+    )
+    parser.add_argument("entradas", nargs="+", help="arquivos, pastas ou padrões glob (ex.: 'entrada/*.xlsx')")
+    parser.add_argument("--indice", choices=list(SERIES), default="Selic",
+                        help="índice das linhas sem a coluna 'indice' ou com ela em branco")
+    parser.add_argument("--todos-indices", action="store_true",
+                        help="uma coluna de resultado por índice, lado a lado")
+    parser.add_argument("--saida", default=None,
+                        help="pasta dos resultados (padrão: a pasta de cada arquivo de entrada)")
+    parser.add_argument("--formato", choices=list(FORMATOS), default="xlsx")
+    parser.add_argument("--sufixo", default="_atualizado", help="acrescentado ao nome de cada resultado")
+    parser.add_argument("--trabalhadores", type=int, default=None,
+                        help="processos de cálculo (padrão: ATUALIZACAO_TRABALHADORES ou o número de CPUs)")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO, help="linhas lidas por bloco")
+    parser.add_argument("--exato", action="store_true", help="centavos inteiros e fatores truncados")
+    parser.add_argument("--pro-rata", action="store_true",
+                        help="meses incompletos pela fração de dias corridos nos índices mensais (IPCA, IGPM)")
+    parser.add_argument("--log-json", action="store_true",
+                        help="tempo, linhas/s e pico de RSS de cada etapa em linhas JSON na saída de erros")
+    parser.add_argument("--metricas", default=None, metavar="ARQUIVO.prom",
+                        help="grava as medidas por etapa no formato texto do Prometheus")
+    parser.add_argument("--composicao", default=None, metavar="ETAPAS",
+                        help="juros e multa sobre o valor corrigido, ex.: 'correcao+juros_simples:1+multa:2'")
+    parser.add_argument("--relatorio-validacao", action="store_true",
+                        help="grava as linhas com problema de cada arquivo em <nome>_validacao<sufixo>.csv")
+    args = parser.parse_args(argv)
+    if args.exato and args.pro_rata:
+        parser.error("o cálculo exato conta meses inteiros; --pro-rata não se aplica")
+    try:
+        composicao = Composicao.ler(args.composicao) if args.composicao else None
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.log_json:
+        logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    # Resultados de execuções anteriores na mesma pasta não são reprocessados
+    arquivos = [a for a in listar_entradas(args.entradas) if not a.stem.endswith(args.sufixo)]
+    if not arquivos:
+        parser.error("nenhum arquivo .xlsx, .csv, .parquet ou .feather encontrado")
+    pasta_saida = Path(args.saida) if args.saida else None
+    if pasta_saida:
+        pasta_saida.mkdir(parents=True, exist_ok=True)
+
+    falhas = 0
+    medicoes = []
+    with CalculadoraParalela(args.trabalhadores) as calculadora:
+        for entrada in arquivos:
+            nome = f"{entrada.stem}{args.sufixo}{FORMATOS[args.formato]['sufixo']}"
+            destino = (pasta_saida or entrada.parent) / nome
+            instrumentacao = Instrumentacao({"arquivo": entrada.name,
+                                             "indice": "todos" if args.todos_indices else args.indice})
+            medicoes.append(instrumentacao)
+            partes = []
+            inicio = time.perf_counter()
+            try:
+                with instrumentacao:
+                    linhas = processar_arquivo(
+                        entrada, destino, args.indice, calculadora, args.formato, args.exato, args.tamanho_bloco,
+                        instrumentacao, partes, args.todos_indices, composicao, args.pro_rata,
+                    )
+            except Exception as exc:
+                falhas += 1
+                etapa = f" (etapa {instrumentacao.erro['etapa']})" if instrumentacao.erro else ""
+                print(f"{entrada}: erro{etapa}: {exc}", file=sys.stderr)
+                continue
+            finally:
+                if args.log_json:
+                    instrumentacao.registrar_log()
+            relatorio = juntar_relatorio(partes)
+            problemas = f", {relatorio['linha'].nunique()} com problema" if len(relatorio) else ""
+            print(f"{entrada}: {linhas} linhas{problemas} em {time.perf_counter() - inicio:.1f}s -> {destino}")
+            nao_publicadas = relatorio.loc[relatorio["motivo"] == "indice_nao_publicado", "linha"].nunique()
+            if nao_publicadas:
+                print(f"{entrada}: {nao_publicadas} linhas sem resultado: {MOTIVOS['indice_nao_publicado'].lower()}",
+                      file=sys.stderr)
+            if args.relatorio_validacao:
+                # O sufixo no fim do nome impede que o relatório seja lido como entrada numa próxima execução
+                caminho = destino.with_name(f"{entrada.stem}_validacao{args.sufixo}.csv")
+                relatorio.to_csv(caminho, sep=";", index=False, encoding="utf-8-sig")
+    if args.metricas:
+        gravar_metricas(args.metricas, medicoes)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Composição da atualização: correção pelo índice, juros simples ou compostos e multa.
+
+Uma ``Composicao`` descreve as etapas aplicadas depois (ou no lugar) da
+correção monetária, num texto curto separado por ``+``::
+
+    correcao+juros_simples:1+multa:2         # corrigido, 1% a.m. simples, multa de 2%
+    correcao+juros_compostos:0,5:mensal      # 0,5% a.m. compostos, só meses completos
+    juros_simples:@juros+multa:@multa        # sem correção, taxas (em %) por linha
+
+Cada etapa é um fator multiplicativo sobre o valor acumulado, de modo que a
+multa incide sobre o valor corrigido com juros. Os juros contam o período de
+``data_inicial`` a ``data_final`` pro rata die (dias corridos / 30) ou, com
+``:mensal``, só os meses completos. ``@coluna`` no lugar da taxa lê a taxa de
+cada linha da coluna de mesmo nome do arquivo (em branco vale 0).
+
+``fator`` funde todas as etapas num único vetor ``float64`` por bloco, com
+multiplicações no lugar sobre o mesmo vetor, sem colunas intermediárias; o
+valor final é uma multiplicação só sobre o valor corrigido, qualquer que seja
+a quantidade de etapas ou de linhas. O fator não depende do índice, então é
+calculado uma vez por bloco mesmo com todos os índices lado a lado.
+"""
+import numpy as np
+import pandas as pd
+
+from atualizacao.formatos import parse_valores
+
+ETAPAS = ("correcao", "juros_simples", "juros_compostos", "multa")
+MODOS = ("pro_rata", "mensal")
+DIAS_MES = 30
+
+
+class Composicao:
+    """Etapas ``(tipo, taxa em %, modo)`` na ordem informada; ``taxa`` é número ou ``"@coluna"``"""
+
+    def __init__(self, etapas):
+        for tipo, taxa, modo in etapas:
+            if tipo not in ETAPAS:
+                raise ValueError(f"etapa desconhecida: {tipo} (use {', '.join(ETAPAS)})")
+            if modo not in MODOS:
+                raise ValueError(f"modo de juros desconhecido: {modo} (use {', '.join(MODOS)})")
+        self.etapas = list(etapas)
+
+    @classmethod
+    def ler(cls, texto):
+        """Composição a partir do texto (``correcao+juros_simples:1+multa:2``); vazio é só a correção"""
+        etapas = []
+        for parte in (texto or "correcao").split("+"):
+            tipo, _, resto = parte.strip().partition(":")
+            taxa, _, modo = resto.partition(":")
+            taxa = taxa.strip()
+            if tipo != "correcao" and not taxa:
+                raise ValueError(f"a etapa {tipo} precisa de uma taxa (ex.: {tipo}:1)")
+            if taxa and not taxa.startswith("@"):
+                try:
+                    taxa = float(taxa.replace(",", "."))
+                except ValueError:
+                    raise ValueError(f"taxa inválida na etapa {tipo}: {taxa}") from None
+            etapas.append((tipo.strip(), taxa or None, modo.strip() or "pro_rata"))
+        return cls(etapas)
+
+    def __repr__(self):
+        return f"Composicao({self.descrever()!r})"
+
+    def descrever(self):
+        partes = []
+        for tipo, taxa, modo in self.etapas:
+            if taxa is not None:
+                tipo += f":{taxa}" if isinstance(taxa, str) else f":{taxa:g}"
+            partes.append(tipo if modo == "pro_rata" else f"{tipo}:{modo}")
+        return "+".join(partes)
+
+    @property
+    def corrige(self):
+        """Se a composição parte do valor corrigido pelo índice (etapa ``correcao``)"""
+        return any(tipo == "correcao" for tipo, _, _ in self.etapas)
+
+    @property
+    def so_correcao(self):
+        """Só a correção: o valor final é o próprio valor atualizado"""
+        return all(tipo == "correcao" for tipo, _, _ in self.etapas)
+
+    def colunas(self):
+        """Colunas do arquivo lidas pelas taxas por linha"""
+        return [taxa[1:] for _, taxa, _ in self.etapas if isinstance(taxa, str)]
+
+    def verificar(self, colunas):
+        """ValueError se alguma coluna de taxa por linha não existe em ``colunas``"""
+        ausentes = [c for c in self.colunas() if c not in colunas]
+        if ausentes:
+            raise ValueError(f"coluna de taxa ausente: {', '.join(ausentes)}")
+
+    def fator(self, df):
+        """Fator de juros e multa de cada linha de ``df`` (preparado), fundido num vetor só"""
+        fator = np.ones(len(df))
+        meses = {}
+        for tipo, taxa, modo in self.etapas:
+            if tipo == "correcao":
+                continue
+            taxa = _taxa(df, taxa)
+            if tipo == "multa":
+                fator *= 1 + taxa
+                continue
+            if modo not in meses:
+                meses[modo] = _meses(df, modo)
+            if tipo == "juros_simples":
+                fator *= 1 + taxa * meses[modo]
+            else:
+                fator *= np.power(1 + taxa, meses[modo])
+        return fator
+
+    def aplicar(self, df, corrigido=None, fator=None):
+        """Valor final de cada linha: ``corrigido`` (ou o valor original, sem correção) vezes o fator.
+
+        ``fator`` reaproveita o ``fator(df)`` já calculado para outra coluna do mesmo bloco.
+        """
+        base = corrigido if self.corrige else df["valor"].where(df["valor"] > 0)
+        base = pd.to_numeric(pd.Series(base), errors="coerce").to_numpy(dtype="float64")
+        if self.so_correcao:
+            return pd.Series(base, index=df.index, name="valor_final")
+        return pd.Series(base * (self.fator(df) if fator is None else fator), index=df.index, name="valor_final")
+
+
+def _taxa(df, taxa):
+    # Taxa em % -> fração; por linha quando "@coluna"
+    if not isinstance(taxa, str):
+        return taxa / 100
+    valores = df[taxa[1:]]
+    if not pd.api.types.is_numeric_dtype(valores):
+        valores = parse_valores(valores)
+    return valores.fillna(0).to_numpy(dtype="float64") / 100
+
+
+def _meses(df, modo):
+    # Meses do período de cada linha (NaN sem datas; período invertido conta zero)
+    inicio = df["data_inicial"].to_numpy(dtype="datetime64[D]")
+    fim = df["data_final"].to_numpy(dtype="datetime64[D]")
+    if modo == "pro_rata":
+        meses = (fim - inicio).astype("float64") / DIAS_MES
+    else:
+        meses = (fim.astype("datetime64[M]") - inicio.astype("datetime64[M]")).astype("float64")
+        # Mês só conta completo quando o dia final alcança o dia inicial
+        meses -= (fim - fim.astype("datetime64[M]")) < (inicio - inicio.astype("datetime64[M]"))
+    meses[np.isnat(inicio) | np.isnat(fim)] = np.nan
+    return np.maximum(meses, 0, where=~np.isnan(meses), out=meses)
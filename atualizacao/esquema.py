@@ -0,0 +1,395 @@
+"""Detecção das colunas e dos formatos da entrada e relatório de validação por linha.
+
+``detectar_esquema`` olha só as primeiras ``AMOSTRA_LINHAS`` linhas do
+primeiro bloco: escolhe as colunas de data inicial, data final e valor pelo
+nome e, se o nome não bastar, pelo conteúdo (a coluna em que a amostra mais se
+converte), e classifica o formato de cada uma (``datetime64`` nativo, objetos
+de data do openpyxl, número serial do Excel, ``dd/mm/aaaa``, ISO, ``ddmmaaaa``,
+reais com vírgula decimal...). Cada formato tem uma conversão vetorizada
+direta (``converter_datas``/``converter_valores``); só as linhas que não se
+encaixam no formato detectado passam pela normalização completa de
+``atualizacao.formatos``, em vez de todas as linhas tentarem todos os
+formatos.
+
+A coluna ``indice`` é opcional e só é reconhecida pelo nome ("Índice",
+"Indexador"): com ela, cada linha é atualizada pelo próprio índice
+(``converter_indices`` aceita "selic", "IGP-M"...) e as linhas em branco usam
+o índice escolhido na tela ou na linha de comando.
+
+``validar_bloco`` e ``validar_resultado`` listam, para cada linha com
+problema, um código de ``MOTIVOS``; as linhas são numeradas como na planilha
+(o cabeçalho é a linha 1).
+"""
+import re
+import unicodedata
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from atualizacao.formatos import normalizar_datas, parse_valores
+from atualizacao.indices import SERIES, obter_tabelas
+
+AMOSTRA_LINHAS = 1_000
+# Fração mínima da amostra (sem contar vazios) que precisa se converter para a coluna ser aceita pelo conteúdo
+ACEITACAO_MINIMA = 0.8
+
+CAMPOS = ("data_inicial", "data_final", "valor")
+# Trechos procurados no nome da coluna, já sem acentos e com "_" no lugar de espaços e pontuação
+NOMES = {
+    "data_inicial": ("data_in", "inicio", "dt_ini"),
+    "data_final": ("data_f", "final", "dt_f"),
+    "valor": ("valor", "montante"),
+}
+# Colunas opcionais, reconhecidas só pelo nome
+OPCIONAIS = {"indice": ("indice", "indexador")}
+# Código de "em branco" e "não reconhecido" de cada campo
+_MOTIVOS_CAMPO = {
+    "data_inicial": ("data_inicial_ausente", "data_inicial_invalida"),
+    "data_final": ("data_final_ausente", "data_final_invalida"),
+    "valor": ("valor_ausente", "valor_invalido"),
+}
+
+# Máscaras dos formatos de texto, testadas na amostra (a conversão usa o formato do pandas correspondente)
+FORMATOS_DATA = {
+    "dd/mm/aaaa": (r"\d{2}/\d{2}/\d{4}", "%d/%m/%Y"),
+    "iso": (r"\d{4}-\d{2}-\d{2}", "%Y-%m-%d"),
+    "ddmmaaaa": (r"\d{8}", "%d%m%Y"),
+}
+_REAIS = r"-?(?:R\$)?\s*-?\d{1,3}(?:\.\d{3})*(?:,\d+)?|-?(?:R\$)?\s*-?\d+(?:,\d+)?"
+_DECIMAL_PONTO = r"-?\d+(?:\.\d+)?"
+# Sem vírgula, ponto seguido de grupos de três dígitos é milhar (1.000), não decimal
+_MILHAR = r"-?\d{1,3}(?:\.\d{3})+"
+
+MOTIVOS = {
+    "data_inicial_ausente": "Data inicial em branco",
+    "data_inicial_invalida": "Data inicial não reconhecida",
+    "data_final_ausente": "Data final em branco",
+    "data_final_invalida": "Data final não reconhecida",
+    "valor_ausente": "Valor em branco",
+    "valor_invalido": "Valor não reconhecido",
+    "valor_nao_positivo": "Valor zero ou negativo (não é atualizado)",
+    "periodo_invertido": "Data final anterior à inicial (valor mantido sem correção)",
+    "fora_da_serie": "Período fora da série do índice",
+    "indice_nao_publicado": "Índice do mês da data final ainda não publicado (a taxa desse mês entra no cálculo)",
+    "indice_invalido": f"Índice não reconhecido (use {', '.join(SERIES)})",
+}
+
+
+class Esquema:
+    """Coluna original e formato detectado de cada campo (``colunas`` tem o formato de ``mapear_colunas``)"""
+
+    def __init__(self, colunas, formatos):
+        self.colunas = colunas
+        self.formatos = formatos
+
+    def __repr__(self):
+        return f"Esquema({self.descrever()})"
+
+    def descrever(self):
+        return ", ".join(f"{campo} = '{coluna}' ({self.formatos[campo]})" for campo, coluna in self.colunas.items())
+
+
+def _vazios(serie):
+    # Colunas tipadas (datas, números) só ficam vazias como nulo; texto em branco também conta
+    if not (pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie)):
+        return serie.isna()
+    vazios = serie.isna()
+    textos = serie.map(type).eq(str)
+    if textos.any():
+        vazios[textos] = serie[textos].str.strip().eq("")
+    return vazios
+
+
+def _fracao_convertida(convertida, original):
+    preenchidos = ~_vazios(original)
+    if not preenchidos.any():
+        return 0.0
+    return float(convertida[preenchidos].notna().mean())
+
+
+def _tipos(amostra):
+    return set(amostra.dropna().map(type).unique())
+
+
+def formato_data(amostra):
+    """Formato da coluna de datas a partir da amostra"""
+    amostra = pd.Series(amostra)
+    if pd.api.types.is_datetime64_any_dtype(amostra):
+        return "nativo"
+    if pd.api.types.is_numeric_dtype(amostra) and not pd.api.types.is_bool_dtype(amostra):
+        return "serial"
+    tipos = _tipos(amostra)
+    if tipos and all(issubclass(t, (datetime, date, np.datetime64)) for t in tipos):
+        return "objeto"
+    if tipos and all(issubclass(t, (int, float, np.integer, np.floating)) and t is not bool for t in tipos):
+        return "serial"
+    if tipos and all(issubclass(t, str) for t in tipos):
+        textos = amostra.dropna().astype(str).str.strip()
+        textos = textos[textos != ""]
+        for nome, (mascara, _) in FORMATOS_DATA.items():
+            if len(textos) and textos.str.fullmatch(mascara).all():
+                return nome
+    return "misto"
+
+
+def formato_valor(amostra):
+    """Formato da coluna de valores a partir da amostra"""
+    amostra = pd.Series(amostra)
+    if pd.api.types.is_numeric_dtype(amostra) and not pd.api.types.is_bool_dtype(amostra):
+        return "nativo"
+    tipos = _tipos(amostra)
+    if tipos and all(issubclass(t, (int, float, np.integer, np.floating)) and t is not bool for t in tipos):
+        return "numero"
+    if tipos and all(issubclass(t, str) for t in tipos):
+        textos = amostra.dropna().astype(str).str.strip()
+        textos = textos[textos != ""]
+        if len(textos) and (textos.str.fullmatch(_DECIMAL_PONTO) & ~textos.str.fullmatch(_MILHAR)).all():
+            return "decimal_ponto"
+        if len(textos) and textos.str.fullmatch(_REAIS).all():
+            return "reais"
+    return "misto"
+
+
+def _por_distintos(serie, converter):
+    # Datas se repetem muito nas planilhas: cada valor distinto é convertido uma vez e espalhado pelas linhas
+    codigos, distintos = pd.factorize(serie, use_na_sentinel=True)
+    convertidos = converter(pd.Series(distintos, dtype=object)).to_numpy()
+    resultado = np.full(len(serie), np.datetime64("NaT"), dtype="datetime64[ns]")
+    presentes = codigos >= 0
+    resultado[presentes] = convertidos[codigos[presentes]]
+    return pd.Series(resultado, index=serie.index)
+
+
+def converter_datas(serie, formato):
+    """``datetime64`` da coluna pelo formato detectado; só as linhas fora dele passam por ``normalizar_datas``"""
+    serie = pd.Series(serie)
+    if formato in ("nativo", "serial"):
+        return normalizar_datas(serie)
+    return _por_distintos(serie, lambda distintos: _converter_distintos(distintos, formato))
+
+
+def _converter_distintos(serie, formato):
+    if formato == "misto":
+        return normalizar_datas(serie)
+    if formato == "objeto":
+        # Só objetos de data; textos e números que apareçam no meio vão para a normalização completa
+        datas = serie.map(lambda v: isinstance(v, (datetime, date, np.datetime64))).astype(bool)
+        convertidas = pd.to_datetime(serie.where(datas), errors="coerce")
+        if getattr(convertidas.dt, "tz", None) is not None:
+            convertidas = convertidas.dt.tz_localize(None)
+        convertidas = convertidas.astype("datetime64[ns]").dt.normalize()
+    else:
+        # Direto pelo parser em C do pandas; espaços ou outros tipos caem na normalização abaixo
+        convertidas = pd.to_datetime(serie, format=FORMATOS_DATA[formato][1], errors="coerce")
+        convertidas = convertidas.astype("datetime64[ns]").dt.normalize()
+    restantes = convertidas.isna() & serie.notna()
+    if restantes.any():
+        convertidas[restantes] = normalizar_datas(serie[restantes])
+    return convertidas
+
+
+def converter_valores(serie, formato):
+    """float64 da coluna pelo formato detectado; só as linhas fora dele passam por ``parse_valores``"""
+    serie = pd.Series(serie)
+    if formato == "nativo":
+        return pd.to_numeric(serie, errors="coerce").astype("float64")
+    if formato == "misto":
+        return parse_valores(serie)
+    textos = serie.astype(str).str.strip()
+    if formato == "numero":
+        # Só números; textos que apareçam no meio ("1.000") vão para a normalização completa
+        conformes = serie.map(lambda v: isinstance(v, (int, float, np.integer, np.floating))
+                              and not isinstance(v, bool)).astype(bool)
+        convertidos = pd.to_numeric(serie.where(conformes), errors="coerce").astype("float64")
+    elif formato == "reais":
+        conformes = textos.str.fullmatch(_REAIS)
+        negativos = textos.str.contains("-", regex=False)
+        textos = (
+            textos.str.replace("R$", "", regex=False).str.replace("-", "", regex=False).str.strip()
+            .str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        )
+        convertidos = pd.to_numeric(textos, errors="coerce").astype("float64")
+        convertidos = convertidos.where(~negativos, -convertidos)
+    elif formato == "decimal_ponto":
+        conformes = textos.str.fullmatch(_DECIMAL_PONTO) & ~textos.str.fullmatch(_MILHAR)
+        convertidos = pd.to_numeric(textos, errors="coerce").astype("float64")
+    # Linhas fora do padrão da amostra (ex.: 1000.5 numa coluna em reais) ficam para a normalização completa
+    convertidos = convertidos.where(conformes.fillna(False).astype(bool))
+    restantes = convertidos.isna() & serie.notna()
+    if restantes.any():
+        convertidos[restantes] = parse_valores(serie[restantes])
+    return convertidos
+
+
+def converter_indices(serie):
+    """Nome do índice de cada linha como em ``SERIES`` ("ipca" -> "IPCA", "IGP-M" -> "IGPM").
+
+    Em branco vira None (vale o índice padrão); nome desconhecido fica como
+    está, para o relatório de validação apontar a linha.
+    """
+    serie = pd.Series(serie)
+    conhecidos = {_nome_normalizado(nome).replace("_", ""): nome for nome in SERIES}
+    codigos, distintos = pd.factorize(serie, use_na_sentinel=True)
+    nomes = [
+        conhecidos.get(_nome_normalizado(valor).replace("_", ""), str(valor).strip()) or None
+        for valor in distintos
+    ]
+    resultado = np.array([None] + nomes, dtype=object)[codigos + 1]
+    return pd.Series(resultado, index=serie.index, dtype=object)
+
+
+def _nome_normalizado(coluna):
+    sem_acentos = unicodedata.normalize("NFKD", str(coluna)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", sem_acentos.lower()).strip("_")
+
+
+def _candidatos_por_nome(colunas, campo):
+    return [c for c in colunas if any(termo in _nome_normalizado(c) for termo in NOMES[campo])]
+
+
+def detectar_esquema(bloco, amostra=AMOSTRA_LINHAS):
+    """Colunas e formatos de data inicial, data final e valor, pela amostra das primeiras ``amostra`` linhas"""
+    linhas = bloco.head(amostra)
+    notas = {}
+
+    def nota(coluna, campo):
+        # Fração da amostra convertida pelo campo (memorizada por coluna e tipo de campo)
+        tipo = "valor" if campo == "valor" else "data"
+        if (coluna, tipo) not in notas:
+            serie = linhas[coluna]
+            if tipo == "valor":
+                convertida = converter_valores(serie, formato_valor(serie))
+            else:
+                convertida = converter_datas(serie, formato_data(serie))
+            notas[coluna, tipo] = _fracao_convertida(convertida, serie)
+        return notas[coluna, tipo]
+
+    def preferencia(coluna, campo):
+        # Converte bem a amostra; nome que não serve a outro campo; para datas, texto/data antes de número serial
+        outros = sum(coluna in _candidatos_por_nome([coluna], outro) for outro in CAMPOS if outro != campo)
+        serial = campo != "valor" and formato_data(linhas[coluna]) == "serial"
+        return nota(coluna, campo) >= ACEITACAO_MINIMA, -outros, not serial, nota(coluna, campo)
+
+    escolhidas = {}
+    # Primeiro pelo nome; entre vários nomes compatíveis (ex.: "Data final" e "Valor final"), decide o conteúdo
+    for campo in CAMPOS:
+        por_nome = [c for c in _candidatos_por_nome(bloco.columns, campo) if c not in escolhidas.values()]
+        if por_nome:
+            escolhidas[campo] = max(por_nome, key=lambda c: preferencia(c, campo))
+    # Campos sem nome reconhecível: a coluna livre em que a amostra mais se converte, na ordem do arquivo
+    for campo in CAMPOS:
+        if campo in escolhidas:
+            continue
+        livres = [c for c in bloco.columns if c not in escolhidas.values()]
+        candidatos = [c for c in livres if nota(c, campo) >= ACEITACAO_MINIMA]
+        if candidatos:
+            escolhidas[campo] = max(candidatos, key=lambda c: preferencia(c, campo))
+    ausentes = [campo for campo in CAMPOS if campo not in escolhidas]
+    if ausentes:
+        disponiveis = ", ".join(f"'{c}'" for c in bloco.columns)
+        raise ValueError(f"coluna obrigatória ausente: {', '.join(ausentes)} (colunas do arquivo: {disponiveis})")
+    formatos = {
+        "data_inicial": formato_data(linhas[escolhidas["data_inicial"]]),
+        "data_final": formato_data(linhas[escolhidas["data_final"]]),
+        "valor": formato_valor(linhas[escolhidas["valor"]]),
+    }
+    for campo, termos in OPCIONAIS.items():
+        por_nome = [c for c in bloco.columns
+                    if c not in escolhidas.values() and any(t in _nome_normalizado(c) for t in termos)]
+        if por_nome:
+            escolhidas[campo] = por_nome[0]
+            formatos[campo] = "texto"
+    return Esquema(escolhidas, formatos)
+
+
+def _problemas(linhas, motivo, coluna, valores):
+    return pd.DataFrame({
+        "linha": np.asarray(linhas, dtype="int64") + 2,
+        "motivo": motivo,
+        "coluna": coluna,
+        "valor_original": pd.Series(valores).astype(object).where(pd.notna(valores), "").astype(str).to_numpy(),
+    })
+
+
+def validar_bloco(original, preparado, esquema):
+    """Problemas de entrada de cada linha: ``linha`` (da planilha), ``motivo`` (código), ``coluna`` e valor original"""
+    partes = []
+    for campo in CAMPOS:
+        coluna = esquema.colunas[campo]
+        bruto = original[coluna]
+        vazios = _vazios(bruto).to_numpy()
+        invalidos = preparado[campo].isna().to_numpy() & ~vazios
+        for mascara, motivo in zip((vazios, invalidos), _MOTIVOS_CAMPO[campo]):
+            if mascara.any():
+                partes.append(_problemas(original.index[mascara], motivo, coluna, bruto[mascara]))
+    valores = preparado["valor"]
+    nao_positivos = (valores <= 0).to_numpy()
+    if nao_positivos.any():
+        coluna = esquema.colunas["valor"]
+        partes.append(_problemas(original.index[nao_positivos], "valor_nao_positivo", coluna,
+                                 original[coluna][nao_positivos]))
+    invertidos = (preparado["data_final"] < preparado["data_inicial"]).to_numpy()
+    if invertidos.any():
+        coluna = esquema.colunas["data_final"]
+        partes.append(_problemas(original.index[invertidos], "periodo_invertido", coluna,
+                                 original[coluna][invertidos]))
+    if "indice" in esquema.colunas:
+        desconhecidos = (preparado["indice"].notna() & ~preparado["indice"].isin(list(SERIES))).to_numpy()
+        if desconhecidos.any():
+            coluna = esquema.colunas["indice"]
+            partes.append(_problemas(original.index[desconhecidos], "indice_invalido", coluna,
+                                     original[coluna][desconhecidos]))
+    return juntar_relatorio(partes)
+
+
+def validar_resultado(preparado, resultado, coluna=None, indices=None, tabelas=None, pro_rata=False):
+    """Linhas com entrada válida e sem resultado: o período está fora da série do índice.
+
+    ``coluna`` identifica o resultado no relatório quando há um por índice.
+    Com ``indices`` (o índice de cada linha, ou um só para todas), as linhas
+    cuja data final depende de uma taxa mensal ainda não publicada saem como
+    ``indice_nao_publicado``, com o último mês disponível; ``tabelas`` como em
+    ``calcular_indice_lote``.
+    """
+    validos = preparado["data_inicial"].notna() & preparado["data_final"].notna() & (preparado["valor"] > 0)
+    if "indice" in preparado.columns:
+        validos &= preparado["indice"].isna() | preparado["indice"].isin(list(SERIES))
+    validos = validos.to_numpy()
+    fora = validos & pd.Series(resultado).isna().to_numpy()
+    if not fora.any():
+        return juntar_relatorio([])
+    inicio = preparado["data_inicial"][fora].dt.strftime("%d/%m/%Y")
+    fim = preparado["data_final"][fora].dt.strftime("%d/%m/%Y")
+    periodos = inicio + " a " + fim
+    motivos = np.full(len(periodos), "fora_da_serie", dtype=object)
+    if indices is not None:
+        indices = pd.Series(indices, index=preparado.index)[fora]
+        tabelas = obter_tabelas() if tabelas is None else tabelas
+        for indice, tabela in tabelas.items():
+            nao_publicadas = (indices == indice).to_numpy() & tabela.nao_publicadas(preparado["data_final"][fora], pro_rata)
+            if not nao_publicadas.any():
+                continue
+            motivos[nao_publicadas] = "indice_nao_publicado"
+            ultimo = pd.Timestamp(tabela.ultimo_mes()).strftime("%m/%Y")
+            periodos[nao_publicadas] += f" ({indice} publicado até {ultimo})"
+    return _problemas(preparado.index[fora], motivos, coluna or "data_inicial/data_final", periodos)
+
+
+def juntar_relatorio(partes):
+    """Relatório único, em ordem de linha, a partir dos relatórios de cada bloco"""
+    partes = [p for p in partes if len(p)]
+    if not partes:
+        return pd.DataFrame({"linha": pd.Series(dtype="int64"), "motivo": pd.Series(dtype=object),
+                             "coluna": pd.Series(dtype=object), "valor_original": pd.Series(dtype=object)})
+    return pd.concat(partes, ignore_index=True).sort_values("linha", kind="stable", ignore_index=True)
+
+
+def resumo_relatorio(relatorio):
+    """Quantidade de linhas por motivo, com a descrição de cada código"""
+    contagem = relatorio["motivo"].value_counts()
+    return pd.DataFrame({
+        "motivo": contagem.index,
+        "descricao": [MOTIVOS.get(m, m) for m in contagem.index],
+        "linhas": contagem.to_numpy(),
+    })
@@ -0,0 +1,146 @@
+"""Modo exato: valores em centavos inteiros e fatores em ponto fixo.
+
+No modo padrão o cálculo é em float64, o que em valores altos diverge alguns
+centavos da calculadora do Bacen. Aqui o fator de cada período é truncado em
+``CASAS_FATOR`` decimais e o acumulado é truncado a cada período em
+``CASAS_ACUMULADO`` decimais (8 e 16 casas, como na calculadora oficial, para
+todos os índices), tudo em inteiros escalados. O valor final é ``centavos * fator`` arredondado para o
+centavo mais próximo (meio centavo para cima).
+
+Como o truncamento a cada passo impede usar a razão entre acumulados, o
+produto é refeito a partir de cada data inicial distinta: todas avançam juntas,
+um período por vez, numa operação vetorial sobre o vetor de acumulados, e cada
+par ``(início, fim)`` lê o seu quando o prazo dele é alcançado. O custo é de
+O(prazo mais longo) operações vetoriais, e não um laço em Python por linha ou
+por dia de cada par. Enquanto o acumulado cabe (fator do período inteiro
+abaixo de ``LIMITE_INT64``), a multiplicação truncada é exata em ``int64``,
+separando o acumulado em parte alta e baixa; acima disso os mesmos passos usam
+inteiros do Python (``dtype=object``). As linhas com o mesmo par recebem o
+mesmo fator.
+"""
+from decimal import ROUND_FLOOR, Decimal
+
+import numpy as np
+import pandas as pd
+
+from atualizacao import calendario
+
+# Casas do fator do período e do fator acumulado
+CASAS_FATOR = 8
+CASAS_ACUMULADO = 16
+# Maior fator acumulado (em reais, não escalado) com produto truncado exato em int64
+LIMITE_INT64 = 500
+
+_fatores_tabela = {}
+
+
+def fator_periodo(taxa, casas):
+    """``1 + taxa/100`` truncado em ``casas`` decimais, como inteiro escalado por ``10**casas``"""
+    escala = 10 ** casas
+    if not isinstance(taxa, Decimal):
+        taxa = Decimal(repr(float(taxa)))
+    return escala + int((taxa * escala / 100).to_integral_value(ROUND_FLOOR))
+
+
+def fatores_periodo_tabela(tabela):
+    """Fatores inteiros de cada passo da tabela (0 onde a série não tem taxa), calculados uma vez por tabela"""
+    guardado = _fatores_tabela.get(tabela.indice)
+    if guardado is None or guardado[0] is not tabela:
+        guardado = (tabela, np.array([0 if np.isnan(t) else fator_periodo(t, CASAS_FATOR) for t in tabela.taxas],
+                                     dtype="int64"))
+        _fatores_tabela[tabela.indice] = guardado
+    return guardado[1]
+
+
+def _produtos_truncados(fatores, inicios, fins, casas=CASAS_FATOR, casas_acumulado=CASAS_ACUMULADO):
+    """Produto truncado de ``fatores[inicio:fim]`` por linha; None onde um fator é 0 (período sem taxa)"""
+    fatores = np.asarray(fatores, dtype="int64")
+    inicios = np.asarray(inicios, dtype="int64")
+    fins = np.maximum(np.asarray(fins, dtype="int64"), inicios)
+    resultado = np.full(len(inicios), None, dtype=object)
+    if not len(inicios):
+        return resultado
+    escala = 10 ** casas
+    # Cada data inicial distinta avança até o maior prazo pedido a partir dela
+    partidas, origem = np.unique(inicios, return_inverse=True)
+    prazos = fins - inicios
+    maior = np.zeros(len(partidas), dtype="int64")
+    np.maximum.at(maior, origem, prazos)
+    # Partidas com prazo mais longo primeiro: as que seguem ativas são sempre um prefixo
+    ordem = np.argsort(-maior, kind="stable")
+    posicao_partida = np.empty(len(partidas), dtype="int64")
+    posicao_partida[ordem] = np.arange(len(partidas))
+    partidas, maior, origem = partidas[ordem], maior[ordem], posicao_partida[origem]
+    # Limite do fator acumulado: produto dos fatores maiores que 1 no trecho percorrido
+    trecho = fatores[partidas.min():int(fins.max())]
+    logaritmo = np.log(np.maximum(trecho[trecho > 0] / escala, 1.0)).sum()
+    inteiro = logaritmo < np.log(LIMITE_INT64)
+    acumulados = np.full(len(partidas), 10 ** casas_acumulado, dtype="int64" if inteiro else object)
+    sem_taxa = np.zeros(len(partidas), dtype=bool)
+    # Pares em ordem de prazo: após k passos, os de prazo k leem o acumulado da sua partida
+    por_prazo = np.argsort(prazos, kind="stable")
+    cortes = np.searchsorted(prazos[por_prazo], np.arange(int(maior[0]) + 2))
+    ativas = len(partidas)
+    for passo in range(int(maior[0]) + 1):
+        pares = por_prazo[cortes[passo]:cortes[passo + 1]]
+        if len(pares):
+            lidos = acumulados[origem[pares]].astype(object)
+            lidos[sem_taxa[origem[pares]]] = None
+            resultado[pares] = lidos
+        while ativas and maior[ativas - 1] <= passo:
+            ativas -= 1
+        if not ativas:
+            break
+        fator = fatores[partidas[:ativas] + passo]
+        sem_taxa[:ativas] |= fator == 0
+        atual = acumulados[:ativas]
+        if inteiro:
+            # (alto * escala + baixo) * fator // escala, sem passar de int64
+            alto, baixo = np.divmod(atual, escala)
+            acumulados[:ativas] = alto * fator + baixo * fator // escala
+        else:
+            acumulados[:ativas] = atual * fator.astype(object) // escala
+    return resultado
+
+
+def fatores_exatos_tabela(tabela, data_inicial, data_final):
+    """Fatores escalados por ``10**casas_acumulado`` de cada linha; None fora da série"""
+    inicio, fim, validos = tabela.intervalo(data_inicial, data_final)
+    fatores = _produtos_truncados(
+        fatores_periodo_tabela(tabela), np.where(validos, inicio, 0), np.where(validos, fim, 0),
+    )
+    fatores[~validos] = None
+    return fatores, CASAS_ACUMULADO
+
+
+def fatores_exatos_referencia(indice, taxa_mensal, prazos, diaria):
+    """Mesmo cálculo com taxa de referência constante; ``prazos`` em dias úteis ou meses"""
+    taxa = Decimal(repr(float(taxa_mensal)))
+    if diaria:
+        # Taxa mensal convertida em taxa por dia útil (base 252), em percentual
+        taxa = ((1 + taxa) ** (Decimal(12) / calendario.DIAS_UTEIS_ANO) - 1) * 100
+    else:
+        taxa = taxa * 100
+    prazos = np.asarray(prazos, dtype="int64")
+    fatores = np.full(int(prazos.max(initial=0)) + 1, fator_periodo(taxa, CASAS_FATOR), dtype="int64")
+    return _produtos_truncados(fatores, np.zeros_like(prazos), prazos), CASAS_ACUMULADO
+
+
+def aplicar(valores, fatores, casas_acumulado):
+    """Valores atualizados em centavos inteiros (``dtype=object``); None onde não há fator"""
+    centavos = np.rint(np.asarray(valores, dtype="float64") * 100)
+    validos = pd.notna(fatores) & np.isfinite(centavos)
+    resultado = np.full(len(centavos), None, dtype=object)
+    if validos.any():
+        escala = 10 ** casas_acumulado
+        inteiros = centavos[validos].astype("int64").astype(object)
+        resultado[validos] = (inteiros * fatores[validos] + escala // 2) // escala
+    return resultado
+
+
+def em_reais(centavos):
+    """Centavos inteiros em float64 de reais (NaN onde vazio), para exibição e exportação"""
+    validos = pd.notna(centavos)
+    reais = np.full(len(centavos), np.nan)
+    reais[validos] = centavos[validos].astype("float64") / 100
+    return reais
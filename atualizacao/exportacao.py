@@ -0,0 +1,262 @@
+"""Exportação do resultado em blocos, com memória constante.
+
+O ``ExportadorBlocos`` recebe o resultado bloco a bloco e grava direto num
+arquivo temporário (ou no destino informado): ``.xlsx`` pelo modo
+``constant_memory`` do xlsxwriter, que descarta cada linha depois de escrita,
+``.csv`` no padrão do Excel brasileiro (``;`` e vírgula decimal), ``.parquet``
+por row groups e ``.feather`` (Arrow IPC) por lotes, os dois pelo pyarrow
+(dependência opcional). Assim o arquivo final nunca precisa estar inteiro na
+memória.
+
+Nas planilhas o valor atualizado sai como texto em reais (``R$ 1.234,56``);
+nos formatos colunares sai como número, para o sistema seguinte não ter de
+interpretar texto (``coluna_resultado``); o mesmo vale para cada coluna do
+cálculo com todos os índices lado a lado e para o valor final com juros e
+multa (``colunas_resultado``).
+
+``BlocosEmDisco`` guarda um resultado já calculado, bloco a bloco, numa pasta
+temporária, para a tela paginar a prévia e exportar lendo um bloco por vez em
+vez de manter o resultado inteiro na memória.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from atualizacao.formatos import formatar_valores
+
+FORMATOS = {
+    "xlsx": {"sufixo": ".xlsx", "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+             "colunar": False},
+    "csv": {"sufixo": ".csv", "mime": "text/csv", "colunar": False},
+    "parquet": {"sufixo": ".parquet", "mime": "application/vnd.apache.parquet", "colunar": True},
+    "feather": {"sufixo": ".feather", "mime": "application/vnd.apache.arrow.file", "colunar": True},
+}
+
+LIMITE_LINHAS_XLSX = 1_048_576
+
+
+def coluna_resultado(resultado, formato):
+    """Valor atualizado como sai em ``formato``: texto em reais nas planilhas, float64 em centavos nos colunares"""
+    if FORMATOS[formato]["colunar"]:
+        return pd.to_numeric(pd.Series(resultado), errors="coerce").astype("float64").round(2)
+    return formatar_valores(resultado)
+
+
+def colunas_calculo(indice_nome, indices=None):
+    """Coluna de resultado -> índice calculado nela: ``valor_atualizado``, ou uma por índice de ``indices``"""
+    if indices:
+        return {f"valor_atualizado_{indice}": indice for indice in indices}
+    return {"valor_atualizado": indice_nome}
+
+
+def coluna_final(coluna):
+    """Coluna do valor final com juros e multa correspondente a uma coluna de ``colunas_calculo``"""
+    return "valor_final" + coluna[len("valor_atualizado"):]
+
+
+def colunas_resultado(colunas, compor=False):
+    """Colunas gravadas pelo cálculo: as de ``colunas_calculo`` e, com ``compor``, as de valor final.
+
+    A lista é montada a partir das colunas calculadas, não dos nomes do bloco, para
+    não formatar colunas do usuário com nomes parecidos (``valor_final_contrato``).
+    """
+    return list(colunas) + ([coluna_final(coluna) for coluna in colunas] if compor else [])
+
+
+class ExportadorBlocos:
+    """Grava blocos sucessivos de um mesmo resultado em ``formato``.
+
+    Uso::
+
+        with ExportadorBlocos("xlsx") as saida:
+            for bloco in blocos:
+                saida.escrever(bloco)
+        saida.caminho  # arquivo pronto
+    """
+
+    def __init__(self, formato="xlsx", destino=None):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+        self.formato = formato
+        self.mime = FORMATOS[formato]["mime"]
+        if destino is None:
+            descritor, destino = tempfile.mkstemp(prefix="atualizacao_", suffix=FORMATOS[formato]["sufixo"])
+            os.close(descritor)
+        self.caminho = Path(destino)
+        self.linhas = 0
+        self._colunas = None
+        self._escritor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        self.fechar()
+        if tipo is not None:
+            self.caminho.unlink(missing_ok=True)
+
+    def escrever(self, bloco):
+        if self._colunas is None:
+            self._colunas = list(bloco.columns)
+            getattr(self, f"_abrir_{self.formato}")(bloco)
+        getattr(self, f"_escrever_{self.formato}")(bloco[self._colunas])
+        self.linhas += len(bloco)
+
+    def fechar(self):
+        if self._colunas is None:
+            # Resultado vazio: o arquivo sai só com o cabeçalho
+            self.escrever(pd.DataFrame())
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+    # --- XLSX ---
+    def _abrir_xlsx(self, bloco):
+        import xlsxwriter
+
+        self._escritor = xlsxwriter.Workbook(str(self.caminho), {"constant_memory": True, "nan_inf_to_errors": True})
+        self._formato_data = self._escritor.add_format({"num_format": "dd/mm/yyyy"})
+        self._planilhas = 0
+        self._nova_planilha()
+
+    def _nova_planilha(self):
+        self._planilhas += 1
+        nome = "Resultado" if self._planilhas == 1 else f"Resultado {self._planilhas}"
+        self._planilha = self._escritor.add_worksheet(nome)
+        self._planilha.write_row(0, 0, self._colunas)
+        self._linha = 1
+
+    def _escrever_xlsx(self, bloco):
+        formatos = [
+            self._formato_data if pd.api.types.is_datetime64_any_dtype(bloco[c]) else None
+            for c in self._colunas
+        ]
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            # O xlsx comporta pouco mais de 1 milhão de linhas por aba
+            if self._linha >= LIMITE_LINHAS_XLSX:
+                self._nova_planilha()
+            for coluna, (valor, formato) in enumerate(zip(linha, formatos)):
+                self._planilha.write(self._linha, coluna, valor, formato)
+            self._linha += 1
+
+    # --- CSV ---
+    def _abrir_csv(self, bloco):
+        self._escritor = open(self.caminho, "w", encoding="utf-8-sig", newline="")
+        self._escritor.write(";".join(map(str, self._colunas)) + "\r\n")
+
+    def _escrever_csv(self, bloco):
+        bloco.to_csv(self._escritor, sep=";", decimal=",", date_format="%d/%m/%Y",
+                     index=False, header=False, lineterminator="\r\n")
+
+    # --- PARQUET / FEATHER ---
+    def _esquema_arrow(self, bloco):
+        try:
+            import pyarrow as pa
+        except ImportError as exc:
+            raise RuntimeError(f"A exportação em {self.formato.capitalize()} requer o pacote pyarrow") from exc
+        self._pa = pa
+        esquema = pa.Table.from_pandas(bloco, preserve_index=False).schema.remove_metadata()
+        # Coluna toda vazia no primeiro bloco (obs, indice) não tem tipo: vira texto, para os blocos
+        # seguintes, que podem tê-la preenchida, caberem no mesmo esquema
+        self._textos = [campo.name for campo in esquema if pa.types.is_null(campo.type)]
+        for nome in self._textos:
+            esquema = esquema.set(esquema.get_field_index(nome), pa.field(nome, pa.large_string()))
+        self._esquema = esquema
+        return self._esquema
+
+    def _tabela_arrow(self, bloco):
+        if self._textos:
+            bloco = bloco.assign(**{c: bloco[c].astype("string") for c in self._textos})
+        return self._pa.Table.from_pandas(bloco, schema=self._esquema, preserve_index=False)
+
+    def _abrir_parquet(self, bloco):
+        esquema = self._esquema_arrow(bloco)
+        import pyarrow.parquet as pq
+
+        self._escritor = pq.ParquetWriter(str(self.caminho), esquema)
+
+    def _escrever_parquet(self, bloco):
+        self._escritor.write_table(self._tabela_arrow(bloco))
+
+    def _abrir_feather(self, bloco):
+        esquema = self._esquema_arrow(bloco)
+        # Mesma compressão padrão do pyarrow.feather.write_feather
+        opcoes = self._pa.ipc.IpcWriteOptions(compression="lz4")
+        self._escritor = self._pa.ipc.new_file(str(self.caminho), esquema, options=opcoes)
+
+    def _escrever_feather(self, bloco):
+        self._escritor.write_table(self._tabela_arrow(bloco))
+
+
+class BlocosEmDisco:
+    """Blocos de um resultado gravados um a um (pickle) numa pasta e relidos sob demanda.
+
+    Só o caminho e o tamanho de cada bloco ficam no objeto, que pode ir para
+    caches que copiam o valor guardado (``st.cache_data``) sem copiar os dados.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.tamanhos = []
+
+    @classmethod
+    def criar(cls, raiz, manter=None):
+        """Pasta nova dentro de ``raiz``; com ``manter``, remove as mais antigas além desse número"""
+        raiz = Path(raiz)
+        raiz.mkdir(parents=True, exist_ok=True)
+        if manter is not None:
+            pastas = []
+            for pasta in raiz.iterdir():
+                try:
+                    pastas.append((pasta.stat().st_mtime, pasta))
+                except OSError:
+                    # Removida por outra sessão no meio da listagem
+                    continue
+            pastas.sort()
+            for _, antiga in pastas[:max(len(pastas) - manter + 1, 0)]:
+                shutil.rmtree(antiga, ignore_errors=True)
+        return cls(tempfile.mkdtemp(prefix="resultado_", dir=raiz))
+
+    @property
+    def linhas(self):
+        return sum(self.tamanhos)
+
+    def existe(self):
+        """Se a pasta ainda está em disco; renova a data dela, para ``criar`` remover antes as sem uso"""
+        if not self.pasta.is_dir():
+            return False
+        os.utime(self.pasta)
+        return True
+
+    def _arquivo(self, posicao):
+        return self.pasta / f"bloco_{posicao:06d}.pkl"
+
+    def escrever(self, bloco):
+        bloco.to_pickle(self._arquivo(len(self.tamanhos)))
+        self.tamanhos.append(len(bloco))
+
+    def __iter__(self):
+        for posicao in range(len(self.tamanhos)):
+            yield pd.read_pickle(self._arquivo(posicao))
+
+    def fatia(self, inicio, fim):
+        """Linhas ``[inicio, fim)`` do resultado, lendo só os blocos que as contêm"""
+        partes, deslocamento = [], 0
+        for posicao, tamanho in enumerate(self.tamanhos):
+            if deslocamento >= fim:
+                break
+            if deslocamento + tamanho > inicio:
+                bloco = pd.read_pickle(self._arquivo(posicao))
+                partes.append(bloco.iloc[max(inicio - deslocamento, 0):fim - deslocamento])
+            deslocamento += tamanho
+        if partes:
+            return pd.concat(partes)
+        return pd.read_pickle(self._arquivo(0)).iloc[:0] if self.tamanhos else pd.DataFrame()
+
+    def remover(self):
+        shutil.rmtree(self.pasta, ignore_errors=True)
@@ -0,0 +1,168 @@
+"""Conversões vetorizadas das colunas da planilha de entrada e do resultado.
+
+``normalizar_datas`` classifica a coluna inteira de uma vez (objetos de data,
+números seriais do Excel, texto ISO, ``dd/mm/aaaa`` e ``ddmmaaaa``) e converte
+cada classe em bloco, devolvendo ``datetime64`` direto, sem a ida e volta por
+texto ``dd/mm/aaaa`` de cada célula.
+
+``parse_valores`` e ``formatar_valores`` fazem o mesmo com valores em reais:
+números vindos do Excel passam direto e o texto é limpo com operações de
+coluna (``str.replace``/``str.fullmatch``), não com uma função por célula.
+"""
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+ORIGEM_EXCEL = pd.Timestamp("1899-12-30")
+SERIAL_MAXIMO = 2958465  # 31/12/9999
+
+_DMA = r"^(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{4}|\d{2})(?:[ T].*)?$"
+_ISO = r"^(\d{4})[/\-](\d{1,2})[/\-](\d{1,2})(?:[ T].*)?$"
+_COMPACTO = r"\d{8}"
+_SERIAL = r"^(\d{1,7})(?:[.,]\d+)?$"
+
+_MILHAR = r"\d{1,3}(?:\.\d{3})+"
+_NUMERO = r"\d+(?:\.\d*)?|\.\d+"
+_DESCARTAR = ("R$", " ", "\u00a0", "\t", "(", ")", "-")
+
+
+def _de_componentes(ano, mes, dia):
+    partes = pd.DataFrame({"year": ano, "month": mes, "day": dia}).astype("float64")
+    return pd.to_datetime(partes, errors="coerce")
+
+
+def _de_serial(numeros):
+    numeros = pd.to_numeric(numeros, errors="coerce").astype("float64")
+    numeros = numeros.where((numeros >= 1) & (numeros <= SERIAL_MAXIMO))
+    return (ORIGEM_EXCEL + pd.to_timedelta(np.floor(numeros), unit="D")).astype("datetime64[ns]")
+
+
+def _de_texto(textos):
+    textos = textos.str.strip()
+    # Formatos canônicos convertidos direto pelo parser em C do pandas; o resto passa pelas máscaras
+    resultado = pd.to_datetime(textos, format="%d/%m/%Y", errors="coerce").astype("datetime64[ns]")
+    pendentes = resultado.isna()
+    for formato, padrao in (("%Y-%m-%d", None), ("%d%m%Y", _COMPACTO)):
+        if not pendentes.any():
+            return resultado
+        candidatos = textos[pendentes]
+        if padrao:
+            candidatos = candidatos[candidatos.str.fullmatch(padrao)]
+        resultado[candidatos.index] = pd.to_datetime(candidatos, format=formato, errors="coerce")
+        pendentes = resultado.isna()
+    if pendentes.any():
+        trocados = textos[pendentes].str.replace(r"[.\-]", "/", regex=True)
+        resultado[trocados.index] = pd.to_datetime(trocados, format="%d/%m/%Y", errors="coerce")
+        pendentes = resultado.isna()
+    # Ano com dois dígitos, dia/mês sem zero à esquerda e hora junto da data
+    for padrao in (_DMA, _ISO):
+        if not pendentes.any():
+            return resultado
+        partes = textos[pendentes].str.extract(padrao)
+        casou = partes[0].notna()
+        if not casou.any():
+            continue
+        partes = partes[casou].astype("int64")
+        if padrao == _ISO:
+            ano, mes, dia = partes[0], partes[1], partes[2]
+        else:
+            dia, mes, ano = partes[0], partes[1], partes[2]
+            # Ano com dois dígitos segue a convenção do strptime (%y): 00-68 -> 2000, 69-99 -> 1900
+            ano = ano.where(ano >= 100, ano + np.where(ano < 69, 2000, 1900))
+        resultado[partes.index] = _de_componentes(ano, mes, dia)
+        pendentes[partes.index] = False
+    seriais = textos[pendentes]
+    seriais = seriais[seriais.str.fullmatch(_SERIAL)]
+    if len(seriais):
+        resultado[seriais.index] = _de_serial(seriais.str.replace(",", ".", regex=False))
+    return resultado
+
+
+def _classe(tipos, classes, exceto=()):
+    # Um teste por tipo distinto, não por célula
+    return tipos.map({t: issubclass(t, classes) and not issubclass(t, exceto) for t in tipos.unique()}).astype(bool)
+
+
+def normalizar_datas(serie):
+    """Converte a coluna de datas da planilha em ``datetime64``; NaT onde não houver data válida"""
+    serie = pd.Series(serie)
+    indice = serie.index
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, "tz", None) is not None:
+            serie = serie.dt.tz_localize(None)
+        return serie.astype("datetime64[ns]").dt.normalize()
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return _de_serial(serie)
+    valores = serie.astype(object).reset_index(drop=True)
+    tipos = valores.map(type)
+    resultado = pd.Series(pd.NaT, index=valores.index, dtype="datetime64[ns]")
+    datas = _classe(tipos, (datetime, date, np.datetime64))
+    if datas.any():
+        # Datas com fuso (ex.: vindas de Parquet) valem pela hora local, como as demais
+        carimbos = valores[datas].map(lambda v: pd.Timestamp(v).tz_localize(None) if getattr(v, "tzinfo", None) else v)
+        resultado[datas] = pd.to_datetime(carimbos.map(pd.Timestamp), errors="coerce").dt.normalize()
+    numeros = _classe(tipos, (int, float, np.integer, np.floating), exceto=bool)
+    if numeros.any():
+        resultado[numeros] = _de_serial(valores[numeros])
+    textos = _classe(tipos, str)
+    if textos.any():
+        resultado[textos] = _de_texto(valores[textos].astype(str))
+    resultado.index = indice
+    return resultado
+
+
+def parse_valores(serie):
+    """Converte a coluna de valores (``1.000,00``, ``1000``, ``R$ -2.500,50``, números) em float64; NaN se inválido"""
+    serie = pd.Series(serie)
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype("float64")
+    if pd.api.types.is_string_dtype(serie) and pd.api.types.infer_dtype(serie, skipna=True) == "string":
+        return _valores_de_texto(serie.astype(str).where(serie.notna()))
+    valores = serie.astype(object)
+    tipos = valores.map(type)
+    resultado = pd.Series(np.nan, index=serie.index, dtype="float64")
+    numeros = _classe(tipos, (int, float, np.integer, np.floating), exceto=bool)
+    if numeros.any():
+        resultado[numeros] = valores[numeros].astype("float64")
+    textos = _classe(tipos, str)
+    if textos.any():
+        resultado[textos] = _valores_de_texto(valores[textos].astype(str))
+    return resultado
+
+
+def _valores_de_texto(textos):
+    negativos = textos.str.contains("-", regex=False) | textos.str.strip().str.startswith("(")
+    limpos = textos
+    # Um str.replace por símbolo: cada um roda no Arrow, sem passar célula a célula pelo Python
+    # (str.translate passa, e mede quase o dobro do tempo)
+    for simbolo in _DESCARTAR:
+        limpos = limpos.str.replace(simbolo, "", regex=False)
+    # Com vírgula, ponto é separador de milhar (1.000,00). Sem vírgula, ponto só é
+    # milhar em grupos de três dígitos (1.000 e 1.000.000); nos demais é decimal (1000.5)
+    com_virgula = limpos.str.contains(",", regex=False)
+    milhar = ~com_virgula & limpos.str.fullmatch(_MILHAR)
+    limpos = limpos.mask(com_virgula | milhar, limpos.str.replace(".", "", regex=False))
+    limpos = limpos.mask(com_virgula, limpos.str.replace(",", ".", regex=False))
+    validos = limpos.str.fullmatch(_NUMERO).fillna(False).astype(bool)
+    numeros = pd.Series(np.nan, index=textos.index, dtype="float64")
+    numeros[validos] = limpos[validos].astype("float64")
+    return numeros.where(~negativos, -numeros)
+
+
+def formatar_valores(serie, prefixo="R$ "):
+    """Formata a coluna em reais (``R$ 1.234,56``); texto vazio onde não houver valor"""
+    numeros = pd.to_numeric(pd.Series(serie), errors="coerce").astype("float64")
+    validos = numeros.notna()
+    # Negativo que arredonda para zero sai "0,00", não "-0,00"
+    numeros = numeros.mask(numeros.abs() < 0.005, 0.0)
+    # Uma formatação por célula no padrão americano; a troca de separadores é feita na coluna
+    formatados = numeros[validos].map("{:,.2f}".format).astype(str)
+    formatados = (
+        formatados.str.replace(",", "_", regex=False)
+        .str.replace(".", ",", regex=False)
+        .str.replace("_", ".", regex=False)
+    )
+    resultado = pd.Series("", index=numeros.index, dtype=object)
+    resultado[validos] = prefixo + formatados
+    return resultado
@@ -0,0 +1,444 @@
+"""Base local das séries históricas dos índices e tabelas de fatores acumulados.
+
+As séries ficam num arquivo SQLite em ``dados/indices.sqlite`` (ou no diretório
+apontado por ``ATUALIZACAO_DADOS``), uma linha por período com a taxa em % do
+período, como publicada pelo SGS do Bacen. Cada gravação incrementa a versão do
+índice, o que permite descartar tabelas já carregadas quando a base muda.
+
+Ao carregar, cada série vira uma ``TabelaFatores``: um vetor denso com o
+produto acumulado de ``1 + taxa`` indexado por dia útil (séries diárias) ou por
+mês (séries mensais). O fator de ``[data_inicial, data_final)`` é a razão entre
+duas posições desse vetor, sem percorrer o intervalo linha a linha.
+
+As tabelas montadas vão para um arquivo binário ao lado da base
+(``tabelas.fatores``): um cabeçalho JSON com unidade, origem e versão de cada
+índice, seguido dos vetores ``float64``. Os processos e as sessões abrem esse
+arquivo com ``numpy.memmap``, então a partida não remonta nada e as páginas
+são compartilhadas pelo sistema entre todos, sem uma cópia por processo.
+Quando a base muda, o arquivo é regravado num temporário e trocado de uma vez;
+quem ainda tem o antigo aberto segue nele até notar a versão nova.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from atualizacao import calendario
+
+DIRETORIO_DADOS = Path(os.environ.get("ATUALIZACAO_DADOS", Path(__file__).resolve().parent.parent / "dados"))
+ARQUIVO_BASE = "indices.sqlite"
+VERSAO_ESQUEMA = 1
+ARQUIVO_TABELAS = "tabelas.fatores"
+MAGICO = b"FATORES2"
+# Vetores float64 de cada tabela no arquivo mapeado, alinhados a 64 bytes
+VETORES = ("acumulado", "taxas", "diario")
+ALINHAMENTO = 64
+# Segundos em que obter_tabelas confia na data de modificação da base sem consultar as versões
+INTERVALO_VERSOES = 5.0
+
+# --- SÉRIES POR ÍNDICE (MESMAS CHAVES DE INDICES NO APP) ---
+SERIES = {
+    "Selic": {"codigo_sgs": 11, "periodicidade": "diaria"},
+    "IPCA": {"codigo_sgs": 433, "periodicidade": "mensal"},
+    "CDI": {"codigo_sgs": 12, "periodicidade": "diaria"},
+    "IGPM": {"codigo_sgs": 189, "periodicidade": "mensal"},
+}
+
+UNIDADES = {"diaria": "D", "mensal": "M"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    indice TEXT NOT NULL,
+    data TEXT NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (indice, data)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versoes (
+    indice TEXT PRIMARY KEY,
+    versao INTEGER NOT NULL,
+    atualizado_em TEXT NOT NULL
+);
+"""
+
+
+class BaseIndices:
+    """Acesso ao arquivo SQLite com as séries dos índices."""
+
+    def __init__(self, caminho=None):
+        self.caminho = Path(caminho) if caminho else DIRETORIO_DADOS / ARQUIVO_BASE
+
+    def conectar(self):
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        conexao = sqlite3.connect(self.caminho)
+        conexao.executescript(_ESQUEMA)
+        versao = conexao.execute("SELECT valor FROM metadados WHERE chave = 'versao_esquema'").fetchone()
+        if versao is None:
+            conexao.execute("INSERT INTO metadados VALUES ('versao_esquema', ?)", (str(VERSAO_ESQUEMA),))
+            conexao.commit()
+        elif int(versao[0]) != VERSAO_ESQUEMA:
+            conexao.close()
+            raise ValueError(f"Base de índices {self.caminho} tem esquema {versao[0]}, esperado {VERSAO_ESQUEMA}")
+        return conexao
+
+    @contextmanager
+    def transacao(self):
+        conexao = self.conectar()
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def gravar(self, indice, datas, valores):
+        """Grava (ou substitui) os valores da série e incrementa a versão do índice"""
+        if indice not in SERIES:
+            raise KeyError(f"Índice desconhecido: {indice}")
+        datas = pd.to_datetime(pd.Series(datas)).dt.strftime("%Y-%m-%d")
+        linhas = list(zip([indice] * len(datas), datas, map(float, valores)))
+        agora = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.transacao() as conexao:
+            conexao.executemany("INSERT OR REPLACE INTO series VALUES (?, ?, ?)", linhas)
+            conexao.execute(
+                "INSERT INTO versoes VALUES (?, 1, ?) "
+                "ON CONFLICT(indice) DO UPDATE SET versao = versao + 1, atualizado_em = excluded.atualizado_em",
+                (indice, agora),
+            )
+        return len(linhas)
+
+    def ler(self, indice):
+        """Retorna a série do índice ordenada por data (colunas data, valor)"""
+        if not self.caminho.exists():
+            return pd.DataFrame({"data": pd.Series(dtype="datetime64[ns]"), "valor": pd.Series(dtype="float64")})
+        with self.transacao() as conexao:
+            df = pd.read_sql_query(
+                "SELECT data, valor FROM series WHERE indice = ? ORDER BY data", conexao, params=(indice,)
+            )
+        df["data"] = pd.to_datetime(df["data"], format="%Y-%m-%d")
+        return df
+
+    def ultima_data(self, indice):
+        if not self.caminho.exists():
+            return None
+        with self.transacao() as conexao:
+            linha = conexao.execute("SELECT MAX(data) FROM series WHERE indice = ?", (indice,)).fetchone()
+        return pd.Timestamp(linha[0]) if linha[0] else None
+
+    def versoes(self):
+        """Versão atual de cada índice gravado ({indice: versao})"""
+        if not self.caminho.exists():
+            return {}
+        with self.transacao() as conexao:
+            linhas = conexao.execute("SELECT indice, versao FROM versoes").fetchall()
+        return dict(linhas)
+
+
+class TabelaFatores:
+    """Produto acumulado de ``1 + taxa`` de um índice, denso por dia útil ou por mês.
+
+    ``acumulado[p]`` é o fator acumulado desde a origem até a posição ``p``.
+    Em séries diárias a posição de uma data é o número de dias úteis entre a
+    origem e ela (exclusive), pelo calendário de ``atualizacao.calendario``; em
+    séries mensais, o número de meses desde o mês anterior à origem, de modo
+    que a taxa do mês da data entra no acumulado. ``taxas[p]`` guarda a taxa
+    (% do período) que leva da posição ``p`` à ``p + 1``, para quem precisa
+    refazer o produto passo a passo (modo exato).
+
+    Nas séries mensais, ``diario[d]`` é o fator acumulado interpolado dia a
+    dia (pro rata die), na mesma convenção do fator por meses inteiros: o dia
+    1º de um mês vale ``acumulado`` da posição do mês, e a taxa da posição
+    seguinte é distribuída em progressão geométrica pelos dias corridos do
+    mês (``d`` contado a partir do primeiro dia do mês da origem). Assim, entre
+    datas no dia 1º o pro rata coincide com o fator por meses inteiros e só os
+    meses incompletos das pontas contam pela fração de dias. Montado uma vez
+    com a tabela, deixa o fator pro rata de cada linha em duas consultas ao
+    vetor.
+    """
+
+    def __init__(self, indice, unidade, origem, acumulado, versao=0, taxas=None, diario=None):
+        self.indice = indice
+        self.unidade = unidade
+        self.origem = np.datetime64(origem, unidade)
+        self.acumulado = acumulado
+        self.versao = versao
+        self.taxas = taxas
+        # Arquivo de gravar_tabelas de onde os vetores foram mapeados (abrir_tabelas); None se montada em memória
+        self.arquivo = None
+        self.diario = None
+        if unidade == "D":
+            self._deslocamento = int(calendario.posicoes(self.origem))
+        else:
+            self._primeiro_dia = self.origem.astype("datetime64[D]")
+            self.diario = diario if diario is not None else self._interpolar_diario()
+
+    def _interpolar_diario(self):
+        # Do dia 1º do mês da origem ao dia 1º do mês da última posição (os dias seguintes
+        # dependeriam da taxa do mês ainda não publicado)
+        meses = len(self.acumulado) - 1
+        if meses < 1:
+            return np.ones(0)
+        ultimo = (self.origem + meses).astype("datetime64[D]")
+        dias = np.arange(self._primeiro_dia, ultimo + 1)
+        mes = dias.astype("datetime64[M]")
+        posicao = (mes - self.origem).astype("int64")
+        antes = self.acumulado[posicao]
+        # O último dia fica com o acumulado inteiro da última posição
+        depois = self.acumulado[np.minimum(posicao + 1, meses)]
+        decorridos = (dias - mes.astype("datetime64[D]")).astype("float64")
+        dias_mes = ((mes + 1).astype("datetime64[D]") - mes.astype("datetime64[D]")).astype("float64")
+        return antes * (depois / antes) ** (decorridos / dias_mes)
+
+    @classmethod
+    def de_serie(cls, indice, datas, taxas, versao=0):
+        """Monta a tabela a partir das datas e taxas (% por período) da série"""
+        unidade = UNIDADES[SERIES[indice]["periodicidade"]]
+        periodos = np.asarray(pd.to_datetime(datas).values).astype(f"datetime64[{unidade}]")
+        fatores = 1 + np.asarray(taxas, dtype="float64") / 100
+        if unidade == "M":
+            # Um período por mês; meses ausentes invalidam as posições seguintes
+            origem = periodos[0] - 1
+            densos = np.full(int(periodos[-1] - origem) + 1, np.nan)
+            densos[0] = 1.0
+            posicoes = (periodos - origem).astype("int64")
+            densos[posicoes] = np.cumprod(fatores)
+            por_mes = np.full(len(densos) - 1, np.nan)
+            por_mes[posicoes - 1] = np.asarray(taxas, dtype="float64")
+            faltantes = np.isnan(densos)
+            if faltantes.any():
+                densos[np.argmax(faltantes):] = np.nan
+            return cls(indice, unidade, origem, densos, versao, por_mes)
+        # Uma posição por dia útil; dia útil sem taxa publicada não rende e taxa
+        # publicada em feriado do calendário soma-se ao dia útil seguinte
+        uteis = calendario.posicoes(periodos)
+        uteis = uteis - uteis[0]
+        por_dia = np.ones(int(uteis[-1]) + 1)
+        np.multiply.at(por_dia, uteis, fatores)
+        acumulado = np.concatenate(([1.0], np.cumprod(por_dia)))
+        # Taxa original de cada dia útil; só as posições com mais de uma taxa usam a composta
+        taxas_dia = np.zeros(len(por_dia))
+        taxas_dia[uteis] = np.asarray(taxas, dtype="float64")
+        repetidas = np.bincount(uteis, minlength=len(por_dia)) > 1
+        taxas_dia[repetidas] = (por_dia[repetidas] - 1) * 100
+        return cls(indice, unidade, periodos[0], acumulado, versao, taxas_dia)
+
+    def posicoes(self, datas):
+        if self.unidade == "D":
+            return calendario.posicoes(datas) - self._deslocamento
+        periodos = np.asarray(datas, dtype="datetime64[ns]").astype("datetime64[M]")
+        return (periodos - self.origem).astype("int64")
+
+    def intervalo(self, data_inicial, data_final):
+        """Posições de início e fim de ``[data_inicial, data_final)`` e máscara das cobertas pela série"""
+        inicio = self.posicoes(data_inicial)
+        fim = self.posicoes(data_final)
+        n = len(self.acumulado)
+        validos = (inicio >= 0) & (inicio < n) & (fim >= 0) & (fim < n)
+        inicio = np.where(validos, inicio, 0)
+        # Data final anterior à inicial não desvaloriza: fator 1, como no cálculo por meses
+        fim = np.where(validos, np.maximum(fim, inicio), 0)
+        validos &= ~np.isnan(self.acumulado[fim])
+        return inicio, fim, validos
+
+    def ultimo_mes(self):
+        """Último mês com taxa publicada (séries mensais); None sem nenhum"""
+        publicadas = np.flatnonzero(~np.isnan(self.acumulado))
+        if self.unidade != "M" or len(publicadas) < 2:
+            return None
+        return self.origem + int(publicadas[-1])
+
+    def nao_publicadas(self, datas, pro_rata=False):
+        """Datas finais que dependem de taxa ainda não publicada (só nas séries mensais).
+
+        No pro rata os dias depois do 1º do último mês já contam a taxa do mês seguinte.
+        """
+        ultimo = self.ultimo_mes()
+        datas = np.asarray(datas, dtype="datetime64[ns]")
+        if ultimo is None:
+            return np.zeros(len(datas), dtype=bool)
+        if pro_rata:
+            return datas.astype("datetime64[D]") > ultimo.astype("datetime64[D]")
+        return datas.astype("datetime64[M]") > ultimo
+
+    def fator(self, data_inicial, data_final, pro_rata=False):
+        """Fator de ``[data_inicial, data_final)``; NaN fora do período coberto.
+
+        Nas séries mensais a taxa do mês da data final entra no fator. Como o
+        IPCA e o IGP-M de um mês só são publicados no mês seguinte, a data
+        final no mês corrente (ou num mês ainda sem taxa) dá NaN até a
+        publicação; ``nao_publicadas`` separa esses casos dos demais fora da
+        série. ``pro_rata`` usa, nas séries mensais, o acumulado diário
+        interpolado (meses incompletos nas pontas contam pela fração de dias
+        corridos).
+        """
+        if pro_rata and self.unidade == "M":
+            return self.fator_pro_rata(data_inicial, data_final)
+        inicio, fim, validos = self.intervalo(data_inicial, data_final)
+        return np.where(validos, self.acumulado[fim] / self.acumulado[inicio], np.nan)
+
+    def fator_pro_rata(self, data_inicial, data_final):
+        """Fator pro rata die de ``[data_inicial, data_final)`` pela tabela ``diario``"""
+        inicio = (np.asarray(data_inicial, dtype="datetime64[ns]").astype("datetime64[D]")
+                  - self._primeiro_dia).astype("int64")
+        fim = (np.asarray(data_final, dtype="datetime64[ns]").astype("datetime64[D]")
+               - self._primeiro_dia).astype("int64")
+        n = len(self.diario)
+        if not n:
+            return np.full(len(inicio), np.nan)
+        validos = (inicio >= 0) & (inicio < n) & (fim >= 0) & (fim < n)
+        inicio = np.where(validos, inicio, 0)
+        fim = np.where(validos, np.maximum(fim, inicio), 0)
+        validos &= ~np.isnan(self.diario[fim])
+        return np.where(validos, self.diario[fim] / self.diario[inicio], np.nan)
+
+
+_tabelas = {}
+
+
+def carregar_tabelas(base=None):
+    """Lê a base e monta a tabela de fatores de cada índice com dados gravados"""
+    base = base or BaseIndices()
+    versoes = base.versoes()
+    tabelas = {}
+    for indice in SERIES:
+        if indice not in versoes:
+            continue
+        serie = base.ler(indice)
+        if serie.empty:
+            continue
+        tabelas[indice] = TabelaFatores.de_serie(indice, serie["data"], serie["valor"], versoes[indice])
+    return tabelas
+
+
+# --- ARQUIVO MAPEADO DAS TABELAS ---
+
+def gravar_tabelas(tabelas, caminho):
+    """Grava as tabelas num arquivo binário e troca o anterior de uma vez (``os.replace``).
+
+    Quem já mapeou o arquivo antigo continua lendo a versão dele até reabrir.
+    """
+    caminho = Path(caminho)
+    cabecalho, vetores, posicao = {}, [], 0
+    for indice, tabela in tabelas.items():
+        descricao = {"unidade": tabela.unidade, "origem": str(tabela.origem), "versao": int(tabela.versao)}
+        for nome in VETORES:
+            vetor = getattr(tabela, nome)
+            if vetor is None:
+                continue
+            vetor = np.ascontiguousarray(vetor, dtype="<f8")
+            descricao[nome] = [posicao, len(vetor)]
+            vetores.append(vetor)
+            posicao += _alinhar(vetor.nbytes)
+        cabecalho[indice] = descricao
+    texto = json.dumps(cabecalho).encode("utf-8")
+    inicio = _alinhar(len(MAGICO) + 8 + len(texto))
+    descritor, temporario = tempfile.mkstemp(prefix=f".{caminho.name}.", dir=caminho.parent)
+    try:
+        # mkstemp cria só para o dono; o arquivo é lido por todos os processos do serviço
+        os.chmod(temporario, 0o644)
+        with os.fdopen(descritor, "wb") as arquivo:
+            arquivo.write(MAGICO + len(texto).to_bytes(8, "little") + texto)
+            arquivo.write(bytes(inicio - arquivo.tell()))
+            for vetor in vetores:
+                arquivo.write(vetor.tobytes())
+                arquivo.write(bytes(_alinhar(vetor.nbytes) - vetor.nbytes))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+
+
+def abrir_tabelas(caminho):
+    """Tabelas do arquivo de ``gravar_tabelas``, com os vetores mapeados (somente leitura) em vez de copiados"""
+    mapa = np.memmap(caminho, dtype=np.uint8, mode="r")
+    if bytes(mapa[:len(MAGICO)]) != MAGICO:
+        raise ValueError(f"{caminho} não é um arquivo de tabelas de fatores")
+    tamanho = int.from_bytes(bytes(mapa[len(MAGICO):len(MAGICO) + 8]), "little")
+    fim = len(MAGICO) + 8 + tamanho
+    cabecalho = json.loads(bytes(mapa[len(MAGICO) + 8:fim]))
+    inicio = _alinhar(fim)
+    tabelas = {}
+    for indice, descricao in cabecalho.items():
+        vetores = {}
+        for nome in VETORES:
+            if nome in descricao:
+                posicao, n = descricao[nome]
+                vetores[nome] = np.frombuffer(mapa, dtype="<f8", count=n, offset=inicio + posicao)
+        tabelas[indice] = TabelaFatores(indice, descricao["unidade"], descricao["origem"], vetores["acumulado"],
+                                        descricao["versao"], vetores.get("taxas"), vetores.get("diario"))
+        tabelas[indice].arquivo = os.path.abspath(caminho)
+    return tabelas
+
+
+def publicar_tabelas(base=None, caminho=None):
+    """Remonta as tabelas a partir da base e regrava o arquivo mapeado; devolve as tabelas"""
+    base = base or BaseIndices()
+    tabelas = carregar_tabelas(base)
+    gravar_tabelas(tabelas, caminho or arquivo_tabelas(base))
+    return tabelas
+
+
+def arquivo_tabelas(base):
+    """Arquivo mapeado das tabelas da base, ao lado do SQLite"""
+    return base.caminho.with_name(ARQUIVO_TABELAS)
+
+
+def _alinhar(n):
+    return -(-n // ALINHAMENTO) * ALINHAMENTO
+
+
+def _abrir_atualizado(base, versoes):
+    # Arquivo mapeado nas versões da base; remonta e troca quando falta ou está velho
+    caminho = arquivo_tabelas(base)
+    try:
+        tabelas = abrir_tabelas(caminho)
+        if {indice: tabela.versao for indice, tabela in tabelas.items()} == versoes:
+            return tabelas
+    except (OSError, ValueError):
+        pass
+    try:
+        publicar_tabelas(base, caminho)
+        return abrir_tabelas(caminho)
+    except OSError:
+        # Pasta sem escrita (ou troca negada pelo sistema): tabelas só deste processo
+        return carregar_tabelas(base)
+
+
+def _assinatura(caminho):
+    # Muda a cada gravação na base (o SQLite reescreve o arquivo no commit)
+    try:
+        estado = caminho.stat()
+    except OSError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+def obter_tabelas(base=None):
+    """Tabelas de fatores do arquivo mapeado, reabertas só quando a versão da base muda.
+
+    As versões só são consultadas no SQLite quando o arquivo da base muda ou a
+    cada ``INTERVALO_VERSOES`` segundos (a data de modificação pode ter
+    resolução grossa); nas demais chamadas basta um ``stat``.
+    """
+    base = base or BaseIndices()
+    chave = str(base.caminho)
+    assinatura = _assinatura(base.caminho)
+    agora = time.monotonic()
+    carregado = _tabelas.get(chave)
+    if carregado is not None and carregado[1] == assinatura and agora - carregado[2] < INTERVALO_VERSOES:
+        return carregado[3]
+    versoes = base.versoes()
+    tabelas = carregado[3] if carregado is not None and carregado[0] == versoes else _abrir_atualizado(base, versoes)
+    _tabelas[chave] = (versoes, assinatura, agora, tabelas)
+    return tabelas
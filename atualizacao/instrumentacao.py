@@ -0,0 +1,191 @@
+"""Medição por etapa do processamento em massa: tempo, linhas e pico de RSS.
+
+``Instrumentacao`` acumula, para cada etapa (leitura, normalização de datas,
+cálculo...), o tempo de relógio, a quantidade de linhas e o maior RSS do
+processo observado enquanto a etapa rodava. Uma etapa pode ser medida várias
+vezes (uma por bloco) e os valores se somam. O RSS é amostrado por uma thread
+à parte a cada ``INTERVALO_AMOSTRAGEM`` segundos, lendo ``/proc/self/statm``;
+em sistemas sem ``/proc`` o pico fica ``None`` e o resto funciona igual.
+
+O resultado sai como lista de dicionários (para a tela), em linhas de log
+estruturadas (JSON) ou no formato texto do Prometheus, para o coletor de
+arquivos do node_exporter na execução pela linha de comando.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+INTERVALO_AMOSTRAGEM = 0.005
+_FIM = object()
+
+logger = logging.getLogger("atualizacao")
+
+
+def rss_atual():
+    """RSS do processo em bytes; None onde ``/proc`` não existe"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class AmostradorRSS:
+    """Maior RSS observado desde o último ``reiniciar``, amostrado numa thread à parte"""
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRAGEM):
+        self.intervalo = intervalo
+        self.inicial = self.pico = rss_atual()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_atual())
+
+    def reiniciar(self):
+        if self.inicial is not None:
+            self.pico = rss_atual()
+
+    def __enter__(self):
+        if self.inicial is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        if self.inicial is not None:
+            self._parar.set()
+            self._thread.join()
+            self.pico = max(self.pico, rss_atual())
+
+    @property
+    def acrescimo_mb(self):
+        return (self.pico - self.inicial) / 2**20 if self.inicial is not None else None
+
+
+class Instrumentacao:
+    """Tempo, linhas e pico de RSS acumulados por etapa, na ordem em que as etapas aparecem.
+
+    Uso::
+
+        instrumentacao = Instrumentacao()
+        with instrumentacao:
+            for bloco in instrumentacao.iterar("leitura", ler_excel_em_blocos(arquivo)):
+                with instrumentacao.etapa("calculo", len(bloco)):
+                    ...
+        instrumentacao.resumo()
+    """
+
+    def __init__(self, rotulos=None):
+        self.rotulos = dict(rotulos or {})
+        self.etapas = {}
+        self.erro = None
+        self._amostrador = None
+        self._inicio = None
+        self.segundos_total = 0.0
+
+    def __enter__(self):
+        self._amostrador = AmostradorRSS().__enter__()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        self.segundos_total = time.perf_counter() - self._inicio
+        self._amostrador.__exit__(tipo, valor, rastro)
+
+    def _registrar(self, nome, segundos, linhas, pico):
+        etapa = self.etapas.setdefault(nome, {"segundos": 0.0, "linhas": 0, "chamadas": 0, "pico_rss": None})
+        etapa["segundos"] += segundos
+        etapa["linhas"] += linhas
+        etapa["chamadas"] += 1
+        if pico is not None:
+            etapa["pico_rss"] = max(etapa["pico_rss"] or 0, pico)
+
+    @contextmanager
+    def etapa(self, nome, linhas=0):
+        """Mede o bloco ``with`` como uma ocorrência da etapa ``nome``; registra a etapa de um erro"""
+        amostrador = self._amostrador
+        if amostrador is not None:
+            amostrador.reiniciar()
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception as exc:
+            if self.erro is None:
+                self.erro = {"etapa": nome, "tipo": type(exc).__name__, "mensagem": str(exc)}
+            raise
+        finally:
+            pico = amostrador.pico if amostrador is not None else None
+            self._registrar(nome, time.perf_counter() - inicio, linhas, pico)
+
+    def iterar(self, nome, iteravel):
+        """Repassa os itens de ``iteravel`` medindo o tempo de produzir cada um (ex.: blocos lidos)"""
+        iterador = iter(iteravel)
+        while True:
+            with self.etapa(nome):
+                item = next(iterador, _FIM)
+            if item is _FIM:
+                return
+            self.etapas[nome]["linhas"] += len(item) if hasattr(item, "__len__") else 0
+            yield item
+
+    def resumo(self):
+        """Uma linha por etapa, com linhas por segundo e pico de RSS em MB"""
+        linhas = []
+        for nome, etapa in self.etapas.items():
+            segundos = etapa["segundos"]
+            linhas.append({
+                "etapa": nome,
+                "segundos": round(segundos, 4),
+                "linhas": etapa["linhas"],
+                "linhas_por_segundo": round(etapa["linhas"] / segundos) if segundos and etapa["linhas"] else None,
+                "pico_rss_mb": round(etapa["pico_rss"] / 2**20, 1) if etapa["pico_rss"] is not None else None,
+                "chamadas": etapa["chamadas"],
+            })
+        return linhas
+
+    def registrar_log(self, nivel=logging.INFO):
+        """Uma linha JSON por etapa no logger ``atualizacao``"""
+        for linha in self.resumo():
+            logger.log(nivel, json.dumps({"evento": "etapa", **self.rotulos, **linha}, ensure_ascii=False))
+        if self.erro:
+            logger.error(json.dumps({"evento": "erro", **self.rotulos, **self.erro}, ensure_ascii=False))
+
+    def prometheus(self, prefixo="atualizacao"):
+        """Métricas desta medição no formato texto do Prometheus"""
+        return prometheus([self], prefixo)
+
+
+def medir(instrumentacao, nome, linhas=0):
+    """``instrumentacao.etapa(nome, linhas)``, ou um contexto vazio quando não há medição"""
+    return instrumentacao.etapa(nome, linhas) if instrumentacao is not None else nullcontext()
+
+
+def prometheus(instrumentacoes, prefixo="atualizacao"):
+    """Formato texto do Prometheus: uma série por etapa de cada medição, com os rótulos dela"""
+    metricas = (
+        ("etapa_segundos", "Tempo de relógio da etapa, em segundos", "segundos"),
+        ("etapa_linhas", "Linhas processadas pela etapa", "linhas"),
+        ("etapa_pico_rss_bytes", "Maior RSS do processo durante a etapa", "pico_rss"),
+    )
+    saida = []
+    for nome, ajuda, campo in metricas:
+        saida.append(f"# HELP {prefixo}_{nome} {ajuda}")
+        saida.append(f"# TYPE {prefixo}_{nome} gauge")
+        for instrumentacao in instrumentacoes:
+            for etapa, valores in instrumentacao.etapas.items():
+                if valores[campo] is None:
+                    continue
+                rotulos = ",".join(
+                    f'{chave}="{_escapar(valor)}"'
+                    for chave, valor in {**instrumentacao.rotulos, "etapa": etapa}.items()
+                )
+                saida.append(f"{prefixo}_{nome}{{{rotulos}}} {valores[campo]}")
+    return "\n".join(saida) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,105 @@
+"""Parte do motor usada pelas telas Streamlit antes de qualquer cálculo.
+
+``app.py``, ``appA.py`` e ``app_vipal_corrigido.py`` montam a página a partir
+daqui: índices com a fonte de cada um, extensões aceitas no upload, máscara
+das datas digitadas e a atualização de um valor avulso. O módulo não importa
+pandas, NumPy nem openpyxl; o motor (``atualizacao.calculo`` e o restante) só
+é carregado quando um valor é calculado ou um arquivo é enviado, de modo que a
+primeira página de um processo novo sai sem esperar por eles.
+"""
+import math
+import re
+from functools import lru_cache
+
+# --- ÍNDICES DISPONÍVEIS (MESMAS CHAVES DE indices.SERIES) ---
+INDICES = {
+    "Selic": {"fonte": "Bacen"},
+    "IPCA": {"fonte": "IBGE"},
+    "CDI": {"fonte": "B3"},
+    "IGPM": {"fonte": "FGV"},
+}
+
+# Extensão -> formato de leitura (``leitura.ler_em_blocos``)
+EXTENSOES = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+}
+
+MENSAGEM_DADOS_INVALIDOS = "Verifique os dados. Formato correto: dd/mm/aaaa e valor em reais."
+MENSAGEM_PERIODO_INVERTIDO = "A data final deve ser posterior à data inicial."
+MENSAGEM_FORA_DA_SERIE = "Período fora da série histórica disponível para o índice."
+MENSAGEM_INDICE_NAO_PUBLICADO = ("O {indice} de {mes} ainda não foi publicado e a taxa do mês da data final entra "
+                                 "no cálculo. Último mês disponível: {ultimo}.")
+
+
+def auto_formatar_data(valor):
+    """Insere as barras de ``dd/mm/aaaa`` enquanto a data é digitada (só os 8 primeiros dígitos)"""
+    v = re.sub(r"\D", "", str(valor or ""))[:8]
+    if len(v) >= 5:
+        return f"{v[:2]}/{v[2:4]}/{v[4:]}"
+    elif len(v) >= 3:
+        return f"{v[:2]}/{v[2:]}"
+    else:
+        return v
+
+
+def validar_data(data):
+    """Data digitada (dia primeiro) como ``Timestamp``; None se não for uma data"""
+    import pandas as pd
+
+    try:
+        data = pd.to_datetime(data, dayfirst=True, errors="raise")
+    except Exception:
+        return None
+    return None if pd.isnull(data) else data
+
+
+def formatar_valor_monetario(valor):
+    """Valor no padrão brasileiro ``1.000,00``"""
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def atualizar_individual(valor_base, data_inicial, data_final, indice_nome, exato=False, pro_rata=False):
+    """Valor atualizado dos campos digitados; devolve ``(valor, None)`` ou ``(None, mensagem de erro)``"""
+    from atualizacao.calculo import calcular_indice, parse_valor
+
+    dt_ini = validar_data(data_inicial)
+    dt_fim = validar_data(data_final)
+    try:
+        valor = parse_valor(valor_base)
+    except Exception:
+        valor = None
+    if dt_ini is None or dt_fim is None or not str(valor_base or "").strip() or valor is None or not valor > 0:
+        return None, MENSAGEM_DADOS_INVALIDOS
+    if dt_ini > dt_fim:
+        return None, MENSAGEM_PERIODO_INVERTIDO
+    atualizado = calcular_indice(valor, data_inicial, data_final, indice_nome, exato=exato, pro_rata=pro_rata)
+    if math.isnan(atualizado):
+        return None, mensagem_fora_da_serie(indice_nome, dt_fim, pro_rata)
+    return atualizado, None
+
+
+def mensagem_fora_da_serie(indice_nome, data_final, pro_rata=False, tabelas=None):
+    """Motivo do cálculo sem resultado: índice mensal ainda não publicado para a data final ou período fora da série"""
+    from atualizacao.indices import obter_tabelas
+
+    tabela = (obter_tabelas() if tabelas is None else tabelas).get(indice_nome)
+    if tabela is None or not tabela.nao_publicadas([data_final.to_datetime64()], pro_rata)[0]:
+        return MENSAGEM_FORA_DA_SERIE
+    ultimo = tabela.ultimo_mes()
+    return MENSAGEM_INDICE_NAO_PUBLICADO.format(
+        indice=indice_nome, mes=(ultimo + 1).astype(object).strftime("%m/%Y"),
+        ultimo=ultimo.astype(object).strftime("%m/%Y"),
+    )
+
+
+@lru_cache(maxsize=1)
+def exemplo_xlsx():
+    """Planilha modelo em ``.xlsx``, montada no primeiro download e guardada para o processo"""
+    from atualizacao.calculo import exemplo_excel, gerar_excel
+
+    return gerar_excel(exemplo_excel())
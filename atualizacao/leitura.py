@@ -0,0 +1,236 @@
+"""Leitura em blocos de planilhas grandes.
+
+``pd.read_excel`` carrega a pasta de trabalho inteira na memória antes de
+devolver o primeiro dado. Aqui a planilha é percorrida linha a linha com o
+modo ``read_only`` do openpyxl e entregue em ``DataFrame`` de até
+``tamanho_bloco`` linhas, de modo que o pico de memória depende do tamanho do
+bloco e não do arquivo.
+
+Arquivos ``.csv`` são lidos em blocos pelo ``chunksize`` do pandas, com as
+células como texto, para passar pela mesma normalização das planilhas.
+
+Arquivos colunares (``.parquet`` e Feather/Arrow IPC, via pyarrow, dependência
+opcional) chegam com os tipos nativos: datas como ``datetime64`` e valores como
+números, de modo que ``normalizar_datas`` e ``parse_valores`` só confirmam o
+tipo, sem interpretar texto. O Parquet e o Feather são lidos pelos lotes do
+próprio arquivo (o Feather mapeado na memória, sem cópia até a conversão de
+cada bloco) e ``contar_linhas`` usa só os metadados.
+
+Em todos os formatos o índice dos blocos segue a posição da linha no arquivo
+(0 é a primeira linha depois do cabeçalho; na planilha, contando as linhas em
+branco descartadas), para que relatórios apontem a linha original.
+"""
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+
+# Definidas em atualizacao.interface, para as telas listarem os tipos aceitos sem importar o motor
+from atualizacao.interface import EXTENSOES
+
+TAMANHO_BLOCO = 50_000
+
+
+def _openpyxl():
+    # Importado na primeira planilha lida: CSV e formatos colunares não pagam a importação
+    from openpyxl import load_workbook
+
+    return load_workbook
+
+
+def _nomes_colunas(cabecalho):
+    return [str(c).strip() if c is not None else f"Unnamed: {i}" for i, c in enumerate(cabecalho)]
+
+
+def ler_excel_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, aba=0):
+    """Gera ``DataFrame`` com até ``tamanho_bloco`` linhas da aba, na ordem do arquivo"""
+    if tamanho_bloco < 1:
+        raise ValueError("tamanho_bloco deve ser positivo")
+    pasta = _openpyxl()(arquivo, read_only=True, data_only=True)
+    try:
+        planilha = pasta.worksheets[aba] if isinstance(aba, int) else pasta[aba]
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = _nomes_colunas(cabecalho)
+        largura = len(colunas)
+        # Linhas totalmente vazias (comuns no fim de planilhas editadas) são descartadas
+        linhas = (
+            (numero, (linha + (None,) * largura)[:largura])
+            for numero, linha in enumerate(linhas)
+            if any(v is not None for v in linha)
+        )
+        while True:
+            bloco = list(islice(linhas, tamanho_bloco))
+            if not bloco:
+                break
+            numeros, valores = zip(*bloco)
+            yield pd.DataFrame.from_records(valores, columns=colunas, index=pd.Index(numeros, dtype="int64"))
+    finally:
+        pasta.close()
+
+
+def contar_linhas_excel(arquivo, aba=0):
+    """Linhas de dados declaradas na dimensão da aba (sem o cabeçalho); None se a planilha não a informa"""
+    pasta = _openpyxl()(arquivo, read_only=True, data_only=True)
+    try:
+        planilha = pasta.worksheets[aba] if isinstance(aba, int) else pasta[aba]
+        return max(planilha.max_row - 1, 0) if planilha.max_row else None
+    finally:
+        pasta.close()
+        if hasattr(arquivo, "seek"):
+            arquivo.seek(0)
+
+
+def _separador(arquivo):
+    # Padrão do Excel brasileiro é ";"; cabeçalho sem ";" indica CSV separado por vírgula
+    if hasattr(arquivo, "read"):
+        posicao = arquivo.tell()
+        cabecalho = arquivo.readline()
+        arquivo.seek(posicao)
+        cabecalho = cabecalho.decode("utf-8-sig", errors="replace") if isinstance(cabecalho, bytes) else cabecalho
+    else:
+        with open(arquivo, encoding="utf-8-sig", newline="") as texto:
+            cabecalho = texto.readline()
+    return ";" if ";" in cabecalho or "," not in cabecalho else ","
+
+
+def ler_csv_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, separador=None):
+    """Gera ``DataFrame`` de texto com até ``tamanho_bloco`` linhas do CSV, na ordem do arquivo"""
+    if tamanho_bloco < 1:
+        raise ValueError("tamanho_bloco deve ser positivo")
+    leitor = pd.read_csv(
+        arquivo, sep=separador or _separador(arquivo), dtype=str, encoding="utf-8-sig",
+        chunksize=tamanho_bloco, skip_blank_lines=True,
+    )
+    with leitor:
+        for bloco in leitor:
+            bloco.columns = [str(c).strip() for c in bloco.columns]
+            yield bloco
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise RuntimeError("A leitura de Parquet e Feather requer o pacote pyarrow") from exc
+    return pa
+
+
+def _para_pandas(tabela):
+    # Datas do Arrow (date32) viram datetime64, não objetos date, e decimais viram float
+    pa = _pyarrow()
+    colunas = [
+        coluna.cast(pa.float64()) if pa.types.is_decimal(coluna.type) else coluna
+        for coluna in tabela.columns
+    ]
+    tabela = pa.Table.from_arrays(colunas, names=[str(n).strip() for n in tabela.column_names])
+    return tabela.to_pandas(date_as_object=False)
+
+
+def ler_parquet_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera ``DataFrame`` com tipos nativos e até ``tamanho_bloco`` linhas do Parquet, na ordem do arquivo"""
+    if tamanho_bloco < 1:
+        raise ValueError("tamanho_bloco deve ser positivo")
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    inicio = 0
+    with pq.ParquetFile(arquivo) as parquet:
+        for lote in parquet.iter_batches(batch_size=tamanho_bloco):
+            bloco = _para_pandas(pa.Table.from_batches([lote]))
+            bloco.index = pd.RangeIndex(inicio, inicio + len(bloco))
+            inicio += len(bloco)
+            yield bloco
+
+
+def _abrir_feather(arquivo):
+    # Leitor do arquivo mapeado na memória: os lotes são lidos um a um, sem carregar a tabela inteira
+    pa = _pyarrow()
+    fonte = pa.memory_map(str(arquivo)) if isinstance(arquivo, (str, Path)) else arquivo
+    try:
+        return pa.ipc.open_file(fonte)
+    except pa.ArrowInvalid:
+        # Fluxos IPC (.arrows) não têm o rodapé do formato de arquivo
+        fonte.seek(0)
+    try:
+        return pa.ipc.open_stream(fonte)
+    except pa.ArrowInvalid:
+        # Feather v1 (obsoleto) não tem lotes: a tabela é lida inteira
+        import pyarrow.feather
+
+        fonte.seek(0)
+        return pyarrow.feather.read_table(fonte).to_reader()
+
+
+def _lotes_feather(leitor):
+    if hasattr(leitor, "num_record_batches"):
+        return (leitor.get_batch(i) for i in range(leitor.num_record_batches))
+    return iter(leitor)
+
+
+def ler_feather_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera ``DataFrame`` com tipos nativos e até ``tamanho_bloco`` linhas do Feather/Arrow IPC"""
+    if tamanho_bloco < 1:
+        raise ValueError("tamanho_bloco deve ser positivo")
+    pa = _pyarrow()
+    leitor = _abrir_feather(arquivo)
+    # Lotes do arquivo reagrupados em blocos de tamanho_bloco linhas; as fatias não copiam os dados
+    pendentes, linhas, inicio = [], 0, 0
+    for lote in _lotes_feather(leitor):
+        pendentes.append(lote)
+        linhas += lote.num_rows
+        while linhas >= tamanho_bloco:
+            tabela = pa.Table.from_batches(pendentes, schema=leitor.schema)
+            bloco = _para_pandas(tabela.slice(0, tamanho_bloco))
+            bloco.index = pd.RangeIndex(inicio, inicio + len(bloco))
+            inicio += len(bloco)
+            yield bloco
+            resto = tabela.slice(tamanho_bloco)
+            pendentes, linhas = resto.to_batches(), resto.num_rows
+    if linhas:
+        bloco = _para_pandas(pa.Table.from_batches(pendentes, schema=leitor.schema))
+        bloco.index = pd.RangeIndex(inicio, inicio + len(bloco))
+        yield bloco
+
+
+def formato_entrada(arquivo, nome=None):
+    """Formato de leitura (``xlsx``, ``csv``, ``parquet`` ou ``feather``) pela extensão de ``nome`` ou do caminho"""
+    sufixo = Path(nome or getattr(arquivo, "name", None) or str(arquivo)).suffix.lower()
+    if sufixo not in EXTENSOES:
+        raise ValueError(f"formato de arquivo não suportado: {sufixo or 'sem extensão'}")
+    return EXTENSOES[sufixo]
+
+
+def ler_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, nome=None):
+    """Blocos do arquivo conforme a extensão (``nome`` informa a extensão de arquivos em memória)"""
+    leitores = {
+        "xlsx": ler_excel_em_blocos,
+        "csv": ler_csv_em_blocos,
+        "parquet": ler_parquet_em_blocos,
+        "feather": ler_feather_em_blocos,
+    }
+    return leitores[formato_entrada(arquivo, nome)](arquivo, tamanho_bloco)
+
+
+def contar_linhas(arquivo, nome=None):
+    """Linhas de dados do arquivo (estimativa para planilhas e CSV); None se não houver como saber sem ler tudo"""
+    formato = formato_entrada(arquivo, nome)
+    if formato == "xlsx":
+        return contar_linhas_excel(arquivo)
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+
+        _pyarrow()
+        with pq.ParquetFile(arquivo) as parquet:
+            linhas = parquet.metadata.num_rows
+    elif formato == "feather":
+        # Só os cabeçalhos dos lotes: no arquivo mapeado os dados nem chegam a ser lidos
+        linhas = sum(lote.num_rows for lote in _lotes_feather(_abrir_feather(arquivo)))
+    else:
+        conteudo = arquivo.getvalue() if hasattr(arquivo, "getvalue") else Path(arquivo).read_bytes()
+        linhas = max(conteudo.count(b"\n") - 1 + (not conteudo.endswith(b"\n")), 0) if conteudo else 0
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    return linhas
@@ -0,0 +1,179 @@
+"""Cálculo em massa distribuído em vários processos.
+
+Os blocos de entrada são divididos em pedaços de até ``tamanho_pedaco`` linhas
+e calculados num ``ProcessPoolExecutor``. As tabelas de fatores não viajam com
+cada tarefa: cada processo abre o mesmo arquivo mapeado de
+``indices.obter_tabelas`` (``tabelas.fatores``), só para leitura, de modo que
+todos leem as mesmas páginas de memória. Cada tarefa leva apenas as colunas
+do pedaço (datas e valores em vetores NumPy) e devolve o vetor de resultados;
+a montagem final respeita a ordem original das linhas. Blocos com a coluna
+``indice`` são separados por índice e cada índice é calculado numa rodada só,
+com as linhas dele de todos os blocos do lote.
+
+Entradas pequenas (abaixo de ``LIMIAR_PARALELO`` linhas) ou com um único
+processo são calculadas no próprio processo, sem o custo de enviar dados.
+
+Sem navegador, ``python -m atualizacao`` (``atualizacao.cli``) usa o mesmo pool.
+"""
+import atexit
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from atualizacao.calculo import calcular_indice_lote, grupos_por_indice
+from atualizacao.indices import abrir_tabelas, gravar_tabelas, obter_tabelas
+
+TAMANHO_PEDACO = 100_000
+LIMIAR_PARALELO = 200_000
+
+# Tabelas já abertas neste processo trabalhador, por arquivo mapeado
+_mapeadas = {}
+
+
+def trabalhadores_padrao():
+    """Quantidade de processos: ``ATUALIZACAO_TRABALHADORES`` ou o número de CPUs"""
+    return int(os.environ.get("ATUALIZACAO_TRABALHADORES") or os.cpu_count() or 1)
+
+
+def _abrir(caminho, indice_nome, versao):
+    # Tabelas do arquivo mapeado, reabertas quando o arquivo é trocado (nova publicação)
+    estado = os.stat(caminho)
+    assinatura = (estado.st_ino, estado.st_mtime_ns)
+    carregado = _mapeadas.get(caminho)
+    if carregado is None or carregado[0] != assinatura:
+        carregado = (assinatura, abrir_tabelas(caminho))
+        _mapeadas[caminho] = carregado
+    tabela = carregado[1][indice_nome]
+    if tabela.versao != versao:
+        raise RuntimeError(f"a série {indice_nome} foi atualizada durante o cálculo; calcule de novo")
+    return tabela
+
+
+def _calcular_pedaco(descritor, indice_nome, exato, pro_rata, data_inicial, data_final, valor):
+    # Executado no processo trabalhador; descritor = (arquivo mapeado, versão da série) ou None sem série
+    tabelas = {indice_nome: _abrir(descritor[0], indice_nome, descritor[1])} if descritor else {}
+    df = pd.DataFrame({"data_inicial": data_inicial, "data_final": data_final, "valor": valor})
+    return calcular_indice_lote(df, indice_nome, exato=exato, tabelas=tabelas, pro_rata=pro_rata).to_numpy()
+
+
+def _colunas(df):
+    return (
+        pd.to_datetime(df["data_inicial"], format="%d/%m/%Y", errors="coerce").to_numpy(),
+        pd.to_datetime(df["data_final"], format="%d/%m/%Y", errors="coerce").to_numpy(),
+        pd.to_numeric(df["valor"], errors="coerce").to_numpy(dtype="float64"),
+    )
+
+
+class CalculadoraParalela:
+    """Pool de processos reutilizável para ``calcular_indice_lote`` em entradas grandes.
+
+    O pool só é criado no primeiro cálculo que passar de ``limiar`` linhas e
+    pode atender vários cálculos seguidos (a página mantém um por processo).
+    """
+
+    def __init__(self, trabalhadores=None, tamanho_pedaco=TAMANHO_PEDACO, limiar=LIMIAR_PARALELO):
+        self.trabalhadores = max(int(trabalhadores or trabalhadores_padrao()), 1)
+        self.tamanho_pedaco = tamanho_pedaco
+        self.limiar = limiar
+        self._pool = None
+        self._pasta = None
+        # Tabelas recebidas prontas (fora do arquivo mapeado da base), gravadas uma vez para os processos
+        self._gravadas = {}
+        atexit.register(self.fechar)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        self.fechar()
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self._pasta is not None:
+            shutil.rmtree(self._pasta, ignore_errors=True)
+            self._pasta = None
+            self._gravadas = {}
+
+    def calcular(self, df, indice_nome, exato=False, tabelas=None, pro_rata=False):
+        return self.calcular_blocos([df], indice_nome, exato, tabelas, pro_rata=pro_rata)[0]
+
+    def lotes(self, blocos):
+        """Agrupa blocos consecutivos em lotes de ``trabalhadores * tamanho_pedaco`` linhas (um pedaço por processo)"""
+        linhas = self.trabalhadores * self.tamanho_pedaco
+        lote, total = [], 0
+        for bloco in blocos:
+            lote.append(bloco)
+            total += len(bloco)
+            if total >= linhas:
+                yield lote
+                lote, total = [], 0
+        if lote:
+            yield lote
+
+    def calcular_blocos(self, blocos, indice_nome, exato=False, tabelas=None, por_linha=True, pro_rata=False):
+        """Série ``valor_atualizado`` de cada bloco, na ordem e com o índice originais.
+
+        Com a coluna ``indice`` cada linha usa o próprio índice (``indice_nome`` onde estiver em branco);
+        ``por_linha=False`` ignora a coluna e calcula todas as linhas por ``indice_nome``.
+        """
+        if not por_linha or not any("indice" in bloco.columns for bloco in blocos):
+            return self._calcular_blocos(blocos, indice_nome, exato, tabelas, pro_rata)
+        grupos = [grupos_por_indice(bloco, indice_nome) for bloco in blocos]
+        resultados = [np.full(len(bloco), np.nan) for bloco in blocos]
+        for indice in dict.fromkeys(nome for grupo in grupos for nome in grupo):
+            # As linhas do índice em todos os blocos do lote, numa rodada só
+            partes = [(numero, grupo[indice]) for numero, grupo in enumerate(grupos) if indice in grupo]
+            fatias = [blocos[numero] if posicoes is None else blocos[numero].iloc[posicoes]
+                      for numero, posicoes in partes]
+            calculados = self._calcular_blocos(fatias, indice, exato, tabelas, pro_rata)
+            for (numero, posicoes), resultado in zip(partes, calculados):
+                resultados[numero][slice(None) if posicoes is None else posicoes] = resultado.to_numpy()
+        return [pd.Series(r, index=bloco.index, name="valor_atualizado") for bloco, r in zip(blocos, resultados)]
+
+    def _calcular_blocos(self, blocos, indice_nome, exato, tabelas, pro_rata):
+        total = sum(len(bloco) for bloco in blocos)
+        if self.trabalhadores == 1 or total < self.limiar:
+            return [calcular_indice_lote(bloco, indice_nome, exato=exato, tabelas=tabelas, pro_rata=pro_rata)
+                    for bloco in blocos]
+        tabela = (obter_tabelas() if tabelas is None else tabelas).get(indice_nome)
+        if self._pool is None:
+            # spawn: o servidor do Streamlit tem threads e o fork copiaria travas em uso
+            self._pool = ProcessPoolExecutor(max_workers=self.trabalhadores,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        descritor = (self._arquivo(tabela), tabela.versao) if tabela is not None else None
+        tarefas = []
+        for numero, bloco in enumerate(blocos):
+            colunas = _colunas(bloco)
+            for inicio in range(0, len(bloco), self.tamanho_pedaco):
+                fatia = slice(inicio, inicio + self.tamanho_pedaco)
+                tarefas.append((numero, self._pool.submit(
+                    _calcular_pedaco, descritor, indice_nome, exato, pro_rata, *(c[fatia] for c in colunas)
+                )))
+        partes = [[] for _ in blocos]
+        for numero, tarefa in tarefas:
+            partes[numero].append(tarefa.result())
+        return [
+            pd.Series(np.concatenate(p) if p else np.array([], dtype="float64"),
+                      index=bloco.index, name="valor_atualizado")
+            for bloco, p in zip(blocos, partes)
+        ]
+
+    def _arquivo(self, tabela):
+        # Arquivo mapeado de onde a tabela veio; as montadas em memória vão para um arquivo do pool
+        if tabela.arquivo is not None:
+            return tabela.arquivo
+        if id(tabela) not in self._gravadas:
+            if self._pasta is None:
+                self._pasta = tempfile.mkdtemp(prefix="atualizacao_tabelas_")
+            caminho = os.path.join(self._pasta, f"{len(self._gravadas)}.fatores")
+            gravar_tabelas({tabela.indice: tabela}, caminho)
+            # A tabela fica referenciada para o id não ser reaproveitado por outra
+            self._gravadas[id(tabela)] = (tabela, caminho)
+        return self._gravadas[id(tabela)][1]
@@ -0,0 +1,142 @@
+"""Sincronização incremental da base local com o SGS do Bacen.
+
+Para cada índice de ``SERIES`` busca apenas o período ainda ausente da base
+(da última data gravada até hoje), em janelas de no máximo ``JANELA_ANOS``
+anos, que é o limite do SGS para séries diárias. Todas as requisições passam
+por uma única ``requests.Session`` com pool de conexões e novas tentativas com
+espera exponencial. Havendo valores novos, o arquivo mapeado das tabelas
+(``indices.publicar_tabelas``) é regravado e trocado ao final.
+
+Uso::
+
+    python -m atualizacao.sgs                      # todos os índices
+    python -m atualizacao.sgs --indices Selic CDI
+    python -m atualizacao.sgs --url http://127.0.0.1:8765/dados/serie/bcdata.sgs.{codigo}/dados
+
+Para testar sem rede, suba o servidor local de ``atualizacao.sgs_local``.
+"""
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from atualizacao.indices import SERIES, BaseIndices, publicar_tabelas
+
+URL_SGS = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados"
+JANELA_ANOS = 10
+INICIO_PADRAO = date(2000, 1, 1)
+TIMEOUT = (5, 60)
+
+
+def criar_sessao(tentativas=5, espera=0.5, conexoes=4):
+    """Sessão HTTP reutilizável com pool de conexões e novas tentativas com backoff"""
+    retry = Retry(
+        total=tentativas,
+        backoff_factor=espera,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adaptador = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes, max_retries=retry)
+    sessao = requests.Session()
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    sessao.headers["Accept"] = "application/json"
+    return sessao
+
+
+def janelas(inicio, fim, anos=JANELA_ANOS):
+    """Divide ``[inicio, fim]`` em janelas consecutivas de até ``anos`` anos"""
+    atual = inicio
+    while atual <= fim:
+        try:
+            limite = atual.replace(year=atual.year + anos) - timedelta(days=1)
+        except ValueError:  # 29/02
+            limite = atual.replace(year=atual.year + anos, day=28)
+        limite = min(limite, fim)
+        yield atual, limite
+        atual = limite + timedelta(days=1)
+
+
+def buscar_serie(sessao, codigo, inicio, fim, url=URL_SGS):
+    """Baixa a série ``codigo`` entre ``inicio`` e ``fim`` (inclusive) no formato JSON do SGS"""
+    quadros = []
+    for janela_inicio, janela_fim in janelas(inicio, fim):
+        resposta = sessao.get(
+            url.format(codigo=codigo),
+            params={
+                "formato": "json",
+                "dataInicial": janela_inicio.strftime("%d/%m/%Y"),
+                "dataFinal": janela_fim.strftime("%d/%m/%Y"),
+            },
+            timeout=TIMEOUT,
+        )
+        # O SGS responde 404 quando a janela não tem valores publicados
+        if resposta.status_code == 404:
+            continue
+        resposta.raise_for_status()
+        registros = resposta.json()
+        if registros:
+            quadros.append(pd.DataFrame(registros))
+    if not quadros:
+        return pd.DataFrame({"data": pd.Series(dtype="datetime64[ns]"), "valor": pd.Series(dtype="float64")})
+    df = pd.concat(quadros, ignore_index=True)
+    df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
+    df["valor"] = pd.to_numeric(df["valor"], errors="coerce")
+    return df.dropna().drop_duplicates("data").sort_values("data", ignore_index=True)
+
+
+def periodo_pendente(base, indice, ate, desde=INICIO_PADRAO):
+    """Primeiro e último dia ainda ausentes da base para o índice (ou None)"""
+    ultima = base.ultima_data(indice)
+    if ultima is None:
+        inicio = desde
+    elif SERIES[indice]["periodicidade"] == "mensal":
+        inicio = (ultima + pd.offsets.MonthBegin(1)).date()
+    else:
+        inicio = (ultima + pd.Timedelta(days=1)).date()
+    return (inicio, ate) if inicio <= ate else None
+
+
+def sincronizar(base=None, indices=None, ate=None, url=URL_SGS, sessao=None, desde=INICIO_PADRAO):
+    """Grava na base os valores que faltam de cada índice; retorna {indice: linhas novas}"""
+    base = base or BaseIndices()
+    ate = ate or date.today()
+    sessao = sessao or criar_sessao()
+    novos = {}
+    for indice in indices or SERIES:
+        pendente = periodo_pendente(base, indice, ate, desde)
+        if pendente is None:
+            novos[indice] = 0
+            continue
+        serie = buscar_serie(sessao, SERIES[indice]["codigo_sgs"], *pendente, url=url)
+        novos[indice] = base.gravar(indice, serie["data"], serie["valor"]) if len(serie) else 0
+    if any(novos.values()):
+        # Troca já o arquivo mapeado, para os processos em execução não remontarem as tabelas cada um
+        try:
+            publicar_tabelas(base)
+        except OSError:
+            pass
+    return novos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza a base local de índices com o SGS do Bacen")
+    parser.add_argument("--indices", nargs="+", choices=list(SERIES), help="índices a sincronizar (padrão: todos)")
+    parser.add_argument("--url", default=URL_SGS, help="URL da série, com {codigo} no lugar do código SGS")
+    parser.add_argument("--base", help="arquivo SQLite da base (padrão: dados/indices.sqlite)")
+    parser.add_argument("--desde", default=INICIO_PADRAO.strftime("%d/%m/%Y"),
+                        help="início do histórico quando o índice ainda não existe na base (dd/mm/aaaa)")
+    args = parser.parse_args(argv)
+    desde = pd.to_datetime(args.desde, format="%d/%m/%Y").date()
+    with criar_sessao() as sessao:
+        novos = sincronizar(BaseIndices(args.base), args.indices, url=args.url, sessao=sessao, desde=desde)
+    for indice, linhas in novos.items():
+        print(f"{indice}: {linhas} novos valores")
+
+
+if __name__ == "__main__":
+    main()
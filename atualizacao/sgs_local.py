@@ -0,0 +1,125 @@
+"""Servidor HTTP local que imita a API de séries do SGS do Bacen.
+
+Responde em ``/dados/serie/bcdata.sgs.{codigo}/dados?formato=json&dataInicial=..&dataFinal=..``
+com valores sintéticos e determinísticos, no mesmo formato JSON do SGS
+(``[{"data": "dd/mm/aaaa", "valor": "0.043739"}]``). Séries diárias têm valor em
+dias de semana; séries mensais, no primeiro dia de cada mês. Como o SGS,
+recusa consultas de séries diárias acima de 10 anos e responde 404 para
+janelas sem valores.
+
+Uso::
+
+    python -m atualizacao.sgs_local --porta 8765
+    python -m atualizacao.sgs --url http://127.0.0.1:8765/dados/serie/bcdata.sgs.{codigo}/dados
+"""
+import argparse
+import json
+import math
+import re
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from atualizacao.indices import SERIES
+
+CAMINHO = re.compile(r"^/dados/serie/bcdata\.sgs\.(\d+)/dados/?$")
+PERIODICIDADES = {s["codigo_sgs"]: s["periodicidade"] for s in SERIES.values()}
+LIMITE_DIAS_DIARIA = 3653
+
+
+def valor_sintetico(codigo, dia):
+    """Taxa % do período, estável para o mesmo código e data"""
+    ciclo = math.sin(dia.toordinal() / 97 + codigo)
+    if PERIODICIDADES.get(codigo) == "mensal":
+        return f"{0.45 + 0.35 * ciclo:.2f}"
+    return f"{0.04 + 0.01 * ciclo:.6f}"
+
+
+def gerar_registros(codigo, inicio, fim):
+    registros = []
+    if PERIODICIDADES.get(codigo) == "mensal":
+        dia = inicio.replace(day=1)
+        if dia < inicio:
+            dia = (dia + timedelta(days=32)).replace(day=1)
+        while dia <= fim:
+            registros.append({"data": dia.strftime("%d/%m/%Y"), "valor": valor_sintetico(codigo, dia)})
+            dia = (dia + timedelta(days=32)).replace(day=1)
+        return registros
+    dia = inicio
+    while dia <= fim:
+        if dia.weekday() < 5:
+            registros.append({"data": dia.strftime("%d/%m/%Y"), "valor": valor_sintetico(codigo, dia)})
+        dia += timedelta(days=1)
+    return registros
+
+
+class ManipuladorSGS(BaseHTTPRequestHandler):
+    # A cada ``falhar_a_cada`` requisições uma responde 503, para exercitar as novas tentativas
+    falhar_a_cada = 0
+    _contador = 0
+    _trava = threading.Lock()
+
+    def do_GET(self):
+        with self._trava:
+            ManipuladorSGS._contador += 1
+            falhar = self.falhar_a_cada and ManipuladorSGS._contador % self.falhar_a_cada == 0
+        if falhar:
+            return self._responder(503, {"erro": "Serviço temporariamente indisponível"})
+        url = urlparse(self.path)
+        casamento = CAMINHO.match(url.path)
+        if not casamento:
+            return self._responder(404, {"erro": "Série não encontrada"})
+        codigo = int(casamento.group(1))
+        parametros = parse_qs(url.query)
+        try:
+            inicio = datetime.strptime(parametros["dataInicial"][0], "%d/%m/%Y").date()
+            fim = datetime.strptime(parametros["dataFinal"][0], "%d/%m/%Y").date()
+        except (KeyError, ValueError):
+            return self._responder(400, {"erro": "Informe dataInicial e dataFinal no formato dd/MM/aaaa"})
+        if PERIODICIDADES.get(codigo) != "mensal" and (fim - inicio).days > LIMITE_DIAS_DIARIA:
+            return self._responder(400, {"erro": "O sistema aceita uma janela de consulta de, no máximo, 10 anos"})
+        registros = gerar_registros(codigo, inicio, fim)
+        if not registros:
+            return self._responder(404, {"error": "Value(s) not found", "tag": "NOT_FOUND"})
+        self._responder(200, registros)
+
+    def _responder(self, status, conteudo):
+        corpo = json.dumps(conteudo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def iniciar_servidor(porta=0, host="127.0.0.1"):
+    """Sobe o servidor em uma thread; retorna (servidor, url no formato de URL_SGS)"""
+    servidor = ThreadingHTTPServer((host, porta), ManipuladorSGS)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://{host}:{servidor.server_address[1]}/dados/serie/bcdata.sgs.{{codigo}}/dados"
+    return servidor, url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API do SGS do Bacen")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--falhar-a-cada", type=int, default=0, help="responde 503 a cada N requisições")
+    args = parser.parse_args(argv)
+    ManipuladorSGS.falhar_a_cada = args.falhar_a_cada
+    servidor = ThreadingHTTPServer((args.host, args.porta), ManipuladorSGS)
+    print(f"SGS local em http://{args.host}:{args.porta}/dados/serie/bcdata.sgs.{{codigo}}/dados")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
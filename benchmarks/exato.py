@@ -0,0 +1,86 @@
+"""Custo do modo exato (centavos inteiros e fatores truncados) frente ao float64.
+
+Monta tabelas sintéticas de Selic e IPCA com os mesmos valores do servidor
+local do SGS, sem rede e sem base em disco, e mede o cálculo de ``linhas``
+valores sobre ``pares`` pares distintos de datas nos dois modos.
+
+Uso::
+
+    python -m benchmarks.exato --linhas 200000 --pares 2000
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from atualizacao.exato import aplicar, em_reais, fatores_exatos_tabela
+from atualizacao.indices import SERIES, TabelaFatores
+from atualizacao.sgs_local import gerar_registros
+
+INICIO = date(2000, 1, 1)
+FIM = date(2024, 12, 31)
+
+
+def tabela_sintetica(indice):
+    registros = pd.DataFrame(gerar_registros(SERIES[indice]["codigo_sgs"], INICIO, FIM))
+    datas = pd.to_datetime(registros["data"], format="%d/%m/%Y")
+    return TabelaFatores.de_serie(indice, datas, registros["valor"].astype("float64"))
+
+
+def dados_sinteticos(linhas, pares, semente=0):
+    gerador = np.random.default_rng(semente)
+    dias = (pd.Timestamp(FIM) - pd.Timestamp(INICIO)).days
+    inicios = gerador.integers(0, dias, pares)
+    fins = inicios + gerador.integers(1, dias - inicios + 1)
+    escolhidos = gerador.integers(0, pares, linhas)
+    base = pd.Timestamp(INICIO)
+    return (
+        base + pd.to_timedelta(inicios[escolhidos], unit="D"),
+        base + pd.to_timedelta(fins[escolhidos], unit="D"),
+        np.round(gerador.uniform(1, 1_000_000, linhas), 2),
+    )
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--pares", type=int, default=2_000, help="pares distintos de datas")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    data_inicial, data_final, valores = dados_sinteticos(args.linhas, args.pares)
+    print(f"{args.linhas} linhas, {args.pares} pares distintos (melhor de {args.repeticoes})")
+    for indice in ("Selic", "IPCA"):
+        tabela = tabela_sintetica(indice)
+
+        def modo_float():
+            return valores * tabela.fator(data_inicial, data_final)
+
+        def modo_exato():
+            fatores, casas = fatores_exatos_tabela(tabela, data_inicial, data_final)
+            return em_reais(aplicar(valores, fatores, casas))
+
+        # A primeira chamada converte as taxas da tabela em fatores inteiros (feito uma vez por tabela)
+        modo_exato()
+        t_float, r_float = cronometrar(modo_float, args.repeticoes)
+        t_exato, r_exato = cronometrar(modo_exato, args.repeticoes)
+        diferenca = np.nanmax(np.abs(r_exato - r_float))
+        print(
+            f"{indice:6} float {t_float * 1000:9.1f} ms | exato {t_exato * 1000:9.1f} ms "
+            f"| {t_exato / t_float:6.1f}x | maior diferença R$ {diferenca:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
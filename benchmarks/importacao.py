@@ -0,0 +1,76 @@
+"""Partida a frio: tempo de importação do motor e da primeira página de cada tela.
+
+Cada medida roda num interpretador novo, como um processo recém-criado pelo
+autoscaler, e é repetida ``--repeticoes`` vezes (vale a menor). Mede:
+
+- a importação de ``atualizacao``, ``atualizacao.interface`` (o que as telas
+  importam) e ``atualizacao.calculo`` (o motor completo), dizendo se pandas
+  foi carregado junto;
+- a primeira execução de ``app.py``, ``appA.py`` e ``app_vipal_corrigido.py``
+  pelo ``AppTest`` do Streamlit, da importação do Streamlit à página pronta,
+  sem upload nem cálculo.
+
+Uso::
+
+    python -m benchmarks.importacao
+    python -m benchmarks.importacao --repeticoes 5 --saida partida.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PASTA_RAIZ = Path(__file__).resolve().parent.parent
+MODULOS = ("atualizacao", "atualizacao.interface", "atualizacao.calculo")
+TELAS = ("app.py", "appA.py", "app_vipal_corrigido.py")
+
+_IMPORTAR = """
+import sys, time
+inicio = time.perf_counter()
+import {modulo}
+print(time.perf_counter() - inicio, "pandas" in sys.modules)
+"""
+
+_PAGINA = """
+import sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+teste = AppTest.from_file({caminho!r}, default_timeout=60).run()
+if teste.exception:
+    raise SystemExit(teste.exception[0].message)
+print(time.perf_counter() - inicio, "pandas" in sys.modules)
+"""
+
+
+def _executar(codigo):
+    saida = subprocess.run([sys.executable, "-c", codigo], cwd=PASTA_RAIZ, capture_output=True, text=True,
+                           check=True).stdout.split()
+    return float(saida[-2]), saida[-1] == "True"
+
+
+def medir(codigo, repeticoes):
+    medidas = [_executar(codigo) for _ in range(repeticoes)]
+    return {"segundos": round(min(s for s, _ in medidas), 4), "pandas": medidas[-1][1]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default=None, help="grava as medidas num arquivo JSON")
+    args = parser.parse_args(argv)
+    resultado = {"importacao": {}, "primeira_pagina": {}}
+    for modulo in MODULOS:
+        medida = resultado["importacao"][modulo] = medir(_IMPORTAR.format(modulo=modulo), args.repeticoes)
+        print(f"  import {modulo:24} {medida['segundos']:7.3f} s  pandas: {'sim' if medida['pandas'] else 'não'}")
+    for tela in TELAS:
+        codigo = _PAGINA.format(caminho=str(PASTA_RAIZ / tela))
+        medida = resultado["primeira_pagina"][tela] = medir(codigo, args.repeticoes)
+        print(f"  página {tela:24} {medida['segundos']:7.3f} s  pandas: {'sim' if medida['pandas'] else 'não'}")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
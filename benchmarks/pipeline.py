@@ -0,0 +1,250 @@
+"""Benchmark das etapas da atualização em massa, da leitura à exportação.
+
+Gera (uma vez, em ``benchmarks/dados``) planilhas sintéticas no layout de
+``exemplo_excel`` com 1 mil, 100 mil e 1 milhão de linhas (``--entrada``
+escolhe ``.xlsx``, ``.csv`` ou os formatos colunares, com datas e valores já
+tipados) e mede cada etapa
+separadamente: leitura, conversão de datas e de valores pelo formato
+detectado (``atualizacao.esquema``), relatório de validação,
+``calcular_indice_lote``, ``formatar_valores``, exportação em blocos e
+``gerar_excel``. Para cada etapa registra o tempo, as linhas por segundo e o
+pico de memória: por padrão o acréscimo de RSS do processo durante a etapa,
+amostrado por uma thread a cada 5 ms (inclui a memória nativa de NumPy e
+Arrow, sem custo perceptível); com ``--tracemalloc``, o pico alocado pelo
+Python, mais preciso por etapa mas várias vezes mais lento.
+
+As tabelas de fatores são sintéticas (as mesmas do servidor local do SGS),
+para o resultado não depender da base local nem da rede. O resultado vai para
+``benchmarks/resultados/<commit>.json`` (``<commit>-<entrada>.json`` fora do
+``.xlsx``); ``--comparar`` confronta dois desses arquivos etapa a etapa.
+
+Uso::
+
+    python -m benchmarks.pipeline                       # 1k, 100k e 1M linhas
+    python -m benchmarks.pipeline --tamanhos 1000 100000 --tracemalloc
+    python -m benchmarks.pipeline --entrada parquet
+    python -m benchmarks.pipeline --comparar resultados/abc1234.json resultados/def5678.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from atualizacao.cache import cache_fatores
+from atualizacao.calculo import calcular_indice_lote, gerar_excel
+from atualizacao.exportacao import ExportadorBlocos
+from atualizacao.esquema import converter_datas, converter_valores, detectar_esquema, validar_bloco
+from atualizacao.formatos import formatar_valores
+from atualizacao.instrumentacao import AmostradorRSS, rss_atual
+from atualizacao.leitura import ler_em_blocos
+from benchmarks.exato import tabela_sintetica
+
+PASTA = Path(__file__).resolve().parent
+PASTA_DADOS = PASTA / "dados"
+PASTA_RESULTADOS = PASTA / "resultados"
+TAMANHOS = (1_000, 100_000, 1_000_000)
+ENTRADAS = {"xlsx": ".xlsx", "csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+INDICE = "Selic"
+# Diferença acima da qual --comparar aponta regressão
+TOLERANCIA = 0.10
+
+
+def planilha_sintetica(linhas, semente=0, entrada="xlsx"):
+    """Caminho do arquivo sintético com ``linhas`` linhas no formato ``entrada``, gerado só na primeira vez"""
+    caminho = PASTA_DADOS / f"sintetica_{linhas}{ENTRADAS[entrada]}"
+    if caminho.exists():
+        return caminho
+    PASTA_DADOS.mkdir(exist_ok=True)
+    gerador = np.random.default_rng(semente)
+    # Como nas planilhas reais, muitas linhas repetem o mesmo par de datas
+    pares = max(linhas // 50, 1)
+    inicios = pd.Timestamp("2005-01-01") + pd.to_timedelta(gerador.integers(0, 6000, pares), unit="D")
+    fins = inicios + pd.to_timedelta(gerador.integers(1, 3000, pares), unit="D")
+    escolhidos = gerador.integers(0, pares, linhas)
+    valores = np.round(gerador.uniform(1, 1_000_000, linhas), 2)
+    if entrada in ("parquet", "feather"):
+        # Formatos colunares guardam os tipos nativos, como os sistemas que os exportam
+        tipados = pd.DataFrame({
+            "data_inicial": inicios.to_numpy()[escolhidos],
+            "data_final": fins.to_numpy()[escolhidos],
+            "valor": valores,
+        })
+        getattr(tipados, f"to_{entrada}")(caminho)
+        return caminho
+    colunas = {
+        "data_inicial": inicios.strftime("%d/%m/%Y").to_numpy()[escolhidos],
+        "data_final": fins.strftime("%d/%m/%Y").to_numpy()[escolhidos],
+        "valor": formatar_valores(valores, prefixo="").to_numpy(),
+    }
+    if entrada == "csv":
+        pd.DataFrame(colunas).to_csv(caminho, sep=";", index=False, encoding="utf-8-sig")
+        return caminho
+    import xlsxwriter
+
+    pasta = xlsxwriter.Workbook(str(caminho), {"constant_memory": True})
+    planilha = pasta.add_worksheet()
+    planilha.write_row(0, 0, list(colunas))
+    for linha, valores in enumerate(zip(*colunas.values()), start=1):
+        planilha.write_row(linha, 0, valores)
+    pasta.close()
+    return caminho
+
+
+def _medir(etapas, nome, linhas, funcao, memoria):
+    if memoria == "tracemalloc":
+        tracemalloc.start()
+    with AmostradorRSS() as amostrador:
+        inicio = time.perf_counter()
+        resultado = funcao()
+        segundos = time.perf_counter() - inicio
+    if memoria == "tracemalloc":
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    else:
+        pico = amostrador.acrescimo_mb
+    etapas[nome] = {
+        "segundos": round(segundos, 4),
+        "linhas_por_segundo": round(linhas / segundos) if segundos else None,
+        "pico_mb": round(pico, 1) if pico is not None else None,
+    }
+    print(f"  {nome:18} {segundos:9.3f} s {linhas / segundos:14,.0f} linhas/s"
+          + (f" {pico:9.1f} MB" if pico is not None else ""))
+    return resultado
+
+
+def medir_pipeline(caminho, linhas, tabelas, memoria="rss"):
+    """Tempo e memória de cada etapa sobre a planilha ``caminho``"""
+    etapas = {}
+    blocos = _medir(etapas, "leitura", linhas, lambda: list(ler_em_blocos(caminho)), memoria)
+    esquema = detectar_esquema(blocos[0])
+    originais = blocos
+    blocos = [b.rename(columns={v: k for k, v in esquema.colunas.items()}) for b in blocos]
+    formatos = esquema.formatos
+
+    def normalizar():
+        for bloco in blocos:
+            bloco["data_inicial"] = converter_datas(bloco["data_inicial"], formatos["data_inicial"])
+            bloco["data_final"] = converter_datas(bloco["data_final"], formatos["data_final"])
+
+    def parse():
+        for bloco in blocos:
+            bloco["valor"] = converter_valores(bloco["valor"], formatos["valor"])
+
+    def validar():
+        return [validar_bloco(original, bloco, esquema) for original, bloco in zip(originais, blocos)]
+
+    def calcular():
+        cache_fatores.limpar()
+        return [calcular_indice_lote(bloco, INDICE, tabelas=tabelas) for bloco in blocos]
+
+    def formatar():
+        for bloco, resultado in zip(blocos, resultados):
+            bloco["valor_atualizado"] = formatar_valores(resultado)
+
+    def exportar():
+        with ExportadorBlocos("xlsx") as saida:
+            for bloco in blocos:
+                saida.escrever(bloco)
+        saida.caminho.unlink()
+
+    _medir(etapas, "normalizar_datas", linhas, normalizar, memoria)
+    _medir(etapas, "parse_valores", linhas, parse, memoria)
+    _medir(etapas, "validacao", linhas, validar, memoria)
+    resultados = _medir(etapas, "calcular_indice", linhas, calcular, memoria)
+    _medir(etapas, "formatar_valores", linhas, formatar, memoria)
+    _medir(etapas, "exportacao_blocos", linhas, exportar, memoria)
+    _medir(etapas, "gerar_excel", linhas, lambda: gerar_excel(pd.concat(blocos, ignore_index=True)), memoria)
+    return {
+        "etapas": etapas,
+        "total_segundos": round(sum(e["segundos"] for e in etapas.values()), 4),
+    }
+
+
+def _commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PASTA,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+    return f"{commit}-modificado" if sujo else commit
+
+
+def executar(tamanhos, memoria="rss", destino=None, entrada="xlsx"):
+    tabelas = {INDICE: tabela_sintetica(INDICE)}
+    commit = _commit()
+    relatorio = {
+        "commit": commit,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "memoria": memoria,
+        "entrada": entrada,
+        "resultados": {},
+    }
+    for linhas in tamanhos:
+        caminho = planilha_sintetica(linhas, entrada=entrada)
+        print(f"{linhas:,} linhas ({caminho.name})")
+        relatorio["resultados"][str(linhas)] = medir_pipeline(caminho, linhas, tabelas, memoria)
+    rss = rss_atual()
+    relatorio["rss_final_mb"] = round(rss / 2**20, 1) if rss is not None else None
+    sufixo = "" if entrada == "xlsx" else f"-{entrada}"
+    destino = Path(destino) if destino else PASTA_RESULTADOS / f"{commit}{sufixo}.json"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultado gravado em {destino}")
+    return relatorio
+
+
+def comparar(base, novo):
+    """Imprime a razão novo/base de cada etapa; devolve True se alguma piorou mais que ``TOLERANCIA``"""
+    base = json.loads(Path(base).read_text(encoding="utf-8"))
+    novo = json.loads(Path(novo).read_text(encoding="utf-8"))
+    print(f"base {base['commit']} -> novo {novo['commit']}")
+    regressao = False
+    for linhas, resultado in novo["resultados"].items():
+        anterior = base["resultados"].get(linhas)
+        if not anterior:
+            continue
+        print(f"{int(linhas):,} linhas")
+        for etapa, medida in resultado["etapas"].items():
+            if etapa not in anterior["etapas"]:
+                continue
+            razao = medida["segundos"] / anterior["etapas"][etapa]["segundos"]
+            marca = ""
+            if razao > 1 + TOLERANCIA:
+                marca, regressao = "  <- mais lento", True
+            print(f"  {etapa:18} {anterior['etapas'][etapa]['segundos']:9.3f} s -> "
+                  f"{medida['segundos']:9.3f} s ({razao:5.2f}x){marca}")
+    return regressao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS))
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="pico alocado pelo Python em vez do RSS (bem mais lento)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON (padrão: benchmarks/resultados/<commit>.json)")
+    parser.add_argument("--entrada", choices=list(ENTRADAS), default="xlsx", help="formato do arquivo lido")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"), help="compara dois resultados JSON")
+    args = parser.parse_args(argv)
+    if args.comparar:
+        return 1 if comparar(*args.comparar) else 0
+    executar(args.tamanhos, memoria="tracemalloc" if args.tracemalloc else "rss", destino=args.saida,
+             entrada=args.entrada)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Partida das tabelas de fatores: montagem a partir do SQLite frente ao arquivo mapeado.
+
+Grava numa base temporária as séries sintéticas de todos os índices (as mesmas
+do servidor local do SGS), publica o arquivo mapeado e mede, em processos
+novos, o tempo de ter as tabelas prontas e a memória privada que cada
+processo passa a ocupar (``Private_*`` de ``/proc/self/smaps_rollup``; as
+páginas do arquivo mapeado são compartilhadas e não entram).
+
+Uso::
+
+    python -m benchmarks.tabelas --processos 4
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from atualizacao.indices import (
+    SERIES, BaseIndices, abrir_tabelas, arquivo_tabelas, carregar_tabelas, publicar_tabelas,
+)
+from atualizacao.sgs_local import gerar_registros
+from benchmarks.exato import FIM, INICIO
+
+MODOS = {
+    "sqlite": carregar_tabelas,
+    "mapeado": lambda base: abrir_tabelas(arquivo_tabelas(base)),
+}
+
+
+def memoria_privada():
+    """Bytes privados do processo (não compartilhados com outros); None sem ``/proc``"""
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            linhas = [linha.split() for linha in smaps if linha.startswith("Private_")]
+    except OSError:
+        return None
+    return sum(int(campos[1]) for campos in linhas) * 1024
+
+
+def _medir(modo, caminho, fila):
+    base = BaseIndices(caminho)
+    antes = memoria_privada()
+    inicio = time.perf_counter()
+    tabelas = MODOS[modo](base)
+    # Toca todos os vetores, como um cálculo que percorre as tabelas inteiras
+    for tabela in tabelas.values():
+        for vetor in (tabela.acumulado, tabela.taxas, tabela.diario):
+            if vetor is not None:
+                vetor.sum()
+    segundos = time.perf_counter() - inicio
+    depois = memoria_privada()
+    fila.put((segundos, None if antes is None else depois - antes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processos", type=int, default=4)
+    args = parser.parse_args(argv)
+    contexto = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as pasta:
+        base = BaseIndices(Path(pasta) / "indices.sqlite")
+        for indice, serie in SERIES.items():
+            registros = pd.DataFrame(gerar_registros(serie["codigo_sgs"], INICIO, FIM))
+            base.gravar(indice, pd.to_datetime(registros["data"], format="%d/%m/%Y"),
+                        registros["valor"].astype("float64"))
+        publicar_tabelas(base)
+        print(f"arquivo mapeado: {arquivo_tabelas(base).stat().st_size / 2**20:.1f} MB")
+        for modo in MODOS:
+            fila = contexto.Queue()
+            processos = [contexto.Process(target=_medir, args=(modo, base.caminho, fila))
+                         for _ in range(args.processos)]
+            for processo in processos:
+                processo.start()
+            medidas = [fila.get() for _ in processos]
+            for processo in processos:
+                processo.join()
+            segundos = max(s for s, _ in medidas)
+            privada = [m for _, m in medidas if m is not None]
+            print(f"{modo:8} {segundos * 1000:9.1f} ms"
+                  + (f" {max(privada) / 2**20:9.2f} MB privados por processo" if privada else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+# A base de índices dos testes fica numa pasta temporária, nunca em dados/
+os.environ["ATUALIZACAO_DADOS"] = tempfile.mkdtemp(prefix="atualizacao-testes-")
+
+import pytest  # noqa: E402
+
+from atualizacao.indices import SERIES  # noqa: E402
+from benchmarks.exato import tabela_sintetica  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def tabelas():
+    """Tabelas sintéticas de todos os índices (valores do servidor local do SGS, 2000 a 2024)"""
+    return {indice: tabela_sintetica(indice) for indice in SERIES}
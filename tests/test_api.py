@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import pytest
+
+from atualizacao.api import Servico, criar_app
+
+
+def _chamar(app, caminho, corpo):
+    mensagens = [{"type": "http.request", "body": json.dumps(corpo).encode()}]
+    enviadas = []
+
+    async def receive():
+        return mensagens.pop(0)
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    asyncio.run(app({"type": "http", "method": "POST", "path": caminho}, receive, send))
+    return enviadas[0]["status"], json.loads(enviadas[1]["body"])
+
+
+@pytest.fixture
+def app(tabelas):
+    servico = Servico()
+    servico.tabelas = tabelas
+    return criar_app(servico)
+
+
+ITEM = {"valor": "1.000,00", "data_inicial": "15/03/2010", "data_final": "09/07/2020"}
+
+
+@pytest.mark.parametrize("opcao", ["exato", "pro_rata"])
+@pytest.mark.parametrize("valor", ["false", "true", 0, 1, None])
+def test_opcoes_aceitam_so_booleanos(app, opcao, valor):
+    status, corpo = _chamar(app, "/calcular/lote", {"indice": "IPCA", opcao: valor, "itens": [ITEM]})
+    assert status == 400
+    assert opcao in corpo["erro"]
+
+
+def test_opcoes_booleanas(app):
+    status, corpo = _chamar(app, "/calcular/lote", {"indice": "IPCA", "pro_rata": False, "itens": [ITEM]})
+    assert status == 200
+    assert corpo["resultados"][0] > 1000
+
+
+def test_erro_interno_nao_expoe_detalhes(app, monkeypatch, caplog):
+    def falhar(*args):
+        raise RuntimeError("/caminho/secreto/indices.sqlite")
+
+    monkeypatch.setattr(app.servico, "calcular", falhar)
+    status, corpo = _chamar(app, "/calcular/lote", {"indice": "IPCA", "itens": [ITEM]})
+    assert status == 500
+    assert corpo == {"erro": "erro interno"}
+    assert "secreto" in caplog.text
+
+
+@pytest.mark.parametrize("indice", ["XPTO", ["IPCA"], {"nome": "IPCA"}, 1, None])
+def test_indice_invalido(app, indice):
+    status, corpo = _chamar(app, "/calcular", {"indice": indice, **ITEM})
+    assert status == 400
+    assert corpo["erro"].startswith("índice desconhecido")
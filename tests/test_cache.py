@@ -0,0 +1,97 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.cache import CacheFatores, cache_fatores
+from atualizacao.calculo import calcular_indice_lote
+
+
+class Calculo:
+    """``calcular`` que conta os pares recebidos; o fator é o número de dias do período"""
+
+    def __init__(self):
+        self.pares = 0
+
+    def __call__(self, inicios, fins):
+        self.pares += len(inicios)
+        return (fins - inicios).astype("int64").astype("float64")
+
+
+def _datas(*pares):
+    inicios, fins = zip(*pares)
+    return np.array(inicios, dtype="datetime64[D]"), np.array(fins, dtype="datetime64[D]")
+
+
+def test_pares_repetidos_calculados_uma_vez():
+    cache, calculo = CacheFatores(), Calculo()
+    inicios, fins = _datas(("2020-01-01", "2020-01-11"), ("2020-01-01", "2020-01-31"), ("2020-01-01", "2020-01-11"))
+    fatores = cache.fatores("Selic", inicios, fins, calculo, tipo="float64")
+    assert fatores.tolist() == [10.0, 30.0, 10.0]
+    assert calculo.pares == 2
+    assert cache.estatisticas()["falhas"] == 2 and cache.estatisticas()["acertos"] == 0
+    assert cache.fatores("Selic", inicios, fins, calculo, tipo="float64").tolist() == [10.0, 30.0, 10.0]
+    assert calculo.pares == 2
+    estatisticas = cache.estatisticas()
+    assert (estatisticas["acertos"], estatisticas["falhas"], estatisticas["tamanho"]) == (2, 2, 2)
+    assert estatisticas["taxa_acerto"] == 0.5
+
+
+def test_descarta_o_menos_usado():
+    cache, calculo = CacheFatores(capacidade=2), Calculo()
+    a, b, c = ("2020-01-01", "2020-01-02"), ("2020-01-01", "2020-01-03"), ("2020-01-01", "2020-01-04")
+    cache.fatores("Selic", *_datas(a), calculo)
+    cache.fatores("Selic", *_datas(b), calculo)
+    # a volta a ser o mais recente; c entra e quem sai é b
+    cache.fatores("Selic", *_datas(a), calculo)
+    cache.fatores("Selic", *_datas(c), calculo)
+    assert len(cache) == 2
+    calculo.pares = 0
+    cache.fatores("Selic", *_datas(a, c), calculo)
+    assert calculo.pares == 0
+    cache.fatores("Selic", *_datas(b), calculo)
+    assert calculo.pares == 1
+
+
+@pytest.mark.parametrize("outro", [
+    ("IPCA", False, False, 1),
+    ("Selic", True, False, 1),
+    ("Selic", False, True, 1),
+    ("Selic", False, False, 2),
+    ("Selic", False, False, "referencia"),
+])
+def test_espacos_nao_se_misturam(outro):
+    cache, calculo = CacheFatores(), Calculo()
+    par = _datas(("2020-01-01", "2020-02-01"))
+    cache.fatores(("Selic", False, False, 1), *par, calculo)
+    cache.fatores(outro, *par, calculo)
+    assert calculo.pares == 2 and len(cache) == 2
+
+
+def test_limpar_zera_dados_e_contadores():
+    cache = CacheFatores()
+    cache.fatores("Selic", *_datas(("2020-01-01", "2020-02-01")), Calculo())
+    cache.limpar()
+    assert cache.estatisticas()["tamanho"] == cache.acertos == cache.falhas == 0
+
+
+def test_capacidade_invalida():
+    with pytest.raises(ValueError):
+        CacheFatores(capacidade=0)
+
+
+def test_versao_nova_da_serie_nao_usa_fatores_antigos(tabelas):
+    cache_fatores.limpar()
+    df = pd.DataFrame({"data_inicial": ["15/03/2010"], "data_final": ["09/07/2020"], "valor": [1000.0]})
+    antiga = tabelas["IPCA"]
+    nova = copy.copy(antiga)
+    nova.versao = antiga.versao + 1
+    # Versão nova com taxas diferentes: cada período rende um pouco mais
+    nova.acumulado = np.asarray(antiga.acumulado) * 1.001 ** np.arange(len(antiga.acumulado))
+    valor_antigo = calcular_indice_lote(df, "IPCA", tabelas={"IPCA": antiga}).iloc[0]
+    assert calcular_indice_lote(df, "IPCA", tabelas={"IPCA": antiga}).iloc[0] == valor_antigo
+    falhas = cache_fatores.falhas
+    valor_novo = calcular_indice_lote(df, "IPCA", tabelas={"IPCA": nova}).iloc[0]
+    assert cache_fatores.falhas == falhas + 1
+    assert valor_novo != pytest.approx(valor_antigo)
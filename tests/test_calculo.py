@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao import calculo
+from atualizacao.cache import cache_fatores
+from atualizacao.calculo import calcular_indice, calcular_indice_lote
+from atualizacao.indices import SERIES
+
+CASOS = [
+    ("15/03/2010", "09/07/2020", 1000.0),
+    ("01/01/2015", "01/01/2015", 250.5),
+    ("31/12/2019", "02/01/2020", 0.01),
+    # Período invertido não desvaloriza: fator 1
+    ("09/07/2020", "15/03/2010", 1000.0),
+    ("15/03/2010", "09/07/2020", 0.0),
+    ("15/03/2010", "09/07/2020", -10.0),
+]
+
+
+@pytest.fixture(params=["tabelas", "referencia"])
+def origem(request, monkeypatch, tabelas):
+    # Mesmas tabelas nos dois caminhos: as sintéticas ou nenhuma (taxa de referência)
+    monkeypatch.setattr(calculo, "obter_tabelas", lambda: tabelas if request.param == "tabelas" else {})
+    cache_fatores.limpar()
+    return request.param
+
+
+@pytest.mark.parametrize("indice", list(SERIES))
+def test_lote_igual_ao_individual(indice, origem):
+    df = pd.DataFrame(CASOS, columns=["data_inicial", "data_final", "valor"])
+    lote = calcular_indice_lote(df, indice)
+    for linha, (inicio, fim, valor) in enumerate(CASOS):
+        individual = calcular_indice(valor, inicio, fim, indice)
+        if valor <= 0:
+            assert math.isnan(lote.iloc[linha]) and math.isnan(individual)
+        else:
+            assert lote.iloc[linha] == pytest.approx(individual, rel=1e-12)
+
+
+@pytest.mark.parametrize("indice", list(SERIES))
+def test_periodo_invertido_mantem_o_valor(indice, origem):
+    df = pd.DataFrame({"data_inicial": ["09/07/2020"], "data_final": ["15/03/2010"], "valor": [1000.0]})
+    assert calcular_indice_lote(df, indice).iloc[0] == pytest.approx(1000.0)
+
+
+@pytest.mark.parametrize("indice", list(SERIES))
+def test_datas_invalidas_dao_nan(indice, origem):
+    df = pd.DataFrame({
+        "data_inicial": ["31/02/2020", "", None, "15/03/2010"],
+        "data_final": ["09/07/2020", "09/07/2020", "09/07/2020", "não é data"],
+        "valor": [1000.0] * 4,
+    })
+    assert calcular_indice_lote(df, indice).isna().all()
+
+
+def test_fora_da_serie_da_nan(tabelas, monkeypatch):
+    monkeypatch.setattr(calculo, "obter_tabelas", lambda: tabelas)
+    cache_fatores.limpar()
+    df = pd.DataFrame({"data_inicial": ["15/03/1990"], "data_final": ["09/07/2020"], "valor": [1000.0]})
+    assert np.isnan(calcular_indice_lote(df, "IPCA").iloc[0])
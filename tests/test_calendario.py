@@ -0,0 +1,59 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.calendario import ORIGEM, dias_uteis, eh_dia_util, feriados_do_ano, pascoa, posicoes
+
+
+def _datas(*datas):
+    return np.array(datas, dtype="datetime64[ns]")
+
+
+@pytest.mark.parametrize("ano, uteis", [(2022, 251), (2023, 249), (2024, 253), (2025, 252)])
+def test_dias_uteis_do_ano(ano, uteis):
+    assert dias_uteis(_datas(f"{ano}-01-01"), _datas(f"{ano + 1}-01-01")).tolist() == [uteis]
+
+
+@pytest.mark.parametrize("ano, domingo", [(2023, date(2023, 4, 9)), (2024, date(2024, 3, 31)), (2038, date(2038, 4, 25))])
+def test_pascoa(ano, domingo):
+    assert pascoa(ano) == domingo
+
+
+def test_feriados_moveis_e_consciencia_negra():
+    feriados = set(feriados_do_ano(2024))
+    # Carnaval (segunda e terça), Sexta-feira Santa e Corpus Christi
+    assert {date(2024, 2, 12), date(2024, 2, 13), date(2024, 3, 29), date(2024, 5, 30)} <= feriados
+    assert date(2024, 11, 20) in feriados
+    assert date(2023, 11, 20) not in feriados_do_ano(2023)
+
+
+def test_posicoes_nao_andam_em_feriados_e_fins_de_semana():
+    # Sexta 09/02/2024, Carnaval 12 e 13/02, quarta de cinzas 14/02 (dia útil)
+    datas = _datas("2024-02-09", "2024-02-10", "2024-02-11", "2024-02-12", "2024-02-13", "2024-02-14", "2024-02-15")
+    sexta = posicoes(datas[:1])[0]
+    assert (posicoes(datas) - sexta).tolist() == [0, 1, 1, 1, 1, 1, 2]
+    assert eh_dia_util(datas).tolist() == [True, False, False, False, False, True, True]
+
+
+def test_posicoes_vetorizadas_iguais_a_contagem_do_numpy():
+    datas = pd.date_range("2019-12-20", "2025-01-10", freq="D").to_numpy()
+    esperadas = np.busday_count(ORIGEM, datas.astype("datetime64[D]"), holidays=[
+        d for ano in range(1980, 2026) for d in feriados_do_ano(ano)
+    ])
+    np.testing.assert_array_equal(posicoes(datas), esperadas)
+
+
+def test_datas_fora_do_calendario():
+    datas = _datas("1979-12-31", "NaT", "1980-01-01", "2100-12-31", "2101-01-02")
+    assert posicoes(datas).tolist() == [-1, -1, 0, posicoes(datas[3:4])[0], -1]
+    assert posicoes(datas[3:4])[0] > 0
+    assert dias_uteis(datas[:2], _datas("2020-01-01", "2020-01-01")).tolist() == [-1, -1]
+
+
+def test_dias_uteis_de_periodo_invertido_e_vazio():
+    inicios = _datas("2024-02-15", "2024-02-10", "2024-12-24")
+    fins = _datas("2024-02-09", "2024-02-11", "2024-12-26")
+    # [10/02, 11/02): sábado, nenhum dia útil; [24/12, 26/12): 24/12 só, pois 25/12 é feriado
+    assert dias_uteis(inicios, fins).tolist() == [-2, 0, 1]
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.calculo import calcular_indice_lote
+from atualizacao.composicao import Composicao
+
+
+def _bloco():
+    # Bloco já preparado (datas datetime64, valor float), como sai de ``preparar_bloco``
+    return pd.DataFrame({
+        "data_inicial": pd.to_datetime(["2010-03-15", "2015-01-31", "2020-07-01", "2019-05-20", None]),
+        "data_final": pd.to_datetime(["2020-07-09", "2015-03-30", "2020-07-01", "2018-05-20", "2020-01-01"]),
+        "valor": [1000.0, 250.5, 80.0, 10.0, 10.0],
+        "juros": ["1,5", "", "0,5", None, "1"],
+        "multa": [2.0, 10.0, np.nan, 0.0, 2.0],
+    }, index=[10, 11, 12, 13, 14])
+
+
+@pytest.mark.parametrize("texto", [
+    "correcao+juros_simples:1+multa:2",
+    "juros_compostos:0,5:mensal+juros_simples:@juros+multa:@multa",
+    "correcao+juros_compostos:1+juros_compostos:1:mensal+multa:@multa",
+])
+def test_fator_e_o_produto_das_etapas(texto):
+    bloco = _bloco()
+    composicao = Composicao.ler(texto)
+    separadas = [Composicao([etapa]).fator(bloco) for etapa in composicao.etapas]
+    np.testing.assert_allclose(composicao.fator(bloco), np.prod(separadas, axis=0), rtol=1e-15)
+
+
+def test_fator_de_cada_etapa():
+    bloco = _bloco().iloc[:2]
+    # 15/03/2010 a 09/07/2020: 3769 dias corridos; 123 meses completos (o dia 9 não alcança o 15)
+    # 31/01/2015 a 30/03/2015: 58 dias; 1 mês completo
+    np.testing.assert_allclose(Composicao.ler("juros_simples:1").fator(bloco), [1 + 0.01 * 3769 / 30, 1 + 0.01 * 58 / 30])
+    np.testing.assert_allclose(Composicao.ler("juros_compostos:1:mensal").fator(bloco), [1.01 ** 123, 1.01])
+    np.testing.assert_allclose(Composicao.ler("multa:2").fator(bloco), [1.02, 1.02])
+
+
+def test_taxas_por_coluna():
+    bloco = _bloco()
+    # Texto com vírgula e em branco (0) ou número com NaN (0): a mesma taxa por linha
+    fator = Composicao.ler("multa:@juros").fator(bloco)
+    np.testing.assert_allclose(fator, [1.015, 1.0, 1.005, 1.0, 1.01])
+    fator = Composicao.ler("multa:@multa").fator(bloco)
+    np.testing.assert_allclose(fator, [1.02, 1.10, 1.0, 1.0, 1.02])
+
+
+def test_periodo_invertido_e_sem_datas():
+    fator = Composicao.ler("juros_simples:1+multa:2").fator(_bloco())
+    # Período invertido não conta juros, só a multa; sem data inicial não há fator
+    assert fator[3] == pytest.approx(1.02)
+    assert np.isnan(fator[4])
+
+
+def test_dois_indices_igual_ao_produto_dos_fatores(tabelas):
+    bloco = _bloco().iloc[:3]
+    composicao = Composicao.ler("correcao+juros_simples:@juros+multa:2")
+    entrada = bloco.assign(data_inicial=bloco["data_inicial"].dt.strftime("%d/%m/%Y"),
+                           data_final=bloco["data_final"].dt.strftime("%d/%m/%Y"))
+    # Um fator de juros e multa por bloco, aplicado a cada coluna corrigida (como com --todos-indices)
+    fator = composicao.fator(bloco)
+    juros = 1 + np.array([0.015, 0.0, 0.005]) * (bloco["data_final"] - bloco["data_inicial"]).dt.days / 30
+    for indice in ("IPCA", "Selic"):
+        corrigido = calcular_indice_lote(entrada, indice, tabelas=tabelas)
+        final = composicao.aplicar(bloco, corrigido, fator)
+        indexador = tabelas[indice].fator(bloco["data_inicial"].to_numpy(), bloco["data_final"].to_numpy())
+        assert final.index.equals(bloco.index)
+        np.testing.assert_allclose(final.to_numpy(), bloco["valor"] * indexador * juros * 1.02, rtol=1e-12)
+
+
+def test_sem_correcao_parte_do_valor_original():
+    bloco = _bloco()
+    final = Composicao.ler("multa:10").aplicar(bloco)
+    np.testing.assert_allclose(final.iloc[:4], bloco["valor"].iloc[:4] * 1.1)
+    corrigido = pd.Series([1.0] * len(bloco), index=bloco.index)
+    assert Composicao.ler("correcao").aplicar(bloco, corrigido).tolist() == [1.0] * len(bloco)
+
+
+def test_ler_e_descrever():
+    composicao = Composicao.ler(" correcao + juros_compostos:0,5:mensal + multa:@multa ")
+    assert composicao.etapas == [("correcao", None, "pro_rata"), ("juros_compostos", 0.5, "mensal"),
+                                 ("multa", "@multa", "pro_rata")]
+    assert composicao.descrever() == "correcao+juros_compostos:0.5:mensal+multa:@multa"
+    assert composicao.colunas() == ["multa"]
+    assert Composicao.ler("").so_correcao
+    assert not Composicao.ler("juros_simples:1").corrige
+
+
+@pytest.mark.parametrize("texto, mensagem", [
+    ("juros:1", "etapa desconhecida"),
+    ("multa", "precisa de uma taxa"),
+    ("multa:dois", "taxa inválida"),
+    ("juros_simples:1:anual", "modo de juros desconhecido"),
+])
+def test_composicao_invalida(texto, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        Composicao.ler(texto)
+
+
+def test_verificar_colunas_de_taxa():
+    composicao = Composicao.ler("juros_simples:@juros+multa:@multa")
+    composicao.verificar(["juros", "multa", "valor"])
+    with pytest.raises(ValueError, match="coluna de taxa ausente: multa"):
+        composicao.verificar(["juros", "valor"])
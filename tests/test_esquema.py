@@ -0,0 +1,156 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.calculo import preparar_bloco
+from atualizacao.esquema import (
+    MOTIVOS, converter_datas, converter_indices, converter_valores, detectar_esquema, formato_data, formato_valor,
+    validar_bloco, validar_resultado,
+)
+from atualizacao.interface import MENSAGEM_FORA_DA_SERIE, mensagem_fora_da_serie
+
+
+@pytest.mark.parametrize("colunas, esperadas", [
+    (["Data Inicial", "Data Final", "Valor"], ("Data Inicial", "Data Final", "Valor")),
+    (["dt_ini", "dt_fim", "montante"], ("dt_ini", "dt_fim", "montante")),
+    (["Início", "Término", "Valor (R$)"], ("Início", "Término", "Valor (R$)")),
+    # "Valor final" também parece data final pelo nome: decide o conteúdo
+    (["Data de início", "Valor final", "Data final"], ("Data de início", "Data final", "Valor final")),
+])
+def test_colunas_pelo_nome(colunas, esperadas):
+    conteudo = {"data": ["15/03/2023", "01/04/2023"], "valor": ["1.000,00", "2.500,50"]}
+    bloco = pd.DataFrame({
+        coluna: conteudo["valor" if coluna in (esperadas[2],) else "data"] for coluna in colunas
+    })
+    esquema = detectar_esquema(bloco)
+    assert tuple(esquema.colunas[c] for c in ("data_inicial", "data_final", "valor")) == esperadas
+
+
+def test_colunas_pelo_conteudo_sem_nome_reconhecivel():
+    bloco = pd.DataFrame({
+        "cliente": ["a", "b"],
+        "de": ["15/03/2023", "01/04/2023"],
+        "ate": ["15/03/2024", "01/04/2024"],
+        "quanto": ["1.000,00", "2.500,50"],
+    })
+    esquema = detectar_esquema(bloco)
+    assert esquema.colunas == {"data_inicial": "de", "data_final": "ate", "valor": "quanto"}
+    assert esquema.formatos == {"data_inicial": "dd/mm/aaaa", "data_final": "dd/mm/aaaa", "valor": "reais"}
+
+
+def test_coluna_ausente():
+    bloco = pd.DataFrame({"data_inicial": ["15/03/2023"], "valor": ["1.000,00"], "obs": ["x"]})
+    with pytest.raises(ValueError, match="coluna obrigatória ausente: data_final"):
+        detectar_esquema(bloco)
+
+
+def test_coluna_indice_opcional_pelo_nome():
+    bloco = pd.DataFrame({
+        "data_inicial": ["15/03/2023"], "data_final": ["15/03/2024"], "valor": [10.0], "Indexador": ["ipca"],
+    })
+    esquema = detectar_esquema(bloco)
+    assert esquema.colunas["indice"] == "Indexador"
+    assert converter_indices(pd.Series(["ipca", "IGP-M", " selic ", "", None, "XPTO"])).tolist() == [
+        "IPCA", "IGPM", "Selic", None, None, "XPTO",
+    ]
+
+
+@pytest.mark.parametrize("amostra, formato", [
+    (["15/03/2023", "01/04/2023"], "dd/mm/aaaa"),
+    (["2023-03-15", None], "iso"),
+    (["15032023"], "ddmmaaaa"),
+    ([45000, 45001.5], "serial"),
+    ([datetime(2023, 3, 15)], "objeto"),
+    (["15/03/2023", "2023-03-15"], "misto"),
+])
+def test_formato_data(amostra, formato):
+    assert formato_data(pd.Series(amostra, dtype=object)) == formato
+
+
+@pytest.mark.parametrize("amostra, formato", [
+    (["1.000,00", "R$ 2,50", "-3"], "reais"),
+    (["1000.50", "2.5"], "decimal_ponto"),
+    ([1000, 2.5], "numero"),
+    (["1.000,00", "abc"], "misto"),
+])
+def test_formato_valor(amostra, formato):
+    assert formato_valor(pd.Series(amostra, dtype=object)) == formato
+
+
+def test_linhas_fora_do_formato_detectado_ainda_convertem():
+    datas = converter_datas(pd.Series(["15/03/2023", "2023-04-01", " 05/05/2023 ", "abc"], dtype=object), "dd/mm/aaaa")
+    assert datas.dt.strftime("%d/%m/%Y").tolist()[:3] == ["15/03/2023", "01/04/2023", "05/05/2023"]
+    assert pd.isna(datas.iloc[3])
+    valores = converter_valores(pd.Series(["1.000,00", "1000.5", "R$ -2,50"], dtype=object), "reais")
+    assert valores.tolist() == [1000.0, 1000.5, -2.5]
+
+
+def test_validar_bloco_aponta_cada_linha_com_problema():
+    original = pd.DataFrame({
+        "data_inicial": ["15/03/2023", "", "xx", "15/03/2023", "15/03/2023", "15/03/2024", "15/03/2023"],
+        "data_final": ["15/03/2024", "15/03/2024", "15/03/2024", "15/03/2024", "15/03/2024", "15/03/2023",
+                       "15/03/2024"],
+        "valor": ["1.000,00", "1,00", "1,00", "", "-5,00", "1,00", "1,00"],
+        "indice": ["IPCA", None, None, None, None, None, "XPTO"],
+    })
+    esquema = detectar_esquema(original)
+    preparado = preparar_bloco(original, esquema)
+    relatorio = validar_bloco(original, preparado, esquema)
+    # Linhas da planilha: o cabeçalho é a linha 1
+    assert list(zip(relatorio["linha"], relatorio["motivo"])) == [
+        (3, "data_inicial_ausente"),
+        (4, "data_inicial_invalida"),
+        (5, "valor_ausente"),
+        (6, "valor_nao_positivo"),
+        (7, "periodo_invertido"),
+        (8, "indice_invalido"),
+    ]
+    assert relatorio.loc[relatorio["motivo"] == "valor_nao_positivo", "valor_original"].tolist() == ["-5,00"]
+
+
+def test_validar_resultado_so_aponta_entradas_validas_sem_resultado():
+    preparado = pd.DataFrame({
+        "data_inicial": pd.to_datetime(["2023-03-15", "1990-01-01", None]),
+        "data_final": pd.to_datetime(["2024-03-15", "1991-01-01", "2024-03-15"]),
+        "valor": [100.0, 100.0, 100.0],
+    })
+    resultado = pd.Series([110.0, float("nan"), float("nan")])
+    relatorio = validar_resultado(preparado, resultado)
+    assert relatorio["linha"].tolist() == [3]
+    assert relatorio["motivo"].tolist() == ["fora_da_serie"]
+    assert relatorio["valor_original"].tolist() == ["01/01/1990 a 01/01/1991"]
+
+
+def test_validar_resultado_separa_o_indice_ainda_nao_publicado(tabelas):
+    preparado = pd.DataFrame({
+        "data_inicial": pd.to_datetime(["2024-03-15", "1990-01-01", "2024-03-15", "2024-03-15"]),
+        "data_final": pd.to_datetime(["2025-01-10", "1991-01-01", "2025-01-10", "2024-12-20"]),
+        "valor": [100.0, 100.0, 100.0, 100.0],
+    })
+    resultado = pd.Series([np.nan, np.nan, np.nan, np.nan])
+    indices = pd.Series(["IPCA", "IPCA", "XPTO", "IGPM"])
+    relatorio = validar_resultado(preparado, resultado, indices=indices, tabelas=tabelas)
+    assert relatorio["motivo"].tolist() == ["indice_nao_publicado", "fora_da_serie", "fora_da_serie", "fora_da_serie"]
+    assert relatorio["valor_original"].iloc[0] == "15/03/2024 a 10/01/2025 (IPCA publicado até 12/2024)"
+    # No pro rata o dia 20 do último mês publicado já depende do mês seguinte
+    relatorio = validar_resultado(preparado, resultado, indices=indices, tabelas=tabelas, pro_rata=True)
+    assert relatorio["motivo"].tolist()[3] == "indice_nao_publicado"
+    assert MOTIVOS["indice_nao_publicado"].startswith("Índice do mês da data final ainda não publicado")
+
+
+@pytest.mark.parametrize("data_final, pro_rata, publicado", [
+    ("10/01/2025", False, False),
+    ("20/12/2024", True, False),
+    ("20/12/2024", False, True),
+    ("01/01/1990", False, True),
+])
+def test_mensagem_fora_da_serie(tabelas, data_final, pro_rata, publicado):
+    mensagem = mensagem_fora_da_serie("IPCA", pd.Timestamp(datetime.strptime(data_final, "%d/%m/%Y")), pro_rata,
+                                      tabelas)
+    if publicado:
+        assert mensagem == MENSAGEM_FORA_DA_SERIE
+    else:
+        assert mensagem == ("O IPCA de 01/2025 ainda não foi publicado e a taxa do mês da data final entra no "
+                            "cálculo. Último mês disponível: 12/2024.")
@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao import exato
+from atualizacao.calculo import calcular_indice_lote
+from atualizacao.exato import CASAS_ACUMULADO, _produtos_truncados, aplicar, em_reais, fator_periodo
+
+
+def _produto_referencia(fatores, inicio, fim):
+    # Passo a passo, como a calculadora: acumulado truncado em 16 casas a cada período
+    acumulado = 10 ** CASAS_ACUMULADO
+    for fator in fatores[inicio:fim]:
+        if not fator:
+            return None
+        acumulado = acumulado * int(fator) // 10 ** exato.CASAS_FATOR
+    return acumulado
+
+
+@pytest.mark.parametrize(("taxa", "esperado"), [
+    (0.0455, 100045500),
+    (0.123456789, 100123456),
+    (Decimal("0.00000001"), 100000000),
+    (-0.5, 99500000),
+])
+def test_fator_periodo_trunca(taxa, esperado):
+    assert fator_periodo(taxa, 8) == esperado
+
+
+def test_produto_truncado_a_cada_periodo():
+    # 1,00000003³ = 1,000000090000002700000027 -> 16 casas truncadas
+    fatores = np.array([100000003] * 3)
+    assert _produtos_truncados(fatores, np.array([0]), np.array([3]))[0] == 10000000900000027
+
+
+@pytest.mark.parametrize("grande", [False, True])
+def test_produtos_iguais_ao_passo_a_passo(grande, monkeypatch):
+    gerador = np.random.default_rng(1)
+    fatores = gerador.integers(100000000, 100100000, 400)
+    fatores[[50, 51, 300]] = 0
+    if grande:
+        # Força os inteiros do Python no lugar de int64
+        monkeypatch.setattr(exato, "LIMITE_INT64", 1)
+    inicios = gerador.integers(0, 400, 500)
+    fins = np.minimum(inicios + gerador.integers(0, 200, 500), 400)
+    resultado = _produtos_truncados(fatores, inicios, fins)
+    esperado = [_produto_referencia(fatores, i, f) for i, f in zip(inicios, fins)]
+    assert list(resultado) == esperado
+
+
+@pytest.mark.parametrize(("valor", "fator", "centavos"), [
+    (100.00, "1.5", 15000),
+    # Meio centavo arredonda para cima
+    (0.01, "1.5", 2),
+    (0.03, "1.5", 5),
+    (1000.00, "1.2345678912345678", 123457),
+    (1234.56, "1.0000000000000001", 123456),
+])
+def test_aplicar_arredonda_centavos(valor, fator, centavos):
+    fatores = np.array([int(Decimal(fator) * 10 ** CASAS_ACUMULADO)], dtype=object)
+    assert aplicar([valor], fatores, CASAS_ACUMULADO)[0] == centavos
+
+
+def test_aplicar_sem_fator_ou_valor_invalido():
+    fatores = np.array([None, 10 ** CASAS_ACUMULADO], dtype=object)
+    resultado = aplicar([100.0, np.nan], fatores, CASAS_ACUMULADO)
+    assert list(resultado) == [None, None]
+    assert np.isnan(em_reais(resultado)).all()
+
+
+@pytest.mark.parametrize("indice", ["Selic", "IPCA"])
+def test_exato_proximo_do_float(indice, tabelas):
+    df = pd.DataFrame({
+        "data_inicial": ["15/03/2010", "01/01/2015", "02/01/2020"],
+        "data_final": ["09/07/2020", "01/01/2015", "30/06/2024"],
+        "valor": [1000.0, 250.5, 1_000_000.0],
+    })
+    padrao = calcular_indice_lote(df, indice, tabelas=tabelas)
+    exatos = calcular_indice_lote(df, indice, exato=True, tabelas=tabelas)
+    assert (exatos * 100).round(6).eq((exatos * 100).round()).all()
+    assert np.allclose(exatos, padrao, rtol=1e-4, atol=0.01)
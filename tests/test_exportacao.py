@@ -0,0 +1,91 @@
+import os
+
+import pandas as pd
+import pytest
+
+from atualizacao import calculo
+from atualizacao.cache import cache_fatores
+from atualizacao.cli import processar_arquivo
+from atualizacao.composicao import Composicao
+from atualizacao.exportacao import BlocosEmDisco, ExportadorBlocos, colunas_calculo, colunas_resultado
+from atualizacao.paralelo import CalculadoraParalela
+
+
+def _gravados(pasta, tamanhos=(10, 5, 10)):
+    blocos = BlocosEmDisco.criar(pasta)
+    inicio = 0
+    for tamanho in tamanhos:
+        blocos.escrever(pd.DataFrame({"linha": range(inicio, inicio + tamanho)}))
+        inicio += tamanho
+    return blocos
+
+
+def test_blocos_em_disco_devolvem_o_que_foi_gravado(tmp_path):
+    blocos = _gravados(tmp_path)
+    assert blocos.linhas == 25
+    assert pd.concat(list(blocos))["linha"].tolist() == list(range(25))
+
+
+def test_fatia_le_so_as_linhas_pedidas(tmp_path):
+    blocos = _gravados(tmp_path)
+    assert blocos.fatia(8, 17)["linha"].tolist() == list(range(8, 17))
+    assert blocos.fatia(0, 3)["linha"].tolist() == [0, 1, 2]
+    vazia = blocos.fatia(30, 40)
+    assert vazia.empty and list(vazia.columns) == ["linha"]
+
+
+def test_criar_remove_as_pastas_mais_antigas(tmp_path):
+    antigas = [_gravados(tmp_path) for _ in range(3)]
+    for idade, blocos in enumerate(antigas):
+        os.utime(blocos.pasta, (idade, idade))
+    nova = BlocosEmDisco.criar(tmp_path, manter=2)
+    assert [blocos.existe() for blocos in antigas] == [False, False, True]
+    assert nova.existe()
+    nova.remover()
+    assert not nova.existe()
+
+
+def test_colunas_resultado_vem_das_colunas_calculadas():
+    assert colunas_resultado(colunas_calculo("Selic")) == ["valor_atualizado"]
+    assert colunas_resultado(colunas_calculo("Selic", ["IPCA", "CDI"]), compor=True) == [
+        "valor_atualizado_IPCA", "valor_atualizado_CDI", "valor_final_IPCA", "valor_final_CDI",
+    ]
+
+
+def test_colunas_do_usuario_com_nome_parecido_nao_sao_formatadas(tmp_path, monkeypatch, tabelas):
+    monkeypatch.setattr(calculo, "obter_tabelas", lambda: tabelas)
+    cache_fatores.limpar()
+    entrada = tmp_path / "entrada.csv"
+    pd.DataFrame({
+        "data_inicial": ["15/03/2010"] * 3,
+        "data_final": ["09/07/2020"] * 3,
+        "valor": ["1.000,00"] * 3,
+        "valor_final_contrato": ["contrato 1", "contrato 2", "contrato 3"],
+        "valor_atualizado_manual": ["a", "b", "c"],
+    }).to_csv(entrada, sep=";", index=False)
+    destino = tmp_path / "saida.csv"
+    with CalculadoraParalela(trabalhadores=1) as calculadora:
+        processar_arquivo(entrada, destino, "Selic", calculadora, formato="csv",
+                          composicao=Composicao.ler("correcao+multa:2"))
+    saida = pd.read_csv(destino, sep=";", dtype=str)
+    assert saida["valor_final_contrato"].tolist() == ["contrato 1", "contrato 2", "contrato 3"]
+    assert saida["valor_atualizado_manual"].tolist() == ["a", "b", "c"]
+    assert saida["valor_atualizado"].str.startswith("R$").all()
+    assert saida["valor_final"].str.startswith("R$").all()
+
+
+@pytest.mark.parametrize("formato", ["parquet", "feather"])
+def test_coluna_vazia_no_primeiro_bloco_preenchida_depois(tmp_path, formato):
+    pytest.importorskip("pyarrow")
+    blocos = [
+        pd.DataFrame({"valor": [1.0, 2.0], "obs": [None, None]}),
+        pd.DataFrame({"valor": [3.0, 4.0], "obs": ["a", None]}),
+        pd.DataFrame({"valor": [5.0], "obs": [None]}),
+    ]
+    with ExportadorBlocos(formato, tmp_path / f"saida.{formato}") as saida:
+        for bloco in blocos:
+            saida.escrever(bloco)
+    lido = getattr(pd, f"read_{formato}")(saida.caminho)
+    assert lido["valor"].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert lido["obs"].isna().tolist() == [True, True, False, True, True]
+    assert lido["obs"][2] == "a"
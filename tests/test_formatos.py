@@ -0,0 +1,149 @@
+import re
+import warnings
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.calculo import normalizar_data, parse_valor
+from atualizacao.formatos import formatar_valores, normalizar_datas, parse_valores
+from atualizacao.interface import formatar_valor_monetario
+
+
+def _normalizar_data_original(val):
+    # Versão por célula do app.py original, referência dos casos em que ela acerta
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            if isinstance(val, (float, int)) and not pd.isnull(val):
+                d = pd.to_datetime(val, origin='1899-12-30', unit='d')
+                return d.strftime('%d/%m/%Y')
+            valstr = str(val).replace('-', '/').replace('.', '/')
+            d = pd.to_datetime(valstr, dayfirst=True, errors="coerce")
+            if pd.notnull(d):
+                return d.strftime('%d/%m/%Y')
+            v = ''.join(filter(str.isdigit, str(val)))
+            if len(v) == 8:
+                return f"{v[:2]}/{v[2:4]}/{v[4:]}"
+            return val
+        except Exception:
+            return val
+
+
+def _parse_valor_original(valor):
+    # Versão por célula do app.py original
+    v = str(valor).replace('.', '').replace(',', '.')
+    return float(re.sub(r"[^\d.]", "", v)) if v else 0.0
+
+
+DATAS_COMO_ORIGINAL = [
+    "15/03/2023", "5/3/2023", "15-03-2023", "15.03.2023", "15032023", "2023-03-15",
+    "2023-03-15 10:30:00", "15/03/23", 45000.75, "05/01/2024", "29/02/2024",
+]
+
+# Casos em que o original errava ou não entregava data
+DATAS_CORRIGIDAS = [
+    (45000, "15/03/2023"),                   # serial inteiro do Excel
+    ("45000", "15/03/2023"),                 # serial lido como texto
+    (date(2024, 1, 5), "05/01/2024"),        # objetos de data não são lidos com o dia primeiro
+    (datetime(2024, 1, 5, 12), "05/01/2024"),
+    (pd.Timestamp("2024-01-05"), "05/01/2024"),
+    ("31/02/2023", None),
+    ("abc", None),
+    ("", None),
+    (None, None),
+    (np.nan, None),
+]
+
+VALORES_COMO_ORIGINAL = [
+    "1.000,00", "R$ 1.000,00", "1000", "1.000", "1.000.000", "1.000.000,50", " 2 000,00", "0,005", 10, "R$ 750,10",
+]
+
+# Sinal negativo e ponto decimal sem vírgula eram descartados; texto inválido dava erro ou zero
+VALORES_CORRIGIDOS = [
+    ("1000.5", 1000.5),
+    (1234.5, 1234.5),
+    ("-10,5", -10.5),
+    ("(1.234,56)", -1234.56),
+    ("R$ -2,50", -2.5),
+    ("abc", None),
+    ("", None),
+    (None, None),
+]
+
+
+def _datas(coluna):
+    return [None if pd.isnull(d) else d.strftime("%d/%m/%Y") for d in normalizar_datas(pd.Series(coluna, dtype=object))]
+
+
+def test_datas_como_a_versao_original():
+    assert _datas(DATAS_COMO_ORIGINAL) == [_normalizar_data_original(d) for d in DATAS_COMO_ORIGINAL]
+
+
+def test_datas_corrigidas():
+    entradas, esperadas = zip(*DATAS_CORRIGIDAS)
+    assert _datas(entradas) == list(esperadas)
+
+
+def test_datas_coluna_mista_igual_celula_a_celula():
+    # A coluna inteira passa por vários ramos (máscaras); cada célula sozinha tem de dar o mesmo
+    coluna = DATAS_COMO_ORIGINAL + [d for d, _ in DATAS_CORRIGIDAS]
+    assert _datas(coluna) == [_datas([d])[0] for d in coluna]
+    # A função de um valor só devolve o próprio valor quando não é data
+    assert [normalizar_data(d) for d in ("15032023", "abc")] == ["15/03/2023", "abc"]
+
+
+def test_datas_devolvem_datetime64():
+    assert normalizar_datas(pd.Series(["15/03/2023", 45000], dtype=object)).dtype == "datetime64[ns]"
+
+
+def _valores(coluna):
+    return [None if np.isnan(v) else v for v in parse_valores(pd.Series(coluna, dtype=object)).tolist()]
+
+
+def test_valores_como_a_versao_original():
+    assert _valores(VALORES_COMO_ORIGINAL) == pytest.approx([_parse_valor_original(v) for v in VALORES_COMO_ORIGINAL])
+
+
+def test_valores_corrigidos():
+    entradas, esperados = zip(*VALORES_CORRIGIDOS)
+    assert _valores(entradas) == list(esperados)
+
+
+def test_valores_coluna_mista_igual_celula_a_celula():
+    coluna = VALORES_COMO_ORIGINAL + [v for v, _ in VALORES_CORRIGIDOS]
+    sozinhos = [parse_valor(v) for v in coluna]
+    assert _valores(coluna) == [None if np.isnan(v) else v for v in sozinhos]
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    (1234.5, "R$ 1.234,50"),
+    (0, "R$ 0,00"),
+    (1_000_000, "R$ 1.000.000,00"),
+    (1234567.891, "R$ 1.234.567,89"),
+    (-1234.567, "R$ -1.234,57"),
+    (-0.001, "R$ 0,00"),
+    # Arredondamento do float (meio para o par sobre o valor binário): 0,005 fica um pouco acima, 1,005 abaixo
+    (0.005, "R$ 0,01"),
+    (1.005, "R$ 1,00"),
+    (2.675, "R$ 2,67"),
+    ("1.5", "R$ 1,50"),
+    (np.nan, ""),
+    (None, ""),
+    ("abc", ""),
+])
+def test_formatar_valores(valor, esperado):
+    assert formatar_valores(pd.Series([valor], dtype=object)).tolist() == [esperado]
+
+
+def test_formatar_valores_como_o_valor_avulso():
+    valores = [0.01, 9.999, 12345.675, 999999.995, 42]
+    assert formatar_valores(pd.Series(valores)).tolist() == ["R$ " + formatar_valor_monetario(v) for v in valores]
+
+
+def test_formatar_valores_mantem_o_indice_e_aceita_outro_prefixo():
+    serie = pd.Series([1.0, np.nan], index=[10, 20])
+    formatados = formatar_valores(serie, prefixo="")
+    assert formatados.index.tolist() == [10, 20]
+    assert formatados.tolist() == ["1,00", ""]
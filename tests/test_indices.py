@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao import indices
+from atualizacao.indices import BaseIndices, abrir_tabelas, gravar_tabelas, obter_tabelas
+
+
+def _gravar(base, valor):
+    datas = pd.date_range("2020-01-01", periods=24, freq="MS")
+    base.gravar("IPCA", pd.Series(datas), pd.Series([valor] * len(datas), dtype="float64"))
+
+
+class Contagem:
+    def __init__(self, base):
+        self.chamadas = 0
+        self._versoes = base.versoes
+        base.versoes = self
+
+    def __call__(self):
+        self.chamadas += 1
+        return self._versoes()
+
+
+def test_obter_tabelas_so_consulta_versoes_quando_a_base_muda(tmp_path):
+    base = BaseIndices(tmp_path / "indices.sqlite")
+    _gravar(base, 0.5)
+    contagem = Contagem(base)
+    primeira = obter_tabelas(base)
+    contagem.chamadas = 0
+    for _ in range(100):
+        assert obter_tabelas(base) is primeira
+    assert contagem.chamadas == 0
+    # Gravação na base: a versão nova aparece na chamada seguinte
+    _gravar(base, 1.0)
+    assert obter_tabelas(base)["IPCA"].versao == primeira["IPCA"].versao + 1
+
+
+def test_obter_tabelas_confere_versoes_depois_do_intervalo(tmp_path, monkeypatch):
+    base = BaseIndices(tmp_path / "indices.sqlite")
+    _gravar(base, 0.5)
+    contagem = Contagem(base)
+    primeira = obter_tabelas(base)
+    contagem.chamadas = 0
+    monkeypatch.setattr(indices, "INTERVALO_VERSOES", 0.0)
+    assert obter_tabelas(base) is primeira
+    assert contagem.chamadas == 1
+
+
+def _datas(*datas):
+    return np.array(datas, dtype="datetime64[ns]")
+
+
+@pytest.mark.parametrize("indice", ["IPCA", "IGPM"])
+@pytest.mark.parametrize("inicio, fim", [
+    ("2023-03-01", "2023-07-01"),
+    ("2010-01-01", "2020-12-01"),
+    ("2023-03-01", "2023-03-01"),
+    ("2023-07-01", "2023-03-01"),
+])
+def test_pro_rata_igual_a_meses_inteiros_no_dia_1(tabelas, indice, inicio, fim):
+    tabela = tabelas[indice]
+    assert tabela.fator(_datas(inicio), _datas(fim), pro_rata=True) == pytest.approx(
+        tabela.fator(_datas(inicio), _datas(fim)), rel=1e-12)
+
+
+def test_pro_rata_conta_so_a_fracao_dos_meses_incompletos(tabelas):
+    tabela = tabelas["IPCA"]
+    mensal = tabela.fator(_datas("2023-03-01", "2023-04-01"), _datas("2023-04-01", "2023-05-01"))
+    # 31/03 a 01/04: 1 dos 31 dias de março, com a taxa que o fator mensal atribui a esse mês (a de abril)
+    assert tabela.fator(_datas("2023-03-31"), _datas("2023-04-01"), pro_rata=True) == pytest.approx(
+        mensal[0] ** (1 / 31), rel=1e-12)
+    # 16/03 a 16/05: 16 dias de março, abril inteiro e 15 dias de maio
+    esperado = mensal[0] ** (16 / 31) * mensal[1] * tabela.fator(_datas("2023-05-01"), _datas("2023-06-01"))[0] ** (15 / 31)
+    assert tabela.fator(_datas("2023-03-16"), _datas("2023-05-16"), pro_rata=True) == pytest.approx(esperado, rel=1e-12)
+
+
+def test_pro_rata_fora_da_serie(tabelas):
+    tabela = tabelas["IPCA"]
+    ultimo = (tabela.origem + len(tabela.acumulado) - 1).astype("datetime64[ns]")
+    # Dia 1º do último mês ainda está na série; o dia seguinte dependeria da taxa não publicada
+    assert not np.isnan(tabela.fator(_datas("2023-03-01"), np.array([ultimo]), pro_rata=True)[0])
+    assert np.isnan(tabela.fator(_datas("2023-03-01"), np.array([ultimo + np.timedelta64(1, "D")]), pro_rata=True)[0])
+
+
+def test_mes_da_data_final_ainda_nao_publicado(tabelas):
+    tabela = tabelas["IPCA"]
+    assert tabela.ultimo_mes() == np.datetime64("2024-12")
+    finais = _datas("2024-12-31", "2025-01-01", "2024-12-01", "NaT")
+    # O mês da data final entra no fator: janeiro de 2025 ainda não tem taxa
+    assert np.isnan(tabela.fator(_datas("2024-01-15"), finais[1:2])[0])
+    assert tabela.nao_publicadas(finais).tolist() == [False, True, False, False]
+    # No pro rata, depois do dia 1º do último mês já falta a taxa do mês seguinte
+    assert tabela.nao_publicadas(finais, pro_rata=True).tolist() == [True, True, False, False]
+    assert tabelas["Selic"].ultimo_mes() is None
+    assert not tabelas["Selic"].nao_publicadas(finais).any()
+
+
+def test_gravar_e_abrir_tabelas(tmp_path, tabelas):
+    caminho = tmp_path / "tabelas.fatores"
+    gravar_tabelas(tabelas, caminho)
+    abertas = abrir_tabelas(caminho)
+    assert list(abertas) == list(tabelas)
+    for indice, tabela in tabelas.items():
+        aberta = abertas[indice]
+        assert (aberta.unidade, aberta.origem, aberta.versao) == (tabela.unidade, tabela.origem, tabela.versao)
+        assert aberta.arquivo == str(caminho)
+        for nome in indices.VETORES:
+            original = getattr(tabela, nome)
+            if original is None:
+                assert getattr(aberta, nome) is None
+            else:
+                np.testing.assert_array_equal(getattr(aberta, nome), original)
+        # Vetores mapeados, sem cópia e só para leitura
+        assert not aberta.acumulado.flags.writeable
+
+
+def test_abrir_tabelas_recusa_outro_arquivo(tmp_path):
+    caminho = tmp_path / "tabelas.fatores"
+    caminho.write_bytes(b"FATORES0" + bytes(64))
+    with pytest.raises(ValueError):
+        abrir_tabelas(caminho)
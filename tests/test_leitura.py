@@ -0,0 +1,33 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.leitura import contar_linhas, ler_feather_em_blocos
+
+feather = pytest.importorskip("pyarrow.feather")
+
+LINHAS = 10_007
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    caminho = tmp_path / "entrada.feather"
+    # Lotes do arquivo menores e maiores que os blocos pedidos
+    feather.write_feather(pd.DataFrame({"valor": np.arange(LINHAS, dtype="float64")}), caminho, chunksize=3_000)
+    return caminho
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1_000, 2_500, 4_000, LINHAS, 50_000])
+def test_feather_em_blocos_do_tamanho_pedido(caminho, tamanho_bloco):
+    blocos = list(ler_feather_em_blocos(caminho, tamanho_bloco))
+    assert all(len(bloco) == tamanho_bloco for bloco in blocos[:-1])
+    junto = pd.concat(blocos)
+    assert junto["valor"].tolist() == list(range(LINHAS))
+    assert junto.index.tolist() == list(range(LINHAS))
+
+
+def test_contar_linhas_feather(caminho):
+    assert contar_linhas(caminho) == LINHAS
+    assert contar_linhas(io.BytesIO(caminho.read_bytes()), nome="entrada.arrow") == LINHAS
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atualizacao.calculo import calcular_por_indice
+from atualizacao.indices import abrir_tabelas, gravar_tabelas
+from atualizacao.paralelo import CalculadoraParalela
+
+
+def _blocos(linhas=300, quantidade=3):
+    aleatorio = np.random.default_rng(7)
+    inicios = pd.Timestamp("2005-01-01") + pd.to_timedelta(aleatorio.integers(0, 5000, linhas * quantidade), unit="D")
+    fins = inicios + pd.to_timedelta(aleatorio.integers(-30, 3000, linhas * quantidade), unit="D")
+    df = pd.DataFrame({
+        "data_inicial": inicios.strftime("%d/%m/%Y"),
+        "data_final": fins.strftime("%d/%m/%Y"),
+        "valor": aleatorio.uniform(-10, 5000, linhas * quantidade).round(2),
+        "indice": aleatorio.choice(["Selic", "IPCA", "CDI", "IGPM", None], linhas * quantidade),
+    })
+    # Índice fora de ordem, como depois de filtros: a montagem tem de devolvê-lo igual
+    df.index = aleatorio.permutation(len(df)) + 1000
+    return [df.iloc[i:i + linhas] for i in range(0, len(df), linhas)]
+
+
+@pytest.fixture(scope="module")
+def calculadora():
+    with CalculadoraParalela(trabalhadores=2, tamanho_pedaco=128, limiar=1) as calculadora:
+        yield calculadora
+
+
+@pytest.mark.parametrize("origem", ["memoria", "arquivo"])
+@pytest.mark.parametrize("exato", [False, True])
+def test_pool_igual_ao_calculo_serial(calculadora, tabelas, tmp_path, origem, exato):
+    if origem == "arquivo":
+        gravar_tabelas(tabelas, tmp_path / "tabelas.fatores")
+        tabelas = abrir_tabelas(tmp_path / "tabelas.fatores")
+    blocos = _blocos()
+    resultados = calculadora.calcular_blocos(blocos, "Selic", exato=exato, tabelas=tabelas)
+    assert calculadora._pool is not None
+    for bloco, resultado in zip(blocos, resultados):
+        serial = calcular_por_indice(bloco, "Selic", exato=exato, tabelas=tabelas)
+        assert resultado.index.equals(bloco.index)
+        np.testing.assert_array_equal(resultado.to_numpy(), serial.to_numpy())
+
+
+def test_pool_pro_rata(calculadora, tabelas):
+    blocos = _blocos(quantidade=1)
+    resultado = calculadora.calcular_blocos(blocos, "IPCA", tabelas=tabelas, por_linha=False, pro_rata=True)[0]
+    serial = calcular_por_indice(blocos[0].drop(columns="indice"), "IPCA", tabelas=tabelas, pro_rata=True)
+    np.testing.assert_array_equal(resultado.to_numpy(), serial.to_numpy())
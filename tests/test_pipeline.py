@@ -0,0 +1,33 @@
+import pandas as pd
+
+from benchmarks.pipeline import comparar, medir_pipeline
+
+ETAPAS = ("leitura", "normalizar_datas", "parse_valores", "validacao", "calcular_indice",
+          "formatar_valores", "exportacao_blocos", "gerar_excel")
+
+
+def _csv(pasta, linhas=50):
+    caminho = pasta / "entrada.csv"
+    pd.DataFrame({
+        "data_inicial": ["15/03/2010"] * linhas,
+        "data_final": ["09/07/2020"] * linhas,
+        "valor": ["1.000,00"] * linhas,
+    }).to_csv(caminho, sep=";", index=False)
+    return caminho
+
+
+def test_medir_pipeline_registra_todas_as_etapas(tmp_path, tabelas):
+    resultado = medir_pipeline(_csv(tmp_path), 50, {"Selic": tabelas["Selic"]})
+    assert tuple(resultado["etapas"]) == ETAPAS
+    for medida in resultado["etapas"].values():
+        assert medida["segundos"] >= 0
+    assert resultado["total_segundos"] >= 0
+
+
+def test_comparar_aponta_regressao(tmp_path):
+    base = tmp_path / "base.json"
+    novo = tmp_path / "novo.json"
+    base.write_text('{"commit": "a", "resultados": {"1000": {"etapas": {"leitura": {"segundos": 1.0}}}}}')
+    novo.write_text('{"commit": "b", "resultados": {"1000": {"etapas": {"leitura": {"segundos": 1.5}}}}}')
+    assert comparar(base, novo)
+    assert not comparar(novo, novo)
@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+import requests
+
+from atualizacao.indices import BaseIndices, abrir_tabelas, arquivo_tabelas
+from atualizacao.sgs import criar_sessao, janelas, sincronizar
+from atualizacao.sgs_local import ManipuladorSGS, gerar_registros, iniciar_servidor
+
+INDICES = ["Selic", "IPCA"]
+
+
+@pytest.fixture
+def url(monkeypatch):
+    monkeypatch.setattr(ManipuladorSGS, "_contador", 0)
+    servidor, url = iniciar_servidor()
+    yield url
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class Sessao:
+    """Sessão de ``criar_sessao`` (sem espera entre tentativas) que anota as janelas pedidas"""
+
+    def __init__(self, tentativas=5):
+        self.sessao = criar_sessao(tentativas=tentativas, espera=0)
+        self.janelas = []
+
+    def get(self, url, params, **kwargs):
+        self.janelas.append((url.rsplit(".", 1)[-1].split("/")[0], params["dataInicial"], params["dataFinal"]))
+        return self.sessao.get(url, params=params, **kwargs)
+
+
+def test_janelas_de_dez_anos():
+    assert list(janelas(date(2000, 1, 1), date(2024, 12, 31))) == [
+        (date(2000, 1, 1), date(2009, 12, 31)),
+        (date(2010, 1, 1), date(2019, 12, 31)),
+        (date(2020, 1, 1), date(2024, 12, 31)),
+    ]
+    assert list(janelas(date(2004, 2, 29), date(2014, 3, 1))) == [
+        (date(2004, 2, 29), date(2014, 2, 28)),
+        (date(2014, 3, 1), date(2014, 3, 1)),
+    ]
+
+
+def test_novas_tentativas_quando_o_sgs_responde_503(tmp_path, url, monkeypatch):
+    monkeypatch.setattr(ManipuladorSGS, "falhar_a_cada", 2)
+    base = BaseIndices(tmp_path / "indices.sqlite")
+    sessao = Sessao()
+    novos = sincronizar(base, INDICES, ate=date(2020, 6, 30), url=url, sessao=sessao, desde=date(2000, 1, 1))
+    # Três janelas de cada índice; cada requisição depois da primeira falhou uma vez e foi repetida
+    assert len(sessao.janelas) == 6
+    assert ManipuladorSGS._contador == 11
+    selic = gerar_registros(11, date(2000, 1, 1), date(2020, 6, 30))
+    assert novos == {"Selic": len(selic), "IPCA": 246}
+    assert base.ler("Selic")["valor"].tolist() == [float(r["valor"]) for r in selic]
+
+
+def test_falha_depois_das_tentativas(tmp_path, url, monkeypatch):
+    monkeypatch.setattr(ManipuladorSGS, "falhar_a_cada", 1)
+    base = BaseIndices(tmp_path / "indices.sqlite")
+    with pytest.raises(requests.exceptions.RetryError):
+        sincronizar(base, ["IPCA"], ate=date(2020, 6, 30), url=url, sessao=Sessao(tentativas=2))
+    assert ManipuladorSGS._contador == 3
+    assert base.versoes() == {}
+    assert not arquivo_tabelas(base).exists()
+
+
+def test_sincronizacao_incremental_pede_so_o_periodo_novo(tmp_path, url):
+    base = BaseIndices(tmp_path / "indices.sqlite")
+    sincronizar(base, INDICES, ate=date(2020, 6, 30), url=url, sessao=Sessao(), desde=date(2019, 1, 1))
+    sessao = Sessao()
+    novos = sincronizar(base, INDICES, ate=date(2020, 8, 31), url=url, sessao=sessao)
+    # Selic continua no dia seguinte ao último gravado; IPCA, no mês seguinte
+    assert sessao.janelas == [("11", "01/07/2020", "31/08/2020"), ("433", "01/07/2020", "31/08/2020")]
+    assert novos == {"Selic": 44, "IPCA": 2}
+    assert base.ler("IPCA")["data"].dt.strftime("%m/%Y").tolist()[-3:] == ["06/2020", "07/2020", "08/2020"]
+    # Nada pendente: nenhuma requisição
+    sessao = Sessao()
+    assert sincronizar(base, INDICES, ate=date(2020, 8, 31), url=url, sessao=sessao) == {"Selic": 0, "IPCA": 0}
+    assert sessao.janelas == []
+
+
+def test_valores_novos_mudam_a_versao_e_publicam_as_tabelas(tmp_path, url):
+    base = BaseIndices(tmp_path / "indices.sqlite")
+    sincronizar(base, INDICES, ate=date(2020, 6, 30), url=url, sessao=Sessao(), desde=date(2019, 1, 1))
+    assert base.versoes() == {"Selic": 1, "IPCA": 1}
+    publicadas = abrir_tabelas(arquivo_tabelas(base))
+    assert {indice: tabela.versao for indice, tabela in publicadas.items()} == {"Selic": 1, "IPCA": 1}
+    meses = len(publicadas["IPCA"].acumulado)
+    # 01/07/2020 traz valor novo dos dois índices; a versão muda só no índice sincronizado
+    sincronizar(base, INDICES, ate=date(2020, 7, 1), url=url, sessao=Sessao())
+    assert base.versoes() == {"Selic": 2, "IPCA": 2}
+    sincronizar(base, ["IPCA"], ate=date(2020, 8, 1), url=url, sessao=Sessao())
+    assert base.versoes() == {"Selic": 2, "IPCA": 3}
+    publicadas = abrir_tabelas(arquivo_tabelas(base))
+    assert {indice: tabela.versao for indice, tabela in publicadas.items()} == {"Selic": 2, "IPCA": 3}
+    assert len(publicadas["IPCA"].acumulado) == meses + 2
+    # Sem valores novos o arquivo publicado não é regravado
+    modificado = arquivo_tabelas(base).stat().st_mtime_ns
+    sincronizar(base, INDICES, ate=date(2020, 7, 1), url=url, sessao=Sessao())
+    assert arquivo_tabelas(base).stat().st_mtime_ns == modificado